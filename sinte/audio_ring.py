@@ -0,0 +1,172 @@
+"""Render adelantado: el engine sintetiza en un hilo propio por delante del
+callback de PortAudio.
+
+El callback tenía que hacer todo el render dentro de su presupuesto (46 ms
+con blocksize 2048), y un bloque caro (el `scream` de bulebule, seis voces
+sonando a la vez) lo pasaba aunque la media fuera holgada. Pero casi todo
+ese trabajo es la parte t=0 del engine (secuenciador, voces, línea de
+retardo), que no depende de los knobs: puede ir `render_ahead` bloques por
+delante y absorber los picos. En el callback solo queda `Engine.mix_live`:
+efectos, volumen y pan del controlador, master y pads, que es lo que tiene
+que sonar al instante cuando se mueve un mando.
+
+Entre los dos hilos hay un anillo de un productor y un consumidor
+(`AudioRing`) sin locks: cada contador lo escribe un único hilo, así que el
+callback nunca espera a nadie. Si el anillo está vacío, el callback saca
+silencio y lo apunta (`EstadoAudio.vacios`): es un corte, igual que un xrun.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+
+from lgpt_engine import CHANNEL_COUNT
+
+
+class AudioRing:
+    """Anillo SPSC de bloques secos (salida del delay de cada canal).
+
+    `buf[i]` es un hueco planar (CHANNEL_COUNT, 2, frames) listo para
+    `Engine.render_dry`. `cuenta[0]` son los bloques publicados (solo lo
+    escribe el productor) y `cuenta[1]` los consumidos (solo el consumidor);
+    la diferencia es lo que hay dentro. Cada hueco lleva apuntado el engine
+    que lo renderizó, para tirar lo que quede de la canción anterior.
+    """
+
+    def __init__(self, slots: int, frames: int,
+                 channels: int = CHANNEL_COUNT):
+        self.slots = slots
+        self.frames = frames
+        self.buf = np.zeros((slots, channels, 2, frames), dtype=np.float32)
+        self.owner: list = [None] * slots
+        self.cuenta = np.zeros(2, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self.cuenta[0] - self.cuenta[1])
+
+    def llena(self) -> bool:
+        return len(self) >= self.slots
+
+    def escritura(self) -> np.ndarray:
+        """Hueco donde va el siguiente bloque (solo el productor)."""
+        return self.buf[int(self.cuenta[0]) % self.slots]
+
+    def publica(self, owner):
+        """Da por escrito el hueco de `escritura()`."""
+        self.owner[int(self.cuenta[0]) % self.slots] = owner
+        self.cuenta[0] += 1
+
+    def lectura(self):
+        """(bloque, engine) más antiguo sin consumir, o None si está vacío.
+        El hueco sigue reservado hasta `libera()`: se puede mezclar in situ."""
+        if self.cuenta[0] == self.cuenta[1]:
+            return None
+        i = int(self.cuenta[1]) % self.slots
+        return self.buf[i], self.owner[i]
+
+    def libera(self):
+        """Devuelve al productor el hueco de `lectura()`."""
+        i = int(self.cuenta[1]) % self.slots
+        self.owner[i] = None
+        self.cuenta[1] += 1
+
+
+class RenderAhead:
+    """Hilo que mantiene lleno el anillo con `Engine.render_dry`.
+
+    Sigue al engine de `engine_ref["engine"]` como el callback: al cambiar de
+    canción empieza a llenar con el nuevo y el callback descarta lo viejo.
+    El callback no toca el engine más que con `mix_live`; lo que antes hacía
+    sobre él directamente pasa por aquí:
+
+    * `catch_up(s)`: la recuperación tras un salto del DAC. Se acumula en un
+      contador que solo escribe el callback y el hilo aplica la diferencia
+      antes del siguiente bloque.
+    * `block_time_ms`: el reloj de pared del bloque que se renderiza. El
+      callback publica (bloque, instante) del que suena y el hilo proyecta
+      a `k` bloques vista.
+    """
+
+    def __init__(self, engine_ref: dict, estado, frames: int, bloques: int,
+                 sample_rate: int):
+        self.engine_ref = engine_ref
+        self.estado = estado
+        self.frames = frames
+        self.ring = AudioRing(bloques, frames)
+        self.bloque_ms = frames * 1000.0 / sample_rate
+        self.reloj: tuple | None = None   # (nº de bloque, ms de pared)
+        self._pedido_s = 0.0               # catch_up pedido (callback)
+        self._hecho_s = 0.0                # catch_up aplicado (hilo)
+        self._engine = None
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, daemon=True,
+                                        name="render-ahead")
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._stop = True
+        self._thread.join()
+
+    def catch_up(self, seconds: float):
+        self._pedido_s += seconds
+
+    def pop(self, engine):
+        """Bloque seco para `engine` o None si no hay ninguno listo.
+
+        Lo que quede de otro engine (canción anterior) se descarta. Tras
+        mezclarlo hay que llamar a `done()`."""
+        ring = self.ring
+        while True:
+            got = ring.lectura()
+            if got is None:
+                return None
+            dry, owner = got
+            if owner is engine:
+                return dry
+            ring.libera()
+
+    def done(self, block_time_ms: float):
+        """Libera el bloque de `pop()`, que sonará en `block_time_ms`."""
+        self.reloj = (int(self.ring.cuenta[1]), block_time_ms)
+        self.ring.libera()
+
+    def _prevision_ms(self, k: int) -> float:
+        reloj = self.reloj
+        if reloj is None:
+            return time.time() * 1000.0 + len(self.ring) * self.bloque_ms
+        k0, ms = reloj
+        return ms + (k - k0) * self.bloque_ms
+
+    def _loop(self):
+        ring = self.ring
+        est = self.estado
+        espera = self.bloque_ms / 4000.0
+        while not self._stop:
+            engine = self.engine_ref.get("engine")
+            if engine is None or ring.llena():
+                time.sleep(espera)
+                continue
+            pedido = self._pedido_s
+            if engine is not self._engine:
+                self._engine = engine      # catch_up viejo: era de otra canción
+            elif pedido > self._hecho_s:
+                engine.catch_up(pedido - self._hecho_s)
+            self._hecho_s = pedido
+            k = int(ring.cuenta[0])
+            engine.block_time_ms = self._prevision_ms(k)
+            t0 = time.perf_counter()
+            engine.render_dry(self.frames, ring.escritura())
+            ms = (time.perf_counter() - t0) * 1000.0
+            ring.publica(engine)
+            est.render_ultima_ms = ms
+            if ms > est.render_peor_ms:
+                est.render_peor_ms = ms
+            est.render_peor_desde = max(ms, est.render_peor_desde * 0.999)
+            carga = ms / self.bloque_ms
+            est.carga_cancion = max(est.carga_cancion, carga)
+            engine.governor.update(carga, self.bloque_ms / 1000.0)
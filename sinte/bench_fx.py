@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Coste por bloque de cada preset de efecto con cada motor (LADSPA/numpy).
+
+Para decidir `fx_backend`/`fx_backends` en `[audio]` hay que medir en la
+Pi: lo que cuesta un plugin LADSPA frente a su versión en numpy depende de
+la CPU y del blocksize. Cada preset se instancia con cada motor y procesa
+ruido durante unos segundos con el knob a `--amount`; sale la media y el
+peor bloque en µs y el % del presupuesto del bloque (lo que dura en tiempo
+real). "propio" es el camino sin plugin del preset (no hay versión LADSPA
+que elegir o el .so no carga); si con el motor LADSPA el preset acaba en
+numpy porque falta el plugin, la fila lo dice y no se repite.
+
+Uso:
+    bench_fx.py [--blocksize N] [--seconds S] [--amount A] [preset ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from lgpt_engine import EFFECT_PRESETS, FX_BACKENDS, SAMPLE_RATE, \
+    MasterChain, fx_backend, set_fx_backend
+
+
+def motor(fx) -> str:
+    """Qué motor acabó usando una instancia: ladspa, numpy o propio."""
+    plugin = getattr(fx, "eq", getattr(fx, "plugin", None))
+    if plugin is None:
+        return "propio"
+    return type(plugin).__module__.replace("_fx", "")
+
+
+def make(name: str, sr: int):
+    """Instancia de `name` (un preset o "eq", el del MasterChain) con el
+    motor activo y la función que procesa un bloque con ella."""
+    if name == "eq":
+        fx = MasterChain(sr, lo_db=3.0, mid_db=-2.0, hi_db=2.0)
+        fx.limiter = None       # se mide solo el EQ (+ el recorte suave)
+        return fx, lambda buf, amount: fx.apply(buf)
+    fx = EFFECT_PRESETS[name](sr)
+    if hasattr(fx, "set_tempo"):
+        fx.set_tempo(120.0)
+    return fx, fx.apply
+
+
+def bench(name: str, sr: int, frames: int, seconds: float,
+          amount: float) -> tuple[str, float, float]:
+    """(motor, media µs, peor µs) de `seconds` de ruido por `name`."""
+    fx, run = make(name, sr)
+    rng = np.random.default_rng(0)
+    src = (0.3 * rng.standard_normal((2, frames))).astype(np.float32)
+    buf = np.empty_like(src)
+    for _ in range(4):                      # calienta cachés y estado
+        buf[:] = src
+        run(buf, amount)
+    times = []
+    for _ in range(max(1, int(seconds * sr / frames))):
+        buf[:] = src
+        t0 = time.perf_counter()
+        run(buf, amount)
+        times.append(time.perf_counter() - t0)
+    return motor(fx), float(np.mean(times)) * 1e6, max(times) * 1e6
+
+
+def main():
+    from lgpt_player import CONFIG_PATH, load_config
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--blocksize", type=int, default=None,
+                        help="muestras por bloque (por defecto, la config)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--amount", type=float, default=0.7,
+                        help="posición del knob, 0-1")
+    parser.add_argument("names", nargs="*",
+                        help="presets (y/o eq); todos si no hay")
+    args = parser.parse_args()
+    audio = load_config(Path(args.config)).get("audio", {})
+    sr = int(audio.get("samplerate", SAMPLE_RATE))
+    frames = args.blocksize or int(audio.get("blocksize") or 2048)
+    budget = frames * 1e6 / sr
+    names = args.names or [*EFFECT_PRESETS, "eq"]
+    print(f"[bench] {frames} muestras a {sr} Hz: {budget:.0f} µs por bloque")
+    print(f"{'preset':<12} {'motor':<8} {'media µs':>9} {'peor µs':>9} "
+          f"{'%bloque':>8}")
+    for name in names:
+        seen = set()
+        for backend in FX_BACKENDS:
+            set_fx_backend(backend)
+            got, mean, worst = bench(name, sr, frames, args.seconds,
+                                     args.amount)
+            if got in seen:
+                continue
+            seen.add(got)
+            note = "" if got in (backend, "propio") else \
+                f"  (pedido {fx_backend(name)}: sin .so)"
+            print(f"{name:<12} {got:<8} {mean:9.0f} {worst:9.0f} "
+                  f"{100.0 * mean / budget:7.1f}%{note}")
+    set_fx_backend()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Coste por bloque de leer samples en float32 o en int16 (`sample_format`).
+
+Con int16 los samples ocupan la mitad, y un setlist entero cabe mejor en la
+RAM y en la caché de la Pi, pero cada lectura convierte a float. Lo que
+gana o pierde depende de la CPU y de cuánto sample se recorre por bloque,
+así que hay que medirlo allí: se escriben `--voices` WAV de 16 bits de
+`--sample-seconds` cada uno, se cargan con cada formato y suenan en bucle a
+alturas distintas (camino general de interpolación) por los dos caminos
+del engine, voz a voz y por lotes (`render_batch`). Sale la media y el peor
+bloque en µs, el % del presupuesto del bloque, la memoria de los samples y
+la mayor diferencia con la salida float32, en LSB de 16 bits.
+
+Uso:
+    bench_samples.py [--blocksize N] [--seconds S] [--voices V]
+                     [--sample-seconds S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from lgpt_engine import SAMPLE_FORMATS, SAMPLE_RATE, BatchScratch, \
+    InstrumentDef, SampleBank, Voice, VoiceScratch, render_batch
+
+
+def write_wavs(folder: Path, voices: int, seconds: float, sr: int):
+    (folder / "samples").mkdir()
+    rng = np.random.default_rng(0)
+    for k in range(voices):
+        x = 0.3 * rng.standard_normal((int(seconds * sr), 2))
+        sf.write(str(folder / "samples" / f"{k:02d}.wav"),
+                 np.clip(x, -1.0, 1.0), sr, subtype="PCM_16")
+
+
+def bench(folder: Path, fmt: str, sr: int, frames: int, seconds: float,
+          batch: bool) -> tuple[float, float, int, np.ndarray]:
+    """(media µs, peor µs, bytes de samples, salida) con `fmt`."""
+    bank = SampleBank(folder, dtype=fmt)
+    idef = InstrumentDef(index=0, sample_name="", loop=True)
+    voices = []
+    for k, name in enumerate(sorted(bank.samples)):
+        smp = bank.get(name)
+        voices.append(Voice(smp, idef, 55 + 3 * k, sr, 918.75))
+    mixes = [np.zeros((2, frames), dtype=np.float32) for _ in voices]
+    # los arrays de trabajo, reutilizados como en el engine
+    work = VoiceScratch(frames)
+    batch_work = BatchScratch(len(voices), frames)
+    out = []
+    times = []
+    for _ in range(max(1, int(seconds * sr / frames))):
+        for m in mixes:
+            m[:] = 0.0
+        t0 = time.perf_counter()
+        if batch:
+            render_batch(voices, mixes, 0, frames, batch_work)
+        else:
+            for v, m in zip(voices, mixes):
+                v.render(m, 0, frames, work)
+        times.append(time.perf_counter() - t0)
+        out.append(np.sum(mixes, axis=0))
+    times = times[4:] or times               # fuera el calentamiento
+    return (float(np.mean(times)) * 1e6, max(times) * 1e6, bank.nbytes,
+            np.concatenate(out, axis=1))
+
+
+def main():
+    from lgpt_player import CONFIG_PATH, load_config
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--blocksize", type=int, default=None,
+                        help="muestras por bloque (por defecto, la config)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--voices", type=int, default=8)
+    parser.add_argument("--sample-seconds", type=float, default=20.0)
+    args = parser.parse_args()
+    audio = load_config(Path(args.config)).get("audio", {})
+    sr = int(audio.get("samplerate", SAMPLE_RATE))
+    frames = args.blocksize or int(audio.get("blocksize") or 2048)
+    budget = frames * 1e6 / sr
+    print(f"[bench] {args.voices} voces, {frames} muestras a {sr} Hz: "
+          f"{budget:.0f} µs por bloque")
+    print(f"{'camino':<8} {'formato':<8} {'media µs':>9} {'peor µs':>9} "
+          f"{'%bloque':>8} {'MB':>6} {'LSB':>5}")
+    with tempfile.TemporaryDirectory() as d:
+        folder = Path(d)
+        write_wavs(folder, args.voices, args.sample_seconds, sr)
+        for batch in (False, True):
+            ref = None
+            for fmt in SAMPLE_FORMATS:
+                mean, worst, nbytes, out = bench(folder, fmt, sr, frames,
+                                                 args.seconds, batch)
+                if ref is None:
+                    ref = out
+                lsb = float(np.abs(out - ref).max()) * 32768.0
+                print(f"{'lotes' if batch else 'voz':<8} {fmt:<8} "
+                      f"{mean:9.0f} {worst:9.0f} "
+                      f"{100.0 * mean / budget:7.1f}% "
+                      f"{nbytes / 1e6:6.1f} {lsb:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Blocksize por canción, aprendido de los cortes en directo.
+
+El blocksize de `lttileplayer.toml` sale de medir la canción más cara
+(bulebule) y vale para todas: las que van sobradas pagan latencia de más y
+una que vaya justa en la Pi de ese día no tiene a dónde subir. Aquí el
+player apunta, al acabar cada canción, sus cortes y bloques apurados
+(`EstadoAudio`) y la peor carga que tuvo, y decide el blocksize para la
+próxima vez que suene: el siguiente más grande si cortó o fue apurada, el
+anterior si le sobró margen. Lo decidido se guarda en
+`<cache>/blocksizes.json`, así que el próximo concierto ya empieza cada
+canción con el suyo. El cambio se aplica al entrar en la canción (se
+reabre el stream), nunca a mitad.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+
+class BlocksizeMemory:
+    """Blocksize de cada canción (por nombre de proyecto), entre `minimum` y
+    `maximum` y en potencias de dos desde `default`.
+
+    Sube con un solo corte (`XRUNS_SUBE`) o con más de `APURADOS_SUBE` de
+    bloques apurados. Baja si la canción sonó al menos `MIN_S` sin cortes
+    ni apurados y con el peor bloque por debajo de `HOLGURA` del
+    presupuesto: con la mitad de muestras el presupuesto también se parte
+    por la mitad y el coste por muestra no baja (sube un poco por llamada),
+    así que esa carga pasa a ~2x `HOLGURA`, todavía bajo `CARGA_AVISO`.
+    """
+
+    XRUNS_SUBE = 1
+    APURADOS_SUBE = 0.01
+    HOLGURA = 0.35
+    MIN_S = 30.0
+
+    def __init__(self, path: Path, default: int, minimum: int | None = None,
+                 maximum: int = 8192):
+        self.path = Path(path)
+        self.default = int(default)
+        self.minimum = int(minimum or default)
+        self.maximum = max(int(maximum), self.default)
+        self.sizes: dict[str, int] = {}
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        if isinstance(data, dict):
+            for song, size in data.items():
+                try:
+                    self.sizes[str(song)] = self._clamp(int(size))
+                except (TypeError, ValueError):
+                    continue
+
+    def _clamp(self, size: int) -> int:
+        return min(max(size, self.minimum), self.maximum)
+
+    def get(self, song: str) -> int:
+        return self.sizes.get(song, self.default)
+
+    def decide(self, song: str, blocksize: int, cortes: int, apurados: int,
+               bloques: int, carga: float, samplerate: int) -> int:
+        """Apunta cómo sonó `song` con `blocksize` (cortes y apurados en
+        `bloques` bloques, peor carga como fracción del presupuesto) y
+        devuelve el blocksize para la próxima vez."""
+        size = blocksize
+        if cortes >= self.XRUNS_SUBE or \
+                (bloques and apurados / bloques > self.APURADOS_SUBE):
+            size = self._clamp(blocksize * 2)
+        elif (bloques * blocksize >= self.MIN_S * samplerate
+              and not cortes and not apurados and carga < self.HOLGURA):
+            size = self._clamp(blocksize // 2)
+        if size != self.get(song):
+            self.sizes[song] = size
+            self._save()
+        return size
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self.sizes, indent=1, sort_keys=True))
+            tmp.replace(self.path)
+        except OSError as exc:     # caché de solo lectura: se sigue igual
+            print(f"[audio] no se puede guardar {self.path}: {exc}")
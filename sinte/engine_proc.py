@@ -0,0 +1,750 @@
+"""Engine en un proceso aparte, con el audio y el control en memoria
+compartida.
+
+En el proceso del player conviven el callback de audio con la UI curses, el
+visualizador, los hilos del `EventServer`, la entrada de mido y el
+`TcpStreamer`, y todos se pelean por el GIL: un repintado o un cliente TCP
+lento retrasan el render aunque la CPU vaya sobrada, y salen bloques
+"apurados" en `EstadoAudio` sin causa a la vista. Con `engine_process` el
+`Engine` vive en un proceso hijo (con su propio GIL y prioridad de tiempo
+real) que renderiza bloques completos por delante; el padre se queda la UI y
+la red y su callback solo copia.
+
+Todo lo que cruza entre procesos va por un único bloque de
+`multiprocessing.shared_memory`, en anillos de registros de tamaño fijo con
+un escritor por contador (como `audio_ring.AudioRing`), sin locks en el
+camino de audio:
+
+* audio (hijo -> padre): bloques (frames, 2) etiquetados con la generación
+  de la canción que los produjo.
+* órdenes (padre -> hijo): `push_event`, carga de canción, panic. Las
+  escriben varios hilos del padre (MIDI, UI), que se turnan con un lock
+  local; el callback no escribe aquí.
+* MIDI de salida (hijo -> padre): las notas y CC del engine, con el instante
+  audible ya calculado, para reenviarlas a los clientes por `EventServer`.
+* reloj y catch_up (callback -> hijo) y estado (hijo -> UI): valores sueltos
+  que escribe un solo lado.
+
+Aquí está también la parte de cargar una canción que no es de la UI
+(`load_engine`): la usan igual el player en un proceso y el hijo.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+import lgpt_stems
+from lgpt_engine import CHANNEL_COUNT, EFFECT_PRESETS, Engine, MasterChain, \
+    QualityGovernor, decode_event, encode_event, note_cache_mb, \
+    set_filter_kernel, set_fx_backend, set_note_cache_mb, \
+    set_render_workers, set_sample_store_mb
+from sample_cache import SampleCache
+
+
+def sube_prioridad() -> str:
+    """Pide prioridad para el proceso; devuelve qué consiguió.
+
+    Se intenta primero tiempo real (SCHED_FIFO): con él, el hilo de audio no
+    espera a que el planificador atienda a otra cosa, que es de donde salen
+    los cortes cuando la CPU no está saturada de media pero sí a ratos.
+
+    Prioridad 10 y no más: por encima del resto pero por debajo de los hilos
+    del kernel, para que un cuelgue nuestro no deje la máquina inservible.
+
+    Si no hay permiso (hace falta rtprio en limits.conf o CAP_SYS_NICE) se
+    prueba con `nice`, y si tampoco, se sigue sin prioridad. Nunca es un
+    error fatal: el player tiene que arrancar igual.
+    """
+    try:
+        param = os.sched_param(10)
+        os.sched_setscheduler(0, os.SCHED_FIFO, param)
+        return "tiempo real (SCHED_FIFO 10)"
+    except (AttributeError, OSError, PermissionError):
+        pass
+    try:
+        os.nice(-10)
+        return f"nice {os.nice(0)}"
+    except (OSError, PermissionError):
+        return "sin prioridad (falta permiso)"
+
+
+# --------------------------------------------------------------------------
+# Carga de canción (común al player en un proceso y al hijo)
+# --------------------------------------------------------------------------
+
+def read_song_config(project_dir: Path) -> dict:
+    """robotraca.json de la canción, o {} si no hay (o no se puede leer)."""
+    cfg_file = project_dir / "robotraca.json"
+    if not cfg_file.is_file():
+        return {}
+    try:
+        return json.loads(cfg_file.read_text())
+    except (OSError, json.JSONDecodeError) as exc:
+        print(f"[config] {cfg_file.name}: {exc}")
+        return {}
+
+
+def parse_pot_target(target: str) -> tuple | None:
+    """'canales:parametro[:tope]' -> (canales, parametro, escala).
+
+    canales: uno o varios separados por coma (`2` o `1,2`), canal tracker
+    0-7; un mismo knob puede así mover varias pistas a la vez (p.ej. la
+    reverb de todos los bajos).
+    tope: recorrido máximo del knob en % (100 por defecto). Sirve para dejar
+    un efecto en una zona discreta: `1,2:reverb:35` = de 0 a 35%.
+    Devuelve None si no es válido.
+    """
+    try:
+        parts = target.split(":")
+    except AttributeError:
+        return None
+    if len(parts) == 2:
+        chans_str, name = parts
+        scale = 1.0
+    elif len(parts) == 3:
+        chans_str, name, top = parts
+        try:
+            scale = float(top) / 100.0
+        except ValueError:
+            return None
+        if not 0.0 < scale <= 1.0:
+            return None
+    else:
+        return None
+    if not name:
+        return None
+    chans = []
+    for c in chans_str.split(","):
+        try:
+            ci = int(c)
+        except ValueError:
+            return None
+        if not 0 <= ci < 8:
+            return None
+        chans.append(ci)
+    if not chans:
+        return None
+    return (tuple(chans), name, scale)
+
+
+def apply_song_config(engine: Engine, song_cfg: dict, pad_volume: float):
+    """La parte del robotraca.json que va al engine: mute de canales,
+    master, volumen de pads y efectos fijos por canal. Los knobs son cosa
+    del player (`Player._apply_song_config`)."""
+    engine.muted = set(song_cfg.get("mute", []))
+    # Volumen general de la canción (0-200, 100 = el del proyecto LGPT).
+    # Sirve para igualar la sonoridad entre canciones sin tocar el
+    # lgptsav.dat: unas están mezcladas más fuerte que otras.
+    master = song_cfg.get("master")
+    if master is not None:
+        try:
+            engine.master = engine.base_master * float(master) / 100.0
+        except (TypeError, ValueError):
+            print(f"[config] master inválido: {master!r}")
+    # volumen de pads: número (todos) o dict por pad {"2": 40}
+    pv = song_cfg.get("pad_volume", pad_volume)
+    if isinstance(pv, dict):
+        engine.pad_volume_map = {
+            int(k) - 1: float(v) / 100 for k, v in pv.items()}
+        # los pads que el dict no menciona siguen el volumen global,
+        # no el que trae el engine de fábrica
+        engine.pad_volume_default = float(pad_volume) / 100
+    else:
+        engine.pad_volume_map = {}
+        engine.pad_volume_default = float(pv) / 100
+    # Efectos fijos por canal, siempre activos y sin gastar un knob:
+    #   "fx": {"2": {"reverb": 15}}   (canal tracker 0-7, cantidad 0-100)
+    # Si un knob apunta al mismo efecto y canal, al moverlo manda el knob.
+    for ch_key, effects in (song_cfg.get("fx") or {}).items():
+        try:
+            ci = int(ch_key)
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= ci < len(engine.channels) or not isinstance(effects, dict):
+            continue
+        for name, amount in effects.items():
+            if name in EFFECT_PRESETS:
+                engine.channels[ci].fx_amounts[name] = float(amount) / 100.0
+            else:
+                print(f"[config] efecto desconocido: {name}")
+    # Los efectos que la canción puede encender (los fijos y los de sus
+    # knobs) se instancian ya, en el hilo de carga: crear un plugin LADSPA
+    # abre el .so y lo instancia, y hacerlo la primera vez que se mueve el
+    # knob era un pico seguro dentro del callback.
+    targets = [(ch.idx, name) for ch in engine.channels
+               for name in ch.fx_amounts]
+    for value in (song_cfg.get("pots") or {}).values():
+        target = parse_pot_target(value)
+        if target is not None:
+            chans, name, _scale = target
+            targets.extend((ci, name) for ci in chans)
+    engine.preload_fx(targets)
+
+
+def load_engine(project_dir: Path, opts: dict, song_cfg: dict,
+                live: set[int] | None) -> Engine:
+    """Engine listo para sonar: cadena de master, config de la canción y
+    stems para los canales fuera de `live` (ver `lgpt_stems.live_channels`).
+
+    opts: samplerate, delay, wavs_dir, master_fx, pad_volume, stems,
+    sample_cache, lazy_samples, sample_format, stream_mb, cache_dir,
+    quality_governor
+    (lo que el player saca de lttileplayer.toml)."""
+    sr = opts["samplerate"]
+    cache = SampleCache(Path(opts["cache_dir"]) / "samples") \
+        if opts.get("sample_cache") else None
+    engine = Engine(project_dir, sample_rate=sr,
+                    audio_delay=opts["delay"], wavs_dir=opts["wavs_dir"],
+                    sample_cache=cache,
+                    lazy_samples=bool(opts.get("lazy_samples")),
+                    sample_format=opts.get("sample_format", "float32"),
+                    stream_mb=float(opts.get("stream_mb", 0.0)))
+    print(f"[engine] {project_dir.name}: {engine.bank.report()}", flush=True)
+    engine.governor.enabled = bool(opts.get("quality_governor", True))
+    m = opts["master_fx"]
+    if m:
+        engine.master_chain = MasterChain(
+            sr,
+            lo_db=float(m.get("eq_lo", 0.0)),
+            mid_db=float(m.get("eq_mid", 0.0)),
+            hi_db=float(m.get("eq_hi", 0.0)),
+            limit_db=float(m.get("limit", -1.0)),
+            release_s=float(m.get("release", 0.15)),
+            gain_db=float(m.get("gain", 0.0)))
+    engine.start()
+    apply_song_config(engine, song_cfg, opts["pad_volume"])
+    if opts["stems"] and live is not None:
+        # Sirve de los stems pre-renderizados (lgpt_stems.py) los canales
+        # que ningún knob toca en la voz; el resto se sintetiza en directo.
+        # Sin stems grabados para esta versión de la canción, todo en directo.
+        stems = lgpt_stems.load(project_dir, Path(opts["cache_dir"]), sr)
+        if stems is not None:
+            engine.stems = {ci: s for ci, s in stems.items()
+                            if ci not in live}
+    return engine
+
+
+# --------------------------------------------------------------------------
+# Memoria compartida
+# --------------------------------------------------------------------------
+
+CMD_SLOTS = 256
+MIDI_SLOTS = 512
+
+# Órdenes padre -> hijo: registro int64 [tipo, a, b, c, t], con t el
+# instante del envío en µs (time.time()). Las 6 primeras son los eventos de
+# `Engine.push_event`, con los mismos números que `encode_event`; el hijo
+# los encola con el instante del padre, así que suenan en su muestra.
+CMD_CC, CMD_PARAM, CMD_TRIGGER, CMD_PLAY, CMD_PAUSE, CMD_STOP, \
+    CMD_LOAD, CMD_UNLOAD, CMD_PANIC, CMD_QUIT = range(1, 11)
+
+# MIDI hijo -> padre: registro float64 [tipo, a, b, c, ms audible].
+MIDI_METHODS = ("note_on", "note_off", "cc", "program_change",
+                "transport_start", "transport_stop")
+
+# Estado hijo -> UI: cabecera + campos por canal + efectos por canal.
+(G_GEN, G_PLAYING, G_FINISHED, G_TEMPO, G_RENDER_ULTIMA, G_RENDER_PEOR,
+ G_RENDER_DESDE, G_CACHE_HITS, G_CACHE_MISSES, G_CACHE_BYTES,
+ G_SKIPPED, G_QUALITY, G_QUALITY_T, G_EVENTS_LOST) = range(14)
+G_FIELDS = 14
+(C_SONG_POS, C_ACTIVE, C_NOTE, C_VOL_CUR, C_PAN, C_CC_PAN, C_CC_VOL,
+ C_CC_PITCH, C_MIDI_NOTE, C_LAST_NOTE, C_LAST_INSTR, C_PLAYING,
+ C_MUTED) = range(13)
+C_FIELDS = 13
+NFX = len(EFFECT_PRESETS)
+
+
+def _layout(slots: int, frames: int) -> list[tuple]:
+    return [
+        ("audio", (slots, frames, 2), np.float32),
+        ("audio_gen", (slots,), np.int64),
+        ("audio_cuenta", (2,), np.int64),    # [publicados, consumidos]
+        ("cmd", (CMD_SLOTS, 5), np.int64),
+        ("cmd_cuenta", (2,), np.int64),
+        ("midi", (MIDI_SLOTS, 5), np.float64),
+        ("midi_cuenta", (2,), np.int64),
+        ("reloj", (3,), np.float64),         # [secuencia, bloque, ms]
+        ("catch_up", (1,), np.float64),      # segundos pedidos (acumulado)
+        ("estado", (G_FIELDS + CHANNEL_COUNT * (C_FIELDS + NFX),),
+         np.float64),
+    ]
+
+
+class Compartido:
+    """Los arrays de `_layout` sobre un único bloque de memoria compartida.
+
+    Sin `name` lo crea (el padre); con `name` se engancha al existente (el
+    hijo). Las dos partes derivan la misma disposición de (slots, frames)."""
+
+    def __init__(self, slots: int, frames: int, name: str | None = None):
+        spec = _layout(slots, frames)
+        size = 0
+        for _key, shape, dtype in spec:
+            size += -size % 8 + int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        offset = 0
+        for key, shape, dtype in spec:
+            offset += -offset % 8
+            arr = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                             offset=offset)
+            if self._owner:
+                arr[...] = 0
+            setattr(self, key, arr)
+            offset += arr.nbytes
+        self.name = self.shm.name
+
+    def close(self):
+        for key, _shape, _dtype in _layout(1, 1):
+            setattr(self, key, None)    # con vistas vivas no se puede cerrar
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+# --------------------------------------------------------------------------
+# Lado hijo
+# --------------------------------------------------------------------------
+
+class _MidiRelay:
+    """Sink MidiOut del engine hijo: apunta cada evento con su instante
+    audible en el anillo MIDI; el padre lo reenvía a los clientes."""
+
+    def __init__(self, comp: Compartido):
+        self.comp = comp
+        self.engine: Engine | None = None
+
+    def _put(self, method: str, a=0, b=0, c=0):
+        comp = self.comp
+        w, r = comp.midi_cuenta
+        if w - r >= MIDI_SLOTS:
+            return                       # padre atascado: se pierde
+        audible = self.engine.event_time_ms() if self.engine is not None \
+            else time.time() * 1000.0
+        comp.midi[w % MIDI_SLOTS] = (MIDI_METHODS.index(method), a, b, c,
+                                     audible)
+        comp.midi_cuenta[0] += 1
+
+    def note_on(self, channel, note, velocity):
+        self._put("note_on", channel, note, velocity)
+
+    def note_off(self, channel, note):
+        self._put("note_off", channel, note)
+
+    def cc(self, channel, control, value):
+        self._put("cc", channel, control, value)
+
+    def program_change(self, channel, program):
+        self._put("program_change", channel, program)
+
+    def transport_start(self):
+        self._put("transport_start")
+
+    def transport_stop(self, finished: bool):
+        self._put("transport_stop", int(finished))
+
+
+def _publish_state(comp: Compartido, engine: Engine, gen: int):
+    """Foto del engine para la UI del padre. Se escribe sin coordinar: una
+    lectura a medias da un valor de hace un bloque, nunca un fallo."""
+    st = comp.estado
+    st[G_PLAYING] = engine.playing
+    st[G_FINISHED] = engine.finished
+    st[G_TEMPO] = engine.tempo
+    nc = engine.note_cache
+    if nc is not None:
+        st[G_CACHE_HITS] = nc.hits
+        st[G_CACHE_MISSES] = nc.misses
+        st[G_CACHE_BYTES] = nc.nbytes
+    st[G_SKIPPED] = engine.skipped
+    st[G_EVENTS_LOST] = engine.events_lost
+    gov = engine.governor
+    if gov.log:
+        st[G_QUALITY_T] = gov.log[-1][0]
+    st[G_QUALITY] = gov.level
+    base = G_FIELDS
+    fx_base = G_FIELDS + CHANNEL_COUNT * C_FIELDS
+    for ch in engine.channels:
+        row = st[base + ch.idx * C_FIELDS:base + (ch.idx + 1) * C_FIELDS]
+        v = ch.voice
+        row[C_SONG_POS] = ch.song_pos
+        row[C_ACTIVE] = v is not None and v.active
+        row[C_NOTE] = v.note if v is not None else -1
+        row[C_VOL_CUR] = v.vol_cur if v is not None else 0.0
+        row[C_PAN] = v.pan if v is not None else 127
+        row[C_CC_PAN] = -1 if ch.cc_pan is None else ch.cc_pan
+        row[C_CC_VOL] = ch.cc_vol
+        row[C_CC_PITCH] = ch.cc_pitch
+        row[C_MIDI_NOTE] = -1 if ch.midi_note is None else ch.midi_note
+        row[C_LAST_NOTE] = -1 if ch.last_note is None else ch.last_note
+        row[C_LAST_INSTR] = -1 if ch.last_instr is None else ch.last_instr
+        row[C_PLAYING] = ch.playing
+        row[C_MUTED] = ch.idx in engine.muted
+        fx = st[fx_base + ch.idx * NFX:fx_base + (ch.idx + 1) * NFX]
+        for i, name in enumerate(EFFECT_PRESETS):
+            fx[i] = ch.fx_amounts.get(name, 0.0)
+    st[G_GEN] = gen                      # al final: la foto ya es de `gen`
+
+
+def _child_main(shm_name: str, slots: int, frames: int,
+                projects: list, opts: dict):
+    """Bucle del proceso hijo: atiende órdenes y mantiene lleno el anillo."""
+    print(f"[engine] proceso {os.getpid()}: {sube_prioridad()}", flush=True)
+    set_filter_kernel(opts.get("filter_kernel", "auto"))
+    set_render_workers(opts.get("render_workers", 1))
+    set_note_cache_mb(opts.get("note_cache_mb", note_cache_mb()))
+    set_sample_store_mb(opts.get("sample_store_mb", 0))
+    set_fx_backend(opts.get("fx_backend", "ladspa"),
+                   opts.get("fx_backends"))
+    comp = Compartido(slots, frames, name=shm_name)
+    relay = _MidiRelay(comp)
+    engine: Engine | None = None
+    gen = 0
+    hecho_s = 0.0
+    bloque_ms = frames * 1000.0 / opts["samplerate"]
+    espera = bloque_ms / 4000.0
+    peor_desde = 0.0
+    try:
+        while True:
+            # 1. órdenes del padre
+            while comp.cmd_cuenta[1] < comp.cmd_cuenta[0]:
+                rec = comp.cmd[int(comp.cmd_cuenta[1]) % CMD_SLOTS].copy()
+                comp.cmd_cuenta[1] += 1
+                kind = int(rec[0])
+                if kind == CMD_QUIT:
+                    if engine is not None:
+                        engine.panic()
+                    return
+                if kind == CMD_LOAD:
+                    old = engine
+                    if old is not None:
+                        old.panic()
+                    project_dir = Path(projects[int(rec[1])])
+                    mask = int(rec[2])
+                    live = None if mask < 0 else {
+                        ci for ci in range(CHANNEL_COUNT) if mask >> ci & 1}
+                    engine = load_engine(project_dir, opts,
+                                         read_song_config(project_dir), live)
+                    engine.prepare(frames)
+                    engine.midi_out = relay
+                    relay.engine = engine
+                    if old is not None:        # después: comparten samples
+                        old.bank.close()
+                    gen = int(rec[3])
+                    hecho_s = float(comp.catch_up[0])
+                    _publish_state(comp, engine, gen)
+                elif kind == CMD_UNLOAD:
+                    if engine is not None:
+                        engine.panic()
+                        engine.bank.close()
+                    engine = None
+                    relay.engine = None
+                elif engine is None:
+                    continue
+                elif kind == CMD_PANIC:
+                    engine.panic()
+                else:
+                    engine.push_event(*decode_event(rec[:4]),
+                                      t_ms=rec[4] / 1000.0)
+            # 2. un bloque más, si cabe
+            w, r = comp.audio_cuenta
+            if engine is None or w - r >= slots:
+                time.sleep(espera)
+                continue
+            pedido = float(comp.catch_up[0])
+            if pedido > hecho_s:
+                engine.catch_up(pedido - hecho_s)
+            hecho_s = pedido
+            engine.block_time_ms = _prevision_ms(comp, int(w), bloque_ms)
+            t0 = time.perf_counter()
+            i = int(w) % slots
+            engine.render_into(comp.audio[i])
+            ms = (time.perf_counter() - t0) * 1000.0
+            comp.audio_gen[i] = gen
+            comp.audio_cuenta[0] += 1
+            st = comp.estado
+            st[G_RENDER_ULTIMA] = ms
+            st[G_RENDER_PEOR] = max(ms, st[G_RENDER_PEOR])
+            peor_desde = max(ms, peor_desde * 0.999)
+            st[G_RENDER_DESDE] = peor_desde
+            engine.governor.update(ms / bloque_ms, bloque_ms / 1000.0)
+            _publish_state(comp, engine, gen)
+    finally:
+        comp.close()
+
+
+def _prevision_ms(comp: Compartido, k: int, bloque_ms: float) -> float:
+    """Instante de pared en que sonará el bloque `k`, proyectado desde el
+    último que publicó el callback (ver `EngineProcess.done`). El reloj va
+    con contador de secuencia: impar = el callback lo está escribiendo."""
+    reloj = comp.reloj
+    while True:
+        seq = reloj[0]
+        k0, ms = reloj[1], reloj[2]
+        if seq == reloj[0] and int(seq) % 2 == 0:
+            break
+    if seq == 0:                         # aún no ha sonado ningún bloque
+        w, r = comp.audio_cuenta
+        return time.time() * 1000.0 + (w - r) * bloque_ms
+    return ms + (k - k0) * bloque_ms
+
+
+# --------------------------------------------------------------------------
+# Lado padre
+# --------------------------------------------------------------------------
+
+class EngineProcess:
+    """Engine en un proceso hijo, visto desde el player.
+
+    `load()` devuelve un `EngineProxy` que hace de engine para el resto del
+    player (push_event, panic y lo que lee la UI). El callback usa `pop()`,
+    `done()` y `catch_up()`, que no bloquean ni toman locks."""
+
+    def __init__(self, projects: list[Path], opts: dict, frames: int,
+                 slots: int, estado):
+        self.projects = list(projects)
+        self.frames = frames
+        self.slots = slots
+        self.estado = estado
+        self.bloque_ms = frames * 1000.0 / opts["samplerate"]
+        self.comp = Compartido(slots, frames)
+        self.generacion = 0
+        self.perdidas = 0                  # órdenes con la cola llena
+        self.midi_out = None               # sink MidiOut del padre
+        self._lock = threading.Lock()      # entre hilos del padre
+        self._seq = 0
+        self._stop = False
+        ctx = multiprocessing.get_context("spawn")
+        self.proc = ctx.Process(
+            target=_child_main, name="engine", daemon=True,
+            args=(self.comp.name, slots, frames,
+                  [str(p) for p in self.projects], opts))
+        self._midi_thread = threading.Thread(
+            target=self._midi_loop, daemon=True, name="engine-midi")
+
+    def start(self):
+        self.proc.start()
+        self._midi_thread.start()
+
+    def close(self):
+        self.send(CMD_QUIT)
+        self.proc.join(timeout=2.0)
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join()
+        self._stop = True
+        self._midi_thread.join()
+        self.comp.close()
+
+    def send(self, kind: int, a: int = 0, b: int = 0, c: int = 0) -> bool:
+        comp = self.comp
+        with self._lock:
+            w, r = comp.cmd_cuenta
+            if w - r >= CMD_SLOTS:
+                self.perdidas += 1
+                return False
+            comp.cmd[w % CMD_SLOTS] = (kind, a, b, c,
+                                       int(time.time() * 1e6))
+            comp.cmd_cuenta[0] += 1
+        return True
+
+    def load(self, index: int, live: set[int] | None) -> "EngineProxy":
+        """Carga en el hijo la canción `index` de `projects`."""
+        self.generacion += 1
+        mask = -1 if live is None else sum(1 << ci for ci in live)
+        self.send(CMD_LOAD, index, mask, self.generacion)
+        return EngineProxy(self, self.projects[index], self.generacion)
+
+    def unload(self):
+        self.send(CMD_UNLOAD)
+
+    def cargado(self) -> bool:
+        """True cuando el hijo ya suena con la última canción pedida."""
+        return int(self.comp.estado[G_GEN]) == self.generacion
+
+    # -- callback de audio ------------------------------------------------
+
+    def catch_up(self, seconds: float):
+        self.comp.catch_up[0] += seconds
+
+    def pop(self) -> np.ndarray | None:
+        """Bloque de la canción actual o None si no hay ninguno listo. Lo
+        de canciones anteriores se descarta. Después, `done()`."""
+        comp = self.comp
+        while comp.audio_cuenta[1] < comp.audio_cuenta[0]:
+            i = int(comp.audio_cuenta[1]) % self.slots
+            if comp.audio_gen[i] == self.generacion:
+                return comp.audio[i]
+            comp.audio_cuenta[1] += 1
+        return None
+
+    def done(self, block_time_ms: float):
+        """Libera el bloque de `pop()`, que sonará en `block_time_ms`."""
+        comp = self.comp
+        reloj = comp.reloj
+        self._seq += 1
+        reloj[0] = self._seq * 2 - 1       # impar: escribiendo
+        reloj[1] = comp.audio_cuenta[1]
+        reloj[2] = block_time_ms
+        reloj[0] = self._seq * 2
+        comp.audio_cuenta[1] += 1
+        st = comp.estado
+        est = self.estado
+        est.render_ultima_ms = st[G_RENDER_ULTIMA]
+        est.render_peor_ms = st[G_RENDER_PEOR]
+        est.render_peor_desde = st[G_RENDER_DESDE]
+        est.carga_cancion = max(est.carga_cancion,
+                                st[G_RENDER_ULTIMA] / self.bloque_ms)
+
+    # -- MIDI de vuelta -----------------------------------------------------
+
+    def _midi_loop(self):
+        """Reenvía al sink del padre el MIDI del engine hijo. Los eventos
+        llevan el instante audible (un `audio_delay` por delante), así que
+        unos ms de sondeo no se notan en los clientes."""
+        comp = self.comp
+        while not self._stop:
+            if comp.midi_cuenta[1] == comp.midi_cuenta[0]:
+                time.sleep(0.005)
+                continue
+            rec = comp.midi[int(comp.midi_cuenta[1]) % MIDI_SLOTS].copy()
+            comp.midi_cuenta[1] += 1
+            sink = self.midi_out
+            if sink is None:
+                continue
+            kind, a, b, c, audible = (int(x) for x in rec)
+            method = MIDI_METHODS[kind]
+            args = {"note_on": (a, b, c), "note_off": (a, b),
+                    "cc": (a, b, c), "program_change": (a, b),
+                    "transport_start": (),
+                    "transport_stop": (bool(a),)}[method]
+            # el sink (EventMidiOut) acepta el instante audible ya calculado
+            getattr(sink, method)(*args, audible_ms=audible)
+
+
+class EngineProxy:
+    """Lo que el player ve del engine hijo: la misma interfaz que `Engine`
+    en lo que usan la UI, la entrada MIDI y el `EventMidiOut`."""
+
+    def __init__(self, proc: EngineProcess, project_dir: Path, gen: int):
+        self._proc = proc
+        self.gen = gen
+        self.project = SimpleNamespace(dir=Path(project_dir))
+
+    def push_event(self, *event):
+        rec = encode_event(event)
+        if rec is not None:
+            self._proc.send(*rec)
+
+    def panic(self):
+        self._proc.send(CMD_PANIC)
+
+    def event_time_ms(self) -> int:
+        return int(time.time() * 1000)
+
+    def _estado(self) -> np.ndarray | None:
+        st = self._proc.comp.estado
+        return st if int(st[G_GEN]) == self.gen else None
+
+    @property
+    def playing(self) -> bool:
+        st = self._estado()
+        return st is not None and bool(st[G_PLAYING])
+
+    @property
+    def finished(self) -> bool:
+        st = self._estado()
+        return st is not None and bool(st[G_FINISHED])
+
+    @property
+    def tempo(self) -> float:
+        st = self._estado()
+        return float(st[G_TEMPO]) if st is not None else 0.0
+
+    @property
+    def note_cache(self) -> SimpleNamespace | None:
+        """Contadores de la `NoteCache` del hijo (None sin caché)."""
+        st = self._estado()
+        if st is None or st[G_CACHE_HITS] + st[G_CACHE_MISSES] == 0:
+            return None
+        return SimpleNamespace(hits=int(st[G_CACHE_HITS]),
+                               misses=int(st[G_CACHE_MISSES]),
+                               nbytes=int(st[G_CACHE_BYTES]))
+
+    @property
+    def skipped(self) -> int:
+        """Pasos ahorrados por silencio en el último bloque del hijo."""
+        st = self._estado()
+        return int(st[G_SKIPPED]) if st is not None else 0
+
+    @property
+    def events_lost(self) -> int:
+        """Eventos perdidos con una cola llena: la de órdenes hacia el hijo
+        o la del propio engine."""
+        st = self._estado()
+        lost = int(st[G_EVENTS_LOST]) if st is not None else 0
+        return lost + self._proc.perdidas
+
+    @property
+    def governor(self) -> SimpleNamespace:
+        """Nivel del `QualityGovernor` del hijo y su último cambio (el
+        `log` solo con ese: el resto se queda en el hijo)."""
+        st = self._estado()
+        level = int(st[G_QUALITY]) if st is not None else 0
+        log = [] if st is None or not st[G_QUALITY_T] else \
+            [(float(st[G_QUALITY_T]), level, QualityGovernor.describe(level))]
+        return SimpleNamespace(level=level, log=log)
+
+    @property
+    def muted(self) -> set[int]:
+        return {ch.idx for ch in self.channels if ch.muted}
+
+    @property
+    def channels(self) -> list[SimpleNamespace]:
+        st = self._estado()
+        if st is None:
+            st = np.zeros_like(self._proc.comp.estado)
+        out = []
+        fx_base = G_FIELDS + CHANNEL_COUNT * C_FIELDS
+        for ci in range(CHANNEL_COUNT):
+            row = st[G_FIELDS + ci * C_FIELDS:G_FIELDS + (ci + 1) * C_FIELDS]
+            fx = st[fx_base + ci * NFX:fx_base + (ci + 1) * NFX]
+            voice = None
+            if row[C_NOTE] >= 0:
+                voice = SimpleNamespace(
+                    note=int(row[C_NOTE]), active=bool(row[C_ACTIVE]),
+                    vol_cur=float(row[C_VOL_CUR]), pan=int(row[C_PAN]),
+                    cc_pan=None if row[C_CC_PAN] < 0 else int(row[C_CC_PAN]))
+            out.append(SimpleNamespace(
+                idx=ci, voice=voice, song_pos=int(row[C_SONG_POS]),
+                cc_vol=float(row[C_CC_VOL]),
+                cc_pan=None if row[C_CC_PAN] < 0 else int(row[C_CC_PAN]),
+                cc_pitch=float(row[C_CC_PITCH]),
+                midi_note=_opt(row[C_MIDI_NOTE]),
+                last_note=_opt(row[C_LAST_NOTE]),
+                last_instr=_opt(row[C_LAST_INSTR]),
+                playing=bool(row[C_PLAYING]), muted=bool(row[C_MUTED]),
+                fx_amounts={name: float(fx[i])
+                            for i, name in enumerate(EFFECT_PRESETS)
+                            if fx[i] > 0.0}))
+        return out
+
+    def song_positions(self) -> list[int]:
+        return [ch.song_pos for ch in self.channels]
+
+
+def _opt(x: float) -> int | None:
+    return None if x < 0 else int(x)
@@ -212,27 +212,31 @@ class EventMidiOut:
         self._engine_ref = engine_ref      # {"engine": Engine} del player
         self.client_delay_ms = client_delay_ms
 
-    def _ts(self) -> int:
-        engine = self._engine_ref.get("engine")
-        audible = engine.event_time_ms() if engine is not None else now_ms()
-        return audible - self.client_delay_ms
-
-    def note_on(self, channel, note, velocity):
-        self.server.emit("NOTA", self._ts(), note, channel, velocity)
-
-    def note_off(self, channel, note):
+    def _ts(self, audible_ms: int | None = None) -> int:
+        # audible_ms: instante ya calculado por un engine en otro proceso
+        # (engine_proc), que no se puede consultar desde aquí.
+        if audible_ms is None:
+            engine = self._engine_ref.get("engine")
+            audible_ms = engine.event_time_ms() if engine is not None \
+                else now_ms()
+        return audible_ms - self.client_delay_ms
+
+    def note_on(self, channel, note, velocity, audible_ms=None):
+        self.server.emit("NOTA", self._ts(audible_ms), note, channel, velocity)
+
+    def note_off(self, channel, note, audible_ms=None):
         # El protocolo no lleva note off: los clientes disparan solenoides con
         # la nota y cierran solos. Se ignora a propósito.
         pass
 
-    def cc(self, channel, control, value):
-        self.server.emit("CC", self._ts(), value, channel, control)
+    def cc(self, channel, control, value, audible_ms=None):
+        self.server.emit("CC", self._ts(audible_ms), value, channel, control)
 
-    def program_change(self, channel, program):
+    def program_change(self, channel, program, audible_ms=None):
         pass                                # sin equivalente en el protocolo
 
-    def transport_start(self):
-        self.server.emit("START", self._ts())
+    def transport_start(self, audible_ms=None):
+        self.server.emit("START", self._ts(audible_ms))
 
-    def transport_stop(self, finished: bool):
-        self.server.emit("END" if finished else "STOP", self._ts())
+    def transport_stop(self, finished: bool, audible_ms=None):
+        self.server.emit("END" if finished else "STOP", self._ts(audible_ms))
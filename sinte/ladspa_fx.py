@@ -16,6 +16,9 @@ from pathlib import Path
 
 import numpy as np
 
+# ladspa.h: el plugin no admite el mismo buffer en entrada y salida
+LADSPA_PROPERTY_INPLACE_BROKEN = 0x4
+
 SVF_PATH = "/usr/lib/ladspa/svf_1214.so"
 SVF_ID = 1214
 
@@ -52,26 +55,39 @@ class _Descriptor(ctypes.Structure):
     ]
 
 
+# Librerías abiertas y descriptores ya localizados, compartidos por todas
+# las instancias del proceso (y entre canciones): (ruta, id) -> (lib, desc).
+_DESCRIPTORS: dict[tuple[str, int], tuple] = {}
+
+
+def _descriptor(path: str, unique_id: int):
+    """(CDLL, puntero al descriptor) del plugin `unique_id` de `path`. Abre
+    el .so y recorre sus descriptores solo la primera vez."""
+    key = (path, unique_id)
+    got = _DESCRIPTORS.get(key)
+    if got is not None:
+        return got
+    if not Path(path).is_file():
+        raise FileNotFoundError(path)
+    lib = ctypes.CDLL(path)
+    desc_fn = lib.ladspa_descriptor
+    desc_fn.restype = ctypes.POINTER(_Descriptor)
+    desc_fn.argtypes = [ctypes.c_ulong]
+    for i in range(512):
+        d = desc_fn(i)
+        if not d:
+            break
+        if d.contents.UniqueID == unique_id:
+            _DESCRIPTORS[key] = (lib, d)
+            return lib, d
+    raise RuntimeError(f"plugin {unique_id} no encontrado en {path}")
+
+
 class LadspaPlugin:
     """Instancia genérica de un plugin LADSPA (un canal de audio)."""
 
     def __init__(self, path: str, unique_id: int, sample_rate: int):
-        if not Path(path).is_file():
-            raise FileNotFoundError(path)
-        self._lib = ctypes.CDLL(path)
-        desc_fn = self._lib.ladspa_descriptor
-        desc_fn.restype = ctypes.POINTER(_Descriptor)
-        desc_fn.argtypes = [ctypes.c_ulong]
-        desc_ptr = None
-        for i in range(512):
-            d = desc_fn(i)
-            if not d:
-                break
-            if d.contents.UniqueID == unique_id:
-                desc_ptr = d
-                break
-        if desc_ptr is None:
-            raise RuntimeError(f"plugin {unique_id} no encontrado en {path}")
+        self._lib, desc_ptr = _descriptor(path, unique_id)
         self._desc_ptr = desc_ptr
         desc = desc_ptr.contents
 
@@ -87,10 +103,21 @@ class LadspaPlugin:
             desc.connect_port)
         self._run = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_ulong)(
             desc.run)
+        # El handle ya convertido: run() por bloque es una sola llamada
+        # foránea, sin reconvertir argumentos ni reconectar puertos.
+        self._h = ctypes.c_void_p(self._handle)
         if desc.activate:
             activate = ctypes.CFUNCTYPE(None, ctypes.c_void_p)(desc.activate)
             activate(self._handle)
         self._controls: dict[int, ctypes.c_float] = {}
+        self._values: dict[int, float] = {}
+        # Buffers de audio propios, por grupo de puertos (ver _bind).
+        self._io: dict[tuple, np.ndarray] = {}
+        # run() conecta los puertos al propio bloque (ver run): dirección
+        # conectada por (entrada, salida). Los plugins que declaran roto el
+        # uso de un mismo buffer para las dos van siempre por el propio.
+        self._direct: dict[tuple, int] = {}
+        self._inplace = not desc.Properties & LADSPA_PROPERTY_INPLACE_BROKEN
         # Conecta TODOS los puertos de control, de entrada y de salida: el
         # plugin lee los de entrada y ESCRIBE en los de salida (latencia,
         # atenuación...) aunque no los usemos. Puntero sin conectar = segfault.
@@ -102,19 +129,91 @@ class LadspaPlugin:
                 self.set_control(port, 0.0)
 
     def set_control(self, port: int, value: float):
+        """Escribe un control; si no ha cambiado no toca nada (los efectos
+        lo llaman en cada bloque aunque el knob esté quieto)."""
+        value = float(value)
+        if self._values.get(port) == value:
+            return
+        self._values[port] = value
         f = self._controls.get(port)
         if f is None:
-            f = ctypes.c_float(float(value))
+            f = ctypes.c_float(value)
             self._controls[port] = f
             self._connect(self._handle, port, ctypes.byref(f))
         else:
-            f.value = float(value)
+            f.value = value
+
+    def _bind(self, groups: tuple, n: int) -> np.ndarray:
+        """Buffer propio (len(groups), >= n) alineado a 64 bytes, con la fila
+        i conectada al puerto `groups[i]` (o a todos, si es una tupla). Se
+        conecta una vez y solo se reconecta si un bloque más largo obliga a
+        crecer."""
+        io = self._io.get(groups)
+        if io is None or io.shape[1] < n:
+            io = _aligned(len(groups), max(n, 1024))
+            for row, ports in zip(io, groups):
+                ptr = row.ctypes.data_as(ctypes.c_void_p)
+                for port in ports if isinstance(ports, tuple) else (ports,):
+                    self._connect(self._handle, port, ptr)
+            self._io[groups] = io
+        return io
+
+    def _process(self, ports: tuple, ins: tuple, outs: tuple):
+        """Una pasada con entradas y salidas separadas: `ports` son los
+        puertos de `ins` y luego los de `outs`, en ese orden. Copia: quien
+        llama puede pasar como salida su propia entrada (el limitador del
+        master), que en puertos distintos no todos los plugins admiten, y
+        son buses que van una vez por bloque, no uno por canal."""
+        n = len(ins[0])
+        io = self._bind(ports, n)
+        for i, x in enumerate(ins):
+            io[i, :n] = x
+        self._run(self._h, n)
+        k = len(ins)
+        for i, y in enumerate(outs):
+            y[:] = io[k + i, :n]
 
     def run(self, buf: np.ndarray, in_port: int, out_port: int):
-        data = buf.ctypes.data_as(ctypes.c_void_p)
-        self._connect(self._handle, in_port, data)
-        self._connect(self._handle, out_port, data)
-        self._run(self._handle, len(buf))
+        """Procesa `buf` (1-D float32) in situ. Una fila contigua (las de
+        los bloques planares lo son) se conecta directamente a entrada y
+        salida y el plugin trabaja sobre ella, sin copias; solo se reconecta
+        si el bloque llega en otra dirección. Si no, o si el plugin no
+        admite entrada y salida en el mismo buffer, se copia al propio y
+        vuelta."""
+        n = len(buf)
+        key = (in_port, out_port)
+        if self._inplace and buf.dtype == np.float32 \
+                and buf.flags.c_contiguous:
+            addr = buf.ctypes.data
+            if self._direct.get(key) != addr:
+                ptr = ctypes.c_void_p(addr)
+                self._connect(self._handle, in_port, ptr)
+                self._connect(self._handle, out_port, ptr)
+                self._direct[key] = addr
+                self._io.pop((key,), None)     # ya no apunta a él
+            self._run(self._h, n)
+            return
+        if self._direct.pop(key, None) is not None:
+            self._io.pop((key,), None)         # hay que volver a conectarlo
+        io = self._bind((key,), n)[0, :n]
+        io[:] = buf
+        self._run(self._h, n)
+        buf[:] = io
+
+
+def _aligned(rows: int, n: int) -> np.ndarray:
+    """Array float32 (rows, n') a cero con cada fila alineada a 64 bytes
+    (n' = n redondeado a 16 muestras)."""
+    n = -(-n // 16) * 16
+    raw = np.zeros(rows * n + 16, dtype=np.float32)
+    off = (-raw.ctypes.data % 64) // 4
+    return raw[off:off + rows * n].reshape(rows, n)
+
+
+def run_planar(left: LadspaPlugin, right: LadspaPlugin, buf: np.ndarray):
+    """Pasa un bloque planar (2, n) por dos instancias mono, in situ."""
+    left.run(buf[0])
+    right.run(buf[1])
 
 
 class LadspaSVF(LadspaPlugin):
@@ -190,13 +289,8 @@ class LadspaStereoSVF:
         self.right.set(freq_hz, res)
 
     def run(self, buf: np.ndarray):
-        """buf (n, 2) float32, in-place."""
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 class LadspaStereoAutoFilter(LadspaStereoSVF):
@@ -239,12 +333,8 @@ class LadspaStereoOverdrive:
         self.right.set(drive)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 FOLDOVER_PATH = "/usr/lib/ladspa/foldover_1213.so"
@@ -288,12 +378,8 @@ class LadspaStereoFoldover:
         self.right.set(self._drive)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
         buf *= 1.0 / (1.0 + self._drive)
 
 
@@ -334,12 +420,8 @@ class LadspaStereoDivider:
         self.right.set(denominator)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 SATAN_PATH = "/usr/lib/ladspa/satan_maximiser_1408.so"
@@ -378,12 +460,8 @@ class LadspaStereoSatan:
         self.right.set(knee_db)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 RINGMOD_PATH = "/usr/lib/ladspa/ringmod_1188.so"
@@ -392,17 +470,25 @@ RINGMOD_ID = 1189
 # Puertos del Ringmod with LFO
 RM_DEPTH = 0            # 0=none, 1=AM, 2=RM
 RM_FREQ = 1             # 1-1000 Hz
-RM_SINE = 2
+RM_SINE = 2             # ganancias de cada forma de onda del LFO
+RM_TRIANGLE = 3
+RM_SAW = 4
+RM_SQUARE = 5
 RM_INPUT = 6
 RM_OUTPUT = 7
 
 
 class LadspaRingmod(LadspaPlugin):
-    """Ringmod with LFO (swh): textura robótica/metálica."""
+    """Ringmod with LFO (swh): textura robótica/metálica. `wave` elige la
+    forma del LFO: "sine" (ringmod) o "triangle" (chopper)."""
 
-    def __init__(self, sample_rate: int, path: str = RINGMOD_PATH):
+    _WAVES = {"sine": RM_SINE, "triangle": RM_TRIANGLE}
+
+    def __init__(self, sample_rate: int, path: str = RINGMOD_PATH,
+                 wave: str = "sine"):
         super().__init__(path, RINGMOD_ID, sample_rate)
-        self.set_control(RM_SINE, 1.0)
+        for port in (RM_SINE, RM_TRIANGLE, RM_SAW, RM_SQUARE):
+            self.set_control(port, 1.0 if port == self._WAVES[wave] else 0.0)
 
     def set(self, depth: float, freq_hz: float):
         self.set_control(RM_DEPTH, min(max(depth, 0.0), 2.0))
@@ -415,21 +501,17 @@ class LadspaRingmod(LadspaPlugin):
 class LadspaStereoRingmod:
     """Dos instancias mono para el buffer estéreo del canal."""
 
-    def __init__(self, sample_rate: int):
-        self.left = LadspaRingmod(sample_rate)
-        self.right = LadspaRingmod(sample_rate)
+    def __init__(self, sample_rate: int, wave: str = "sine"):
+        self.left = LadspaRingmod(sample_rate, wave=wave)
+        self.right = LadspaRingmod(sample_rate, wave=wave)
 
     def set(self, depth: float, freq_hz: float):
         self.left.set(depth, freq_hz)
         self.right.set(depth, freq_hz)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 PHASER_PATH = "/usr/lib/ladspa/phasers_1217.so"
@@ -472,12 +554,8 @@ class LadspaStereoPhaser:
         self.right.set(rate, depth, feedback)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 DECIMATOR_PATH = "/usr/lib/ladspa/decimator_1202.so"
@@ -517,12 +595,8 @@ class LadspaStereoDecimator:
         self.right.set(bits, rate_hz)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 TAPE_DELAY_PATH = "/usr/lib/ladspa/tape_delay_1211.so"
@@ -569,12 +643,8 @@ class LadspaStereoTapeDelay:
         self.right.set(dry_db, tap_db)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 RETRO_FLANGE_PATH = "/usr/lib/ladspa/retro_flange_1208.so"
@@ -613,12 +683,8 @@ class LadspaStereoRetroFlange:
         self.right.set(stall_ms, freq_hz)
 
     def run(self, buf: np.ndarray):
-        left = np.ascontiguousarray(buf[:, 0])
-        self.left.run(left)
-        buf[:, 0] = left
-        right = np.ascontiguousarray(buf[:, 1])
-        self.right.run(right)
-        buf[:, 1] = right
+        """buf (2, n) float32 planar, in-place."""
+        run_planar(self.left, self.right, buf)
 
 
 PLATE_PATH = "/usr/lib/ladspa/plate_1423.so"
@@ -643,14 +709,9 @@ class LadspaPlate(LadspaPlugin):
         self.set_control(PLATE_DAMPING, damping)
 
     def wet(self, mono: np.ndarray, out_l: np.ndarray, out_r: np.ndarray):
-        """Cola de reverb de `mono` en out_l/out_r (buffers contiguos)."""
-        self._connect(self._handle, PLATE_IN,
-                      mono.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, PLATE_OUT_L,
-                      out_l.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, PLATE_OUT_R,
-                      out_r.ctypes.data_as(ctypes.c_void_p))
-        self._run(self._handle, len(mono))
+        """Cola de reverb de `mono` en out_l/out_r."""
+        self._process((PLATE_IN, PLATE_OUT_L, PLATE_OUT_R), (mono,),
+                      (out_l, out_r))
 
 
 GVERB_PATH = "/usr/lib/ladspa/gverb_1216.so"
@@ -682,13 +743,8 @@ class LadspaGVerb(LadspaPlugin):
         self.set_control(GVERB_EARLY, early_db)
 
     def wet(self, mono: np.ndarray, out_l: np.ndarray, out_r: np.ndarray):
-        self._connect(self._handle, GVERB_IN,
-                      mono.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, GVERB_OUT_L,
-                      out_l.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, GVERB_OUT_R,
-                      out_r.ctypes.data_as(ctypes.c_void_p))
-        self._run(self._handle, len(mono))
+        self._process((GVERB_IN, GVERB_OUT_L, GVERB_OUT_R), (mono,),
+                      (out_l, out_r))
 
 
 DJ_EQ_PATH = "/usr/lib/ladspa/dj_eq_1901.so"
@@ -704,18 +760,14 @@ LIM_IN_L, LIM_IN_R, LIM_OUT_L, LIM_OUT_R = 4, 5, 6, 7
 
 class _StereoInOut(LadspaPlugin):
     """Plugin estéreo con puertos separados de entrada y salida (no puede
-    usar LadspaPlugin.run(), que conecta el mismo buffer a ambos)."""
+    usar LadspaPlugin.run(), que conecta el mismo buffer a ambos). Como
+    pasa por buffers propios, la salida puede ser la propia entrada."""
 
     _PORTS: tuple = ()          # (in_l, in_r, out_l, out_r)
 
     def process(self, left: np.ndarray, right: np.ndarray,
                 out_l: np.ndarray, out_r: np.ndarray):
-        il, ir, ol, orr = self._PORTS
-        self._connect(self._handle, il, left.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, ir, right.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, ol, out_l.ctypes.data_as(ctypes.c_void_p))
-        self._connect(self._handle, orr, out_r.ctypes.data_as(ctypes.c_void_p))
-        self._run(self._handle, len(left))
+        self._process(self._PORTS, (left, right), (out_l, out_r))
 
 
 class LadspaDjEq(_StereoInOut):
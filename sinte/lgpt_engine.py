@@ -25,9 +25,12 @@ que llama a render(): no hay locks en el camino de audio.
 
 from __future__ import annotations
 
+import hashlib
 import math
-import queue
+import threading
 import time
+import weakref
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
@@ -35,7 +38,9 @@ from typing import Optional
 import numpy as np
 import soundfile as sf
 
-from lgpt_parser import LGPTProject
+from lgpt_parser import LGPTProject, instrument_order
+from sample_cache import SampleCache, sample_key
+from sample_stream import SampleStream
 
 SAMPLE_RATE = 44100
 CHANNEL_COUNT = 8
@@ -82,24 +87,295 @@ class Sample:
     sr: int
 
 
-class SampleBank:
-    """Carga los WAV del directorio samples/ de un proyecto."""
+# Formatos en que se guardan los samples: float32 como siempre, o int16
+# (la mitad de memoria; la voz escala a float al interpolar).
+SAMPLE_FORMATS = ("float32", "int16")
+# Muestra int16 -> float: lo mismo que hace soundfile al leer PCM_16 en
+# float32. Potencia de dos: escalar antes o después de interpolar da el
+# mismo float, así que con fuentes de 16 bits la salida es idéntica.
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+def read_wav(wav: Path, cache: Optional[SampleCache] = None,
+             dtype: str = "float32"):
+    """(datos (n, canales) `dtype`, sample rate) de un WAV; con `cache`,
+    del `.npy` ya decodificado si lo hay (mmap, solo lectura)."""
+    if cache is not None:
+        return cache.read(wav, dtype)
+    data, sr = sf.read(str(wav), dtype=dtype, always_2d=True)
+    return np.ascontiguousarray(data), sr
+
+
+class SampleStore:
+    """Samples compartidos entre engines, por contenido.
+
+    En un setlist varias canciones usan el mismo kit de batería (el mismo
+    WAV copiado en cada `samples/`), y cada `SampleBank` lo volvía a leer.
+    Aquí cada sample cargado se guarda por el hash de su PCM decodificado
+    (y sample rate): dos WAV iguales en canciones distintas son un solo
+    array. Los bancos lo toman con `acquire` y lo sueltan al cerrarse
+    (`release`); un sample sin canción que lo use se queda en memoria por
+    si vuelve (cambiar a la siguiente canción del setlist y volver), hasta
+    que el total pasa de `budget` bytes: entonces se descartan los sin uso
+    más antiguos. Los que usa alguna canción cargada no se tocan, aunque
+    el total pase del tope.
+
+    Para no leer ni hashear otra vez un WAV ya visto se recuerda qué hash
+    dio cada fichero (por `sample_key`: ruta, tamaño y mtime).
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        # hash -> [Sample, usos], de uso más antiguo a más reciente
+        self._entries: OrderedDict[str, list] = OrderedDict()
+        self._files: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def content_hash(data: np.ndarray, sr: int) -> str:
+        h = hashlib.blake2b(f"{sr}:{data.shape}:{data.dtype.str}".encode(),
+                            digest_size=16)
+        h.update(np.ascontiguousarray(data).data)
+        return h.hexdigest()
+
+    def acquire(self, wav: Path, cache: Optional[SampleCache] = None,
+                dtype: str = "float32") -> tuple[Sample, str, bool]:
+        """(sample, hash, ya estaba) de `wav`, apuntando un uso más. Lanza
+        lo mismo que soundfile si el WAV no se puede leer."""
+        fkey = sample_key(wav, dtype)
+        with self._lock:
+            entry = self._entries.get(self._files.get(fkey, ""))
+            if entry is not None:
+                return self._use(self._files[fkey]), self._files[fkey], True
+        data, sr = read_wav(wav, cache, dtype)   # sin el lock: tarda
+        key = self.content_hash(data, sr)
+        with self._lock:
+            self._files[fkey] = key
+            if key in self._entries:             # mismo audio, otro WAV
+                return self._use(key), key, True
+            smp = Sample(data, sr)
+            self._entries[key] = [smp, 1]
+            self.nbytes += data.nbytes
+            self._evict()
+            return smp, key, False
+
+    def _use(self, key: str) -> Sample:
+        entry = self._entries[key]
+        entry[1] += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def release(self, keys: list[str]):
+        """Suelta un uso de cada hash de `keys` (los de un banco)."""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[1] -= 1
+            self._evict()
+
+    def _evict(self):
+        if self.nbytes <= self.budget:
+            return
+        for key, (smp, refs) in list(self._entries.items()):
+            if refs <= 0:
+                del self._entries[key]
+                self.nbytes -= smp.data.nbytes
+                if self.nbytes <= self.budget:
+                    break
+        gone = [f for f, key in self._files.items()
+                if key not in self._entries]
+        for f in gone:
+            del self._files[f]
+
+
+_SAMPLE_STORE: list = [None]
+
+
+def set_sample_store_mb(mb: float) -> float:
+    """Almacén compartido (`SampleStore`) para los engines que se creen a
+    partir de ahora, con tope `mb` (0 = sin almacén: cada banco carga lo
+    suyo). Cambiar el tope conserva lo ya guardado. Devuelve el aplicado."""
+    mb = max(0.0, float(mb))
+    store = _SAMPLE_STORE[0]
+    if mb <= 0:
+        _SAMPLE_STORE[0] = None
+    elif store is None:
+        _SAMPLE_STORE[0] = SampleStore(int(mb * 1024 * 1024))
+    else:
+        with store._lock:
+            store.budget = int(mb * 1024 * 1024)
+            store._evict()
+    return mb
 
-    def __init__(self, project_dir: Path):
+
+def sample_store() -> Optional[SampleStore]:
+    return _SAMPLE_STORE[0]
+
+
+class SampleBank:
+    """Carga los WAV del directorio samples/ de un proyecto (de `cache` si
+    se le da una, ver sample_cache.py).
+
+    Con `order` (nombres de sample en el orden en que la canción los pide,
+    ver `Engine._sample_order`) solo esos se cargan aquí; un hilo aparte
+    lee después sus páginas en ese orden, para que el primer disparo no
+    espere a la SD, y carga los demás, que ninguna frase usa. `get` va en
+    el hilo de audio y no lee nada: uno de esos pedido antes de tiempo da
+    None (la nota no suena) y pasa el primero en la cola del hilo.
+
+    Con `store` los samples salen del almacén compartido entre engines
+    (`SampleStore`): lo que ya cargó otra canción no se vuelve a leer. El
+    banco suelta sus usos con `close()` (o al recogerlo el GC), que antes
+    para el hilo de fondo: lo que este tomara después no se soltaría.
+
+    `dtype` es uno de SAMPLE_FORMATS: con "int16" los samples ocupan la
+    mitad y `Voice`/`render_batch` escalan al interpolar.
+
+    Con `stream_mb` > 0 los WAV que decodificados pasan de ese tamaño no se
+    cargan: se leen del disco mientras suenan (`SampleStream`, ver
+    sample_stream.py), con solo la cabeza en memoria y la de cada posición
+    de `starts[nombre]` (donde empiezan sus instrumentos). No van al
+    almacén ni a la caché, y sus voces no van por lotes."""
+
+    def __init__(self, project_dir: Path,
+                 cache: Optional[SampleCache] = None,
+                 order: Optional[list[str]] = None,
+                 store: Optional[SampleStore] = None,
+                 dtype: str = "float32", stream_mb: float = 0.0,
+                 starts: Optional[dict[str, set[int]]] = None):
+        if dtype not in SAMPLE_FORMATS:
+            raise ValueError(f"formato de sample desconocido: {dtype!r}")
+        self.dtype = dtype
+        self.stream_bytes = int(max(0.0, stream_mb) * 1024 * 1024)
+        self._starts = starts or {}
         self.samples: dict[str, Sample] = {}
+        self._cache = cache
+        self._store = store
+        self._held: list[str] = []            # hashes tomados del almacén
+        self._close = weakref.finalize(self, store.release, self._held) \
+            if store is not None else None
+        self._pending: dict[str, Path] = {}   # sin cargar todavía
+        self._wanted: deque = deque()         # pedidos por `get`, primero
+        self._closed = False                  # el hilo de fondo para
+        self._thread: Optional[threading.Thread] = None
+        self.eager = 0                        # cargados antes de sonar
+        self.on_demand = 0                    # pedidos antes de tiempo
+        self.shared = 0                       # ya estaban en el almacén
+        self.streamed = 0                     # leídos del disco al sonar
+        self.load_ms = 0.0
+        t0 = time.perf_counter()
         sample_dir = project_dir / "samples"
-        if not sample_dir.is_dir():
+        wavs = {w.name: w for w in sorted(sample_dir.glob("*.wav"))} \
+            if sample_dir.is_dir() else {}
+        if order is None:
+            first = list(wavs)
+        else:
+            first = [name for name in dict.fromkeys(order) if name in wavs]
+        for name in first:
+            self._load(wavs.pop(name))
+        self.eager = len(self.samples)
+        self.load_ms = (time.perf_counter() - t0) * 1000.0
+        if order is not None:
+            self._pending = wavs
+            warm = list(self.samples.values())
+            self._thread = threading.Thread(target=self._background,
+                                            args=(warm,), name="samples",
+                                            daemon=True)
+            self._thread.start()
+
+    def read(self, wav: Path) -> Sample:
+        """`wav` como Sample, del almacén si hay (y entonces cuenta como uso
+        de este banco). Lanza lo mismo que soundfile."""
+        if self.stream_bytes:
+            info = sf.info(str(wav))
+            size = info.frames * info.channels * np.dtype(self.dtype).itemsize
+            if size > self.stream_bytes:
+                stream = SampleStream(wav, self.dtype,
+                                      self._starts.get(wav.name, ()))
+                self.streamed += 1
+                return Sample(stream, stream.sr)
+        if self._store is None:
+            return Sample(*read_wav(wav, self._cache, self.dtype))
+        smp, key, shared = self._store.acquire(wav, self._cache, self.dtype)
+        self._held.append(key)
+        self.shared += shared
+        return smp
+
+    def close(self):
+        """Suelta los samples del almacén (el engine ya no va a sonar).
+        Espera al hilo de fondo, que deja lo que le quede sin cargar."""
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join()
+        if self._close is not None:
+            self._close()
+
+    def _load(self, wav: Path):
+        try:
+            smp = self.read(wav)
+        except Exception as exc:  # WAV ilegible: se ignora con aviso
+            print(f"[engine] no se puede cargar {wav.name}: {exc}")
             return
-        for wav in sorted(sample_dir.glob("*.wav")):
-            try:
-                data, sr = sf.read(str(wav), dtype="float32", always_2d=True)
-            except Exception as exc:  # WAV ilegible: se ignora con aviso
-                print(f"[engine] no se puede cargar {wav.name}: {exc}")
-                continue
-            self.samples[wav.name] = Sample(np.ascontiguousarray(data), sr)
+        self.samples[wav.name] = smp
+
+    def _load_wanted(self):
+        while self._wanted and not self._closed:
+            wav = self._pending.pop(self._wanted.popleft(), None)
+            if wav is not None:
+                self._load(wav)
+
+    def _background(self, warm: list[Sample]):
+        # Una lectura por página (4 KB): los mmap de la caché pasan a
+        # memoria en el orden en que van a sonar. Lo que pide `get` va
+        # antes que nada.
+        for smp in warm:
+            self._load_wanted()
+            if self._closed:
+                return
+            if isinstance(smp.data, np.ndarray):
+                float(smp.data.reshape(-1)[::1024].sum())
+        while self._pending and not self._closed:
+            self._load_wanted()
+            name = next(iter(self._pending), None)
+            if name is not None and not self._closed:
+                self._load(self._pending.pop(name))
+
+    def wait(self):
+        """Espera a que el hilo de fondo haya cargado todo."""
+        if self._thread is not None:
+            self._thread.join()
 
     def get(self, name: str) -> Optional[Sample]:
-        return self.samples.get(name)
+        """El sample `name`, o None si no existe o aún no está cargado
+        (entonces se pide al hilo de fondo). No espera nunca."""
+        smp = self.samples.get(name)
+        if smp is None and name in self._pending \
+                and name not in self._wanted:
+            self._wanted.append(name)
+            self.on_demand += 1
+        return smp
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de los samples cargados (con la caché, mapeada; de los
+        leídos del disco, la cabeza)."""
+        return sum(s.data.nbytes for s in list(self.samples.values()))
+
+    def report(self) -> str:
+        total = len(self.samples) + len(self._pending)
+        text = (f"samples {self.eager}/{total} en {self.load_ms:.0f} ms, "
+                f"{self.nbytes / 1e6:.1f} MB")
+        if self.streamed:
+            text += f", {self.streamed} del disco"
+        if self._store is not None:
+            text += (f" ({self.shared} ya en memoria, almacén "
+                     f"{self._store.nbytes / 1e6:.0f} MB)")
+        return text
 
 
 @dataclass
@@ -214,10 +490,215 @@ class MidiOut:
         pass
 
 
+# --------------------------------------------------------------------------
+# Gobernador de calidad
+# --------------------------------------------------------------------------
+
+class QualityGovernor:
+    """Baja la calidad por escalones cuando el render se come el bloque.
+
+    Quien mide el coste del render (el callback, el hilo de `RenderAhead` o
+    el proceso del engine, lo mismo que alimenta `EstadoAudio`) llama a
+    `update` con la carga (fracción del presupuesto) de cada bloque. Tras
+    `BLOQUES_ALTO` bloques seguidos por encima de `ALTO` se baja un escalón
+    de `STEPS`, que se acumulan: en vez de cortar, el directo suena peor.
+    Se recupera de uno en uno tras `espera` segundos por debajo de `BAJO`;
+    si vuelve a hacer falta bajar poco después de recuperar, la espera se
+    dobla (hasta `ESPERA_MAX_S`) para no ir y venir cada pocos segundos.
+
+    Cada cambio queda en `log` con su hora (time.time()), para la UI.
+    """
+
+    STEPS = ("sin scream", "filtro a media tasa", "colas cortas",
+             "sin filtro")
+    ALTO = 0.9
+    BAJO = 0.6
+    BLOQUES_ALTO = 3
+    ESPERA_S = 5.0
+    ESPERA_MAX_S = 60.0
+    # Cola de los efectos de baja prioridad (`tail_optional`) en el escalón
+    # "colas cortas": al callar el canal se dejan de procesar a este tiempo.
+    TAIL_S = 0.25
+
+    def __init__(self):
+        self.enabled = True
+        self.level = 0
+        self.log: deque = deque(maxlen=32)   # (hora, nivel, descripción)
+        self.espera = self.ESPERA_S
+        self._alto = 0              # bloques seguidos por encima de ALTO
+        self._bajo_s = 0.0          # segundos seguidos por debajo de BAJO
+        self._t = 0.0               # segundos de audio vistos
+        self._recupera_t = -math.inf  # `_t` de la última recuperación
+
+    @staticmethod
+    def describe(level: int) -> str:
+        return QualityGovernor.STEPS[level - 1] if level else \
+            "calidad completa"
+
+    # Lo que mira el render: una comparación por bloque y voz.
+    @property
+    def scream(self) -> bool:
+        return self.level < 1
+
+    @property
+    def filter_full_rate(self) -> bool:
+        return self.level < 2
+
+    @property
+    def tails(self) -> bool:
+        return self.level < 3
+
+    @property
+    def filter(self) -> bool:
+        return self.level < 4
+
+    def update(self, load: float, block_s: float) -> bool:
+        """Apunta la carga de un bloque de `block_s` segundos; True si el
+        nivel cambió."""
+        if not self.enabled:
+            return False
+        self._t += block_s
+        if load >= self.ALTO:
+            self._bajo_s = 0.0
+            self._alto += 1
+            if self._alto >= self.BLOQUES_ALTO and \
+                    self.level < len(self.STEPS):
+                if self._t - self._recupera_t < self.espera:
+                    self.espera = min(2.0 * self.espera, self.ESPERA_MAX_S)
+                self._set(self.level + 1)
+                return True
+        elif load < self.BAJO:
+            self._alto = 0
+            self._bajo_s += block_s
+            if self._bajo_s >= self.espera and self.level > 0:
+                if self._t - self._recupera_t >= 2.0 * self.espera:
+                    self.espera = self.ESPERA_S   # lleva rato estable
+                self._recupera_t = self._t
+                self._set(self.level - 1)
+                return True
+        else:
+            self._alto = 0
+            self._bajo_s = 0.0
+        return False
+
+    def _set(self, level: int):
+        self.level = level
+        self._alto = 0
+        self._bajo_s = 0.0
+        self.log.append((time.time(), level, self.describe(level)))
+
+
 # --------------------------------------------------------------------------
 # Voz de sample
 # --------------------------------------------------------------------------
 
+# 0, 1, 2... en float64 y en int64, compartidos por todas las voces: se
+# cortan a la medida del bloque en vez de hacer un np.arange por voz.
+_RAMPS = [np.arange(0.0), np.arange(0)]
+
+
+def _ramp(n: int, kind: int = 0) -> np.ndarray:
+    """Los `n` primeros de la rampa float64 (`kind` 0) o int64 (1)."""
+    r = _RAMPS[kind]
+    if len(r) < n:
+        r = np.arange(max(n, 4096), dtype=r.dtype)
+        _RAMPS[kind] = r
+    return r[:n]
+
+
+def _front(buf: np.ndarray, *shape: int) -> np.ndarray:
+    """Vista contigua de forma `shape` del principio de `buf` (plano). Un
+    corte [:a, :b] de un array 2D no sería contiguo, y sobre arrays no
+    contiguos numpy reserva buffers en cada operación."""
+    return buf[:math.prod(shape)].reshape(shape)
+
+
+class VoiceScratch:
+    """Arrays de trabajo de `Voice.render` para bloques de hasta `frames`
+    muestras de hasta `channels` canales. Se reutilizan de un bloque al
+    siguiente: cada voz reservaba una docena de arrays del tamaño del bloque
+    en cada uno, y en el hilo de audio cada reserva es un malloc.
+
+    El engine tiene uno por canal: la voz y su release se renderizan una
+    tras otra en el mismo hilo, y canales distintos en hilos del pool.
+    Lo que devuelven `_read`, `_read_unity` y `_read_cached` con él es una
+    vista de `x`, que vale hasta el siguiente render."""
+
+    __slots__ = ("frames", "channels", "pos", "f64", "i0", "i0_ds", "i1",
+                 "updates", "frac", "w", "mask", "x", "y", "x64", "g")
+
+    def __init__(self, frames: int, channels: int = 2):
+        self.frames = frames
+        self.channels = channels
+        self.pos = np.empty(frames)            # posiciones de lectura
+        self.f64 = np.empty(frames)            # parte entera, volumen
+        self.i0 = np.empty(frames, dtype=np.int64)
+        self.i0_ds = np.empty(frames, dtype=np.int64)
+        self.i1 = np.empty(frames, dtype=np.int64)
+        self.updates = np.empty(frames, dtype=np.int64)
+        self.frac = np.empty(frames, dtype=np.float32)
+        self.w = np.empty(frames, dtype=np.float32)
+        self.mask = np.empty(frames, dtype=bool)
+        # (muestras, canales), contiguos: el bloque leído, la otra muestra
+        # de la interpolación, el bloque en float64 (ganancia) y el gather
+        # de los samples int16
+        self.x = np.empty(frames * channels, dtype=np.float32)
+        self.y = np.empty(frames * channels, dtype=np.float32)
+        self.x64 = np.empty(frames * channels)
+        self.g = np.empty(frames * channels, dtype=np.int16)
+
+    def fits(self, n: int, channels: int) -> bool:
+        return n <= self.frames and channels <= self.channels
+
+
+class BatchScratch:
+    """Arrays de trabajo de `render_batch` para hasta `rows` voces de
+    bloques de hasta `frames` muestras (ver `VoiceScratch`). El engine tiene
+    uno y lo rehace más grande si algún sub-bloque junta más voces."""
+
+    __slots__ = ("rows", "frames", "col", "ints", "f32", "read", "tmp",
+                 "vol", "x64", "i0_raw", "i0", "i1", "itmp", "frac", "w0",
+                 "g0", "g1", "mask", "gather")
+
+    def __init__(self, rows: int, frames: int):
+        self.rows = rows
+        self.frames = frames
+        self.col = np.empty((7, rows))
+        self.ints = np.empty((8, rows), dtype=np.int64)
+        self.f32 = np.empty((3, rows), dtype=np.float32)
+        # planos: se ven como (voces, n) con `_front`
+        size = rows * frames
+        self.read = np.empty(size)
+        self.tmp = np.empty(size)
+        self.vol = np.empty(size)
+        self.x64 = np.empty(size)
+        self.i0_raw = np.empty(size, dtype=np.int64)
+        self.i0 = np.empty(size, dtype=np.int64)
+        self.i1 = np.empty(size, dtype=np.int64)
+        self.itmp = np.empty(size, dtype=np.int64)
+        self.frac = np.empty(size, dtype=np.float32)
+        self.w0 = np.empty(size, dtype=np.float32)
+        self.g0 = np.empty(2 * size, dtype=np.float32)
+        self.g1 = np.empty(2 * size, dtype=np.float32)
+        self.mask = np.empty(size, dtype=bool)
+        # Lectura de cada sample antes de pasarla a g0/g1: una por tipo de
+        # dato (np.take no convierte), creada al primer uso
+        self.gather: dict = {}
+
+    def fits(self, rows: int, n: int) -> bool:
+        return rows <= self.rows and n <= self.frames
+
+    def take(self, data: np.ndarray, idx: np.ndarray) -> np.ndarray:
+        """`data[idx]` en el buffer de su tipo, sin reservar."""
+        n, channels = len(idx), data.shape[1]
+        buf = self.gather.get(data.dtype)
+        if buf is None or len(buf) < self.frames * channels:
+            buf = np.empty(self.frames * max(channels, 2), dtype=data.dtype)
+            self.gather[data.dtype] = buf
+        out = _front(buf, n, channels)
+        return np.take(data, idx, axis=0, out=out, mode="clip")
+
+
 class Voice:
     """Estado de reproducción de un sample en un canal (monofonía por canal).
 
@@ -243,11 +724,24 @@ class Voice:
         "f_active", "f_mix", "f_scream", "f_cut_base", "f_reso_base",
         "f_speed", "f_height", "f_delay",
         "k_rem", "active", "_samples_per_tick", "declick", "releasing",
+        "cached", "cached_i", "governor", "scale",
     )
 
+    # False = siempre el camino general de render (referencia de los tests)
+    fast_paths = True
+
     def __init__(self, sample: Sample, idef: InstrumentDef, note: int,
-                 out_sr: int, samples_per_tick: float):
+                 out_sr: int, samples_per_tick: float,
+                 governor: Optional[QualityGovernor] = None):
         self.data = sample.data
+        # Samples int16 (sample_format): se escalan al leer, tras interpolar.
+        self.scale = INT16_SCALE if sample.data.dtype == np.int16 else None
+        # El del engine: con carga alta el filtro se simplifica o se salta.
+        self.governor = governor
+        # Nota entera ya leída y con crush (NoteCache); cached_i = muestras
+        # servidas de ella. None = se lee del sample.
+        self.cached: Optional[np.ndarray] = None
+        self.cached_i = 0
         self.n_channels = sample.data.shape[1]
         self.note = note
         n = len(sample.data)
@@ -259,6 +753,10 @@ class Voice:
         self.loop_end = self.end
         self.loop_len = max(self.loop_end - self.loop_start, 1)
         self.pos = float(min(idef.start, self.end - 1))
+        if isinstance(self.data, SampleStream):
+            # del disco: cada voz con su ventana de lectura por delante
+            self.data = self.data.reader(
+                self.pos, self.loop_start if self.loop else -1, self.loop_end)
 
         semis = (note - idef.root_note) + idef.fine_tune
         self.base_speed = (sample.sr / out_sr) * 2.0 ** (semis / 12.0)
@@ -397,92 +895,266 @@ class Voice:
 
     # -- render ------------------------------------------------------------
 
-    def _kupdates(self, n: int) -> np.ndarray:
-        """Nº de k-updates completados en cada sample del bloque (escalera)."""
-        i = np.arange(n)
-        return np.maximum((i - self.k_rem) // KRATE + 1, 0)
-
-    def render(self, mix: np.ndarray, off: int, n: int):
+    def batchable(self) -> bool:
+        """Si la voz puede ir en `render_batch`: sample en memoria (no del
+        disco), sin filtro (bucle recursivo por muestra) y sin rampas de
+        speed (LEGA, PTCH, PFIN), que piden un cumsum por voz."""
+        return (isinstance(self.data, np.ndarray) and not self.f_active
+                and self.cached is None and self.lega_step is None
+                and self.ptch_step is None and self.pfin_step is None)
+
+    def _kupdates(self, n: int,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Nº de k-updates completados en cada sample del bloque (escalera),
+        en `out` si se da."""
+        u = np.subtract(_ramp(n, 1), self.k_rem, out=out)
+        np.floor_divide(u, KRATE, out=u)
+        u += 1
+        return np.maximum(u, 0, out=u)
+
+    def render(self, mix: np.ndarray, off: int, n: int,
+               work: Optional[VoiceScratch] = None):
+        """Suma `n` muestras de la voz en `mix[:, off:off + n]` (planar).
+
+        `work` son los arrays de trabajo (los del canal en el engine); sin
+        él se reservan para este bloque. En régimen, con él, el render no
+        reserva memoria de audio salvo en lo que queda fuera: las rampas de
+        speed (LEGA, PTCH, PFIN), que duran lo que el glide, y los samples
+        del disco, cuyo reader devuelve arrays nuevos."""
         if not self.active or n <= 0:
             return
-
-        updates = self._kupdates(n)
-
-        # Speed por sample = base * cc_pitch * (LEGA * PTCH * PFIN). Cada
-        # rampa avanza a k-rate; si ninguna está activa es un escalar y se
-        # usa el camino lineal barato.
-        lega_arr, self.lega_ratio, self.lega_step = self._ramp_arr(
-            self.lega_ratio, self.lega_target, self.lega_step, updates)
-        ptch_arr, self.ptch_ratio, self.ptch_step = self._ramp_arr(
-            self.ptch_ratio, self.ptch_target, self.ptch_step, updates)
-        pfin_arr, self.pfin_ratio, self.pfin_step = self._ramp_arr(
-            self.pfin_ratio, self.pfin_target, self.pfin_step, updates)
-        speed = self.base_speed * self.cc_pitch * lega_arr * ptch_arr * pfin_arr
-        if isinstance(speed, np.ndarray):
-            pos_arr = self.pos + np.cumsum(speed) - speed[0]
-            end_pos = float(pos_arr[-1] + speed[-1])
-        else:
-            pos_arr = self.pos + speed * np.arange(n)
+        if work is None or not work.fits(n, self.n_channels):
+            work = VoiceScratch(n, self.n_channels)
+
+        # Caminos rápidos: lo normal (golpes de batería) es speed constante,
+        # sin rampas de pitch ni de volumen, y ahí sobran la escalera de
+        # k-updates y los arrays por muestra. Cada camino hace las mismas
+        # cuentas que el general, así que la salida no cambia (lo
+        # comprueban los tests con `fast_paths = False`).
+        fast = self.fast_paths
+        updates = None
+        if fast and self.lega_step is None and self.ptch_step is None \
+                and self.pfin_step is None:
+            speed = (self.base_speed * self.cc_pitch * self.lega_ratio
+                     * self.ptch_ratio * self.pfin_ratio)
             end_pos = self.pos + speed * n
+            x = self._read_cached(n, speed, work) \
+                if self.cached is not None else None
+            crushed = x is not None
+            if x is None and speed == 1.0:
+                x = self._read_unity(n, work)
+            if x is None:
+                x = self._read(self._positions(speed, n, work), work)
+        else:
+            self.cached = None
+            crushed = False
+            updates = self._kupdates(n, work.updates[:n])
+            # Speed por sample = base * cc_pitch * (LEGA * PTCH * PFIN).
+            # Cada rampa avanza a k-rate; si ninguna está activa es un
+            # escalar y se usa el camino lineal barato.
+            lega_arr, self.lega_ratio, self.lega_step = self._ramp_arr(
+                self.lega_ratio, self.lega_target, self.lega_step, updates)
+            ptch_arr, self.ptch_ratio, self.ptch_step = self._ramp_arr(
+                self.ptch_ratio, self.ptch_target, self.ptch_step, updates)
+            pfin_arr, self.pfin_ratio, self.pfin_step = self._ramp_arr(
+                self.pfin_ratio, self.pfin_target, self.pfin_step, updates)
+            speed = (self.base_speed * self.cc_pitch * lega_arr * ptch_arr
+                     * pfin_arr)
+            if isinstance(speed, np.ndarray):
+                pos_arr = self.pos + np.cumsum(speed) - speed[0]
+                end_pos = float(pos_arr[-1] + speed[-1])
+            else:
+                pos_arr = self._positions(speed, n, work)
+                end_pos = self.pos + speed * n
+            x = self._read(pos_arr, work)
+
+        if not crushed:
+            x = self._crush(x)
+
+        # Volumen con rampa k-rate (dominio 0-255 -> 0-1). Sin rampa la
+        # ganancia es un escalar; en float64 como la del array, para que el
+        # redondeo a float32 sea el mismo.
+        x64 = _front(work.x64, n, self.n_channels)
+        np.copyto(x64, x)
+        if fast and self.vol_kinc == 0.0:
+            vol_last = self.vol_cur
+            x64 *= self.vol_cur * (1.0 / 255.0) * self.cc_vol
+        else:
+            if updates is None:
+                updates = self._kupdates(n, work.updates[:n])
+            v = work.f64[:n]
+            np.copyto(v, updates)
+            v *= self.vol_kinc
+            v += self.vol_cur
+            if self.vol_kinc > 0.0:
+                np.minimum(v, self.vol_target, out=v)
+            elif self.vol_kinc < 0.0:
+                np.maximum(v, self.vol_target, out=v)
+            vol_last = float(v[-1])
+            v *= 1.0 / 255.0
+            v *= self.cc_vol
+            # por columnas: con broadcast numpy reserva buffers
+            for c in range(self.n_channels):
+                np.multiply(x64[:, c], v, out=x64[:, c])
+        np.copyto(x, x64, casting="same_kind")
+
+        # Filtro del upstream (bucle por sample; solo voces filtradas)
+        if self.f_active and (self.governor is None or self.governor.filter):
+            self._render_filter(x)
 
-        # Posición de lectura (con loop forward si aplica)
+        x *= self.attenuate
+
+        # Pan con la panlaw original y mezcla
+        pan = self.cc_pan if self.cc_pan is not None else self.pan
+        pan = min(max(int(pan), 0), 254)
+        tmp = work.w[:n]
+        np.multiply(x[:, 0], PANLAW[pan], out=tmp)
+        mix[0, off:off + n] += tmp
+        np.multiply(x[:, 0 if self.n_channels == 1 else 1], PANLAW[254 - pan],
+                    out=tmp)
+        mix[1, off:off + n] += tmp
+
+        self._advance(end_pos, vol_last, n)
+
+    def _positions(self, speed: float, n: int,
+                   work: VoiceScratch) -> np.ndarray:
+        """pos + speed * [0, 1, ... n-1], en `work.pos`."""
+        p = np.multiply(_ramp(n), speed, out=work.pos[:n])
+        p += self.pos
+        return p
+
+    def _read(self, pos_arr: np.ndarray,
+              work: Optional[VoiceScratch] = None) -> np.ndarray:
+        """Lectura general: interpolación lineal en `pos_arr` (con loop
+        forward y downsample). `pos_arr` se usa de espacio de trabajo: queda
+        cambiado."""
+        n = len(pos_arr)
+        nch = self.n_channels
+        if work is None:
+            work = VoiceScratch(n, nch)
+        read = pos_arr
         if self.loop:
-            rel = pos_arr - self.loop_start
-            read = self.loop_start + np.mod(rel, self.loop_len)
-        else:
-            read = pos_arr
-        i0 = read.astype(np.int64)
-        frac = (read - i0).astype(np.float32)
+            read -= self.loop_start
+            np.mod(read, self.loop_len, out=read)
+            read += self.loop_start
+        # parte entera y fracción (trunc es lo mismo que el paso a int64)
+        whole = np.trunc(read, out=work.f64[:n])
+        i0 = work.i0[:n]
+        np.copyto(i0, whole, casting="unsafe")
+        read -= whole
+        frac = work.frac[:n]
+        np.copyto(frac, read, casting="same_kind")
         i0_raw = i0
         if self.ds_shift:
-            i0 = i0 & ~((1 << self.ds_shift) - 1)
-        i1 = i0 + 1
+            i0 = np.bitwise_and(i0, ~((1 << self.ds_shift) - 1),
+                                out=work.i0_ds[:n])
+        i1 = np.add(i0, 1, out=work.i1[:n])
+        mask = work.mask[:n]
         if self.loop:
-            i1 = np.where(i1 >= self.loop_end, self.loop_start, i1)
+            np.greater_equal(i1, self.loop_end, out=mask)
+            np.copyto(i1, self.loop_start, where=mask)
         size = len(self.data)
         np.clip(i0, 0, size - 1, out=i0)
         np.clip(i1, 0, size - 1, out=i1)
 
-        x = self.data[i0] * (1.0 - frac)[:, None] + self.data[i1] * frac[:, None]
+        # Las dos muestras de cada punto, a float32 (int16 -> float32 es
+        # exacto). Del disco, el reader ya devuelve arrays nuevos.
+        data = self.data
+        x = _front(work.x, n, nch)
+        y = _front(work.y, n, nch)
+        if not isinstance(data, np.ndarray):
+            np.copyto(x, data[i0])
+            np.copyto(y, data[i1])
+        elif data.dtype == np.float32:
+            np.take(data, i0, axis=0, out=x, mode="clip")
+            np.take(data, i1, axis=0, out=y, mode="clip")
+        else:
+            g = _front(work.g, n, nch)
+            np.copyto(x, np.take(data, i0, axis=0, out=g, mode="clip"))
+            np.copyto(y, np.take(data, i1, axis=0, out=g, mode="clip"))
+        w = np.subtract(1.0, frac, out=work.w[:n])
+        for c in range(nch):
+            np.multiply(x[:, c], w, out=x[:, c])
+            np.multiply(y[:, c], frac, out=y[:, c])
+        x += y
+        if self.scale is not None:
+            x *= self.scale
         if not self.loop:
-            x[i0_raw >= self.end - 1] = 0.0
-
-        # Crush (predrive + reducción de bits), dominio float [-1,1] ~ 16 bits
+            np.greater_equal(i0_raw, self.end - 1, out=mask)
+            for c in range(nch):
+                np.copyto(x[:, c], 0.0, where=mask)
+        return x
+
+    def _crush(self, x: np.ndarray) -> np.ndarray:
+        """Crush (predrive + reducción de bits), dominio float [-1,1] ~ 16
+        bits. En el sitio."""
         x *= self.drive_gain
         if self.crush < 16:
             step = 2.0 ** (1 - self.crush)
-            x = np.round(x / step) * step
-
-        # Volumen con rampa k-rate (dominio 0-255 -> 0-1)
-        v = self.vol_cur + self.vol_kinc * updates
-        if self.vol_kinc > 0.0:
-            v = np.minimum(v, self.vol_target)
-        elif self.vol_kinc < 0.0:
-            v = np.maximum(v, self.vol_target)
-        x *= (v * (1.0 / 255.0) * self.cc_vol)[:, None]
-
-        # Filtro del upstream (bucle por sample; solo voces filtradas)
-        if self.f_active:
-            self._render_filter(x)
-
-        x *= self.attenuate
-
-        # Pan con la panlaw original y mezcla
-        pan = self.cc_pan if self.cc_pan is not None else self.pan
-        pan = min(max(int(pan), 0), 254)
-        gl = PANLAW[pan]
-        gr = PANLAW[254 - pan]
-        mix[off:off + n, 0] += x[:, 0] * gl
-        if self.n_channels == 1:
-            mix[off:off + n, 1] += x[:, 0] * gr
+            x /= step
+            np.round(x, out=x)
+            x *= step
+        return x
+
+    def _read_cached(self, n: int, speed: float,
+                     work: VoiceScratch) -> Optional[np.ndarray]:
+        """Siguiente tramo de la nota cacheada (ya con crush). Si el speed
+        ya no es el de la nota (knob de pitch, PTCH...) la caché deja de
+        valer para esta voz y devuelve None: sigue leyendo del sample desde
+        `pos`, que se ha ido actualizando igual."""
+        if speed != self.base_speed:
+            self.cached = None
+            return None
+        buf = self.cached
+        i = self.cached_i
+        self.cached_i = i + n
+        x = _front(work.x, n, self.n_channels)
+        if i + n <= len(buf):
+            np.copyto(x, buf[i:i + n])
+            return x
+        x.fill(0.0)
+        if i < len(buf):
+            x[:len(buf) - i] = buf[i:]
+        return x
+
+    def _read_unity(self, n: int,
+                    work: Optional[VoiceScratch] = None) -> Optional[np.ndarray]:
+        """Lectura a speed 1 desde posición entera: frac es 0 en todo el
+        bloque y la interpolación se queda en copiar un tramo del sample.
+        None si no vale (downsample, o un loop que da la vuelta dentro del
+        bloque): entonces se lee por el camino general."""
+        pos = self.pos
+        if self.ds_shift or pos != int(pos):
+            return None
+        p = int(pos)
+        if self.loop:
+            p = self.loop_start + (p - self.loop_start) % self.loop_len
+            if p + n > self.loop_end:
+                return None
+            m = n
         else:
-            mix[off:off + n, 1] += x[:, 1] * gr
-
-        # Actualización de estado
+            m = max(min(n, self.end - 1 - p), 0)
+        if work is None:
+            work = VoiceScratch(n, self.n_channels)
+        x = _front(work.x, n, self.n_channels)
+        x[m:] = 0.0
+        if m > 0:
+            head = x[:m]
+            np.copyto(head, self.data[p:p + m])
+            if self.scale is not None:
+                head *= self.scale
+        return x
+
+    def _advance(self, end_pos: float, vol_last: float, n: int):
+        """Actualización de estado tras renderizar `n` muestras."""
         self.pos = end_pos
-        self.vol_cur = float(v[-1])
+        self.vol_cur = vol_last
         self.k_rem -= n
-        while self.k_rem <= 0:
+        # k_rem queda en [0, KRATE): 0 = el k-update cae en la primera
+        # muestra del bloque siguiente. Con `<= 0` ese update se saltaba un
+        # periodo entero y la salida dependía de dónde se partiera el bloque
+        # (los stems grabados con otro tamaño no cuadraban con el directo).
+        while self.k_rem < 0:
             self.k_rem += KRATE
         if not self.loop and self.pos >= self.end - 1:
             self.active = False
@@ -502,54 +1174,574 @@ class Voice:
         se iba a ~40x fondo de escala (accordion de bulebule: res 80 +
         scream), tapando la mezcla. Con el tope a 1.0 el nivel global cuadra
         con el bounce de LGPT (RMS 0.17 frente a 0.19 de referencia).
+
+        El bucle por muestra lo hace el núcleo activo (`set_filter_kernel`);
+        aquí solo se derivan los coeficientes y se guarda el estado.
+
+        Con el `QualityGovernor` apurado se quita el `scream` y luego el
+        bucle corre a media tasa: una muestra de cada dos, con el
+        coeficiente doblado para que el corte quede en los mismos Hz, y la
+        otra repetida (la mitad de iteraciones, con algo de aliasing).
         """
+        gov = self.governor
+        scream = self.f_scream and (gov is None or gov.scream)
+        half = gov is not None and not gov.filter_full_rate
         cut = self.f_cut_base * self.cc_cutoff
         cut = min(max(cut, 0.0), 1.0)
         freq = cut * cut
         reso = 1.0 - (1.0 - self.f_reso_base) ** 3
         dirt = 100.0 * (1.0 - cut) + 5000.0 * cut
         mix_inv = 1.0 - self.f_mix
-        f_mix = self.f_mix
-        scream = self.f_scream
+        if half:
+            freq = min(2.0 * freq, 1.0)
+        kernel = _FILTER_KERNEL[0]
         for c in range(self.n_channels):
-            # Sobre una lista de Python y no indexando el array: leer y
-            # escribir numpy elemento a elemento cuesta un envoltorio por
-            # acceso. Medido en la Pi 4 con bloques de 2048: 13.09 ms
-            # indexando el array frente a 3.49 ms con la lista, 3.75x, y la
-            # salida es la misma (diferencia máxima 7.45e-08, el redondeo de
-            # volver a float32). El bucle no se puede vectorizar: es
-            # recursivo y con saturaciones dentro.
-            col = x[:, c].tolist()
-            sp = self.f_speed[c]
-            hg = self.f_height[c]
-            dl = self.f_delay[c]
-            for i, s in enumerate(col):
-                lpin = s * mix_inv
-                hpin = -s * f_mix
-                if scream:
-                    if sp > 1.0:
-                        sp = 2.0 / 3.0
-                    elif sp < -1.0:
-                        sp = -2.0 / 3.0
-                    sp *= dirt
-                sp = sp * reso + (lpin - hg) * freq
-                if sp > 1.0:
-                    sp = 1.0
-                elif sp < -1.0:
-                    sp = -1.0
-                hg = hg + sp + dl - hpin
-                if hg > 1.0:
-                    hg = 1.0
-                elif hg < -1.0:
-                    hg = -1.0
-                dl = hpin
-                col[i] = hg
-            x[:, c] = col
+            col = x[::2, c] if half else x[:, c]
+            sp, hg, dl = kernel(
+                col, self.f_speed[c], self.f_height[c], self.f_delay[c],
+                freq, reso, dirt, mix_inv, self.f_mix, scream)
+            if half:
+                x[1::2, c] = col[:len(x) // 2]
             self.f_speed[c] = sp
             self.f_height[c] = hg
             self.f_delay[c] = dl
 
 
+def render_batch(voices: list[Voice], mixes: list[np.ndarray], off: int,
+                 n: int, work: Optional[BatchScratch] = None):
+    """`Voice.render` de varias voces a la vez: cada voz suma en su
+    `mixes[k][:, off:off + n]` (planar).
+
+    En un sub-bloque (entre dos ticks) cada voz pagaba una docena de
+    llamadas a numpy sobre arrays de pocos cientos de muestras, y con ocho
+    canales el coste era sobre todo de llamada. Aquí las posiciones,
+    índices, volúmenes y ganancias van en arrays (voces, n); solo la lectura
+    del sample es por voz (un gather a un array planar común). Solo voces
+    `batchable()`; las operaciones son las mismas y en el mismo orden
+    que en `Voice.render`, así que el resultado es idéntico bit a bit.
+
+    Los arrays son los de `work` (sin él se reservan para esta llamada).
+    Lo que va por voz ((voces, 1) contra (voces, n)) se copia antes a un
+    array entero: con broadcast numpy reserva buffers en cada operación.
+    """
+    nv = len(voices)
+    if work is None or not work.fits(nv, n):
+        work = BatchScratch(nv, n)
+    col = work.col[:, :nv]
+    ints = work.ints[:, :nv]
+    f32 = work.f32[:, :nv]
+    for k, v in enumerate(voices):
+        col[0, k] = v.pos
+        col[1, k] = (v.base_speed * v.cc_pitch * v.lega_ratio
+                     * v.ptch_ratio * v.pfin_ratio)
+        col[2, k] = v.vol_cur
+        col[3, k] = v.vol_kinc
+        col[4, k] = v.vol_target
+        col[5, k] = v.cc_vol
+        ints[0, k] = v.k_rem
+        ints[1, k] = v.loop
+        ints[2, k] = v.loop_start
+        ints[3, k] = v.loop_len
+        ints[4, k] = v.end - 1 if not v.loop else len(v.data)
+        ints[5, k] = ~((1 << v.ds_shift) - 1)
+        ints[6, k] = len(v.data) - 1
+        ints[7, k] = v.loop_end
+        f32[0, k] = v.drive_gain
+        f32[1, k] = v.attenuate
+        f32[2, k] = 2.0 ** (1 - v.crush) if v.crush < 16 else 0.0
+    pos, speed, vol_cur, vol_kinc, _, cc_vol, _ = (c[:, None] for c in col)
+    k_rem, _, _, _, last, ds_mask, top, _ = (c[:, None] for c in ints)
+    drive, atten, _ = (c[:, None] for c in f32)
+    tmp = _front(work.tmp, nv, n)
+    itmp = _front(work.itmp, nv, n)
+    mask = _front(work.mask, nv, n)
+
+    # Posición de lectura (loop forward en las filas que lo llevan: np.mod
+    # en float es caro)
+    read = _front(work.read, nv, n)
+    np.copyto(read, _ramp(n))
+    np.copyto(tmp, speed)
+    read *= tmp
+    np.copyto(tmp, pos)
+    read += tmp
+    for k, v in enumerate(voices):
+        if v.loop:
+            row = read[k]
+            row -= v.loop_start
+            np.mod(row, v.loop_len, out=row)
+            row += v.loop_start
+    # parte entera y fracción (trunc es lo mismo que el paso a int64)
+    np.trunc(read, out=tmp)
+    i0_raw = _front(work.i0_raw, nv, n)
+    np.copyto(i0_raw, tmp, casting="unsafe")
+    read -= tmp
+    frac = _front(work.frac, nv, n)
+    np.copyto(frac, read, casting="same_kind")
+    i0 = _front(work.i0, nv, n)
+    np.copyto(itmp, ds_mask)
+    np.bitwise_and(i0_raw, itmp, out=i0)
+    i1 = np.add(i0, 1, out=_front(work.i1, nv, n))
+    for k, v in enumerate(voices):
+        if v.loop:
+            np.greater_equal(i1[k], v.loop_end, out=mask[k])
+            np.copyto(i1[k], v.loop_start, where=mask[k])
+    np.copyto(itmp, top)
+    np.maximum(i0, 0, out=i0)
+    np.minimum(i0, itmp, out=i0)
+    np.maximum(i1, 0, out=i1)
+    np.minimum(i1, itmp, out=i1)
+    # Interpolación lineal. Se lee de los datos de cada sample (sin copiarlos
+    # a un array común: siguen siendo el mmap de la caché o el del almacén)
+    # a arrays planares (2, voces, n); un mono va a los dos lados. Con el
+    # estéreo en el último eje (broadcast de tamaño 2) iba varias veces más
+    # lento que voz a voz. int16 -> float32 es exacto, así que leer a float
+    # y escalar tras interpolar da lo mismo que `Voice._read`.
+    g0 = _front(work.g0, 2, nv, n)
+    g1 = _front(work.g1, 2, nv, n)
+    for k, v in enumerate(voices):
+        right = 1 if v.n_channels > 1 else 0
+        got = work.take(v.data, i0[k])
+        np.copyto(g0[0, k], got[:, 0])
+        np.copyto(g0[1, k], got[:, right])
+        got = work.take(v.data, i1[k])
+        np.copyto(g1[0, k], got[:, 0])
+        np.copyto(g1[1, k], got[:, right])
+    w0 = np.subtract(1.0, frac, out=_front(work.w0, nv, n))
+    xl, xr = g0
+    for g, x in ((g1[0], xl), (g1[1], xr)):
+        x *= w0
+        g *= frac
+        x += g
+    for k, v in enumerate(voices):
+        if v.scale is not None:  # sample_format int16: a float tras el gather
+            for x in (xl[k], xr[k]):
+                x *= INT16_SCALE
+    # Sin loop: silencio a partir del final (`last` queda fuera de alcance
+    # en las que hacen loop)
+    np.copyto(itmp, last)
+    np.greater_equal(i0_raw, itmp, out=mask)
+    np.copyto(xl, 0.0, where=mask)
+    np.copyto(xr, 0.0, where=mask)
+
+    # Crush (predrive + reducción de bits)
+    np.copyto(w0, drive)
+    xl *= w0
+    xr *= w0
+    for k in range(nv):
+        step = f32[2, k]
+        if step > 0.0:
+            for x in (xl[k], xr[k]):
+                x /= step
+                np.round(x, out=x)
+                x *= step
+
+    # Volumen con rampa k-rate; la ganancia en float64 como en `Voice`
+    vol = _front(work.vol, nv, n)
+    if col[3].any():
+        updates = _front(work.itmp, nv, n)
+        np.copyto(updates, _ramp(n, 1))
+        np.copyto(i0, k_rem)             # i0 ya está leído
+        updates -= i0
+        updates //= KRATE
+        updates += 1
+        np.maximum(updates, 0, out=updates)
+        np.copyto(vol, updates)
+        np.copyto(tmp, vol_kinc)
+        vol *= tmp
+        np.copyto(tmp, vol_cur)
+        vol += tmp
+        for k, v in enumerate(voices):
+            if v.vol_kinc > 0.0:
+                np.minimum(vol[k], v.vol_target, out=vol[k])
+            elif v.vol_kinc < 0.0:
+                np.maximum(vol[k], v.vol_target, out=vol[k])
+    else:
+        np.copyto(vol, vol_cur)
+    vol_last = col[6]
+    np.copyto(vol_last, vol[:, -1])
+    vol *= 1.0 / 255.0
+    np.copyto(tmp, cc_vol)
+    vol *= tmp
+    x64 = _front(work.x64, nv, n)
+    for x in (xl, xr):
+        np.copyto(x64, x)
+        x64 *= vol
+        np.copyto(x, x64, casting="same_kind")
+    np.copyto(w0, atten)
+    xl *= w0
+    xr *= w0
+
+    for k, v in enumerate(voices):
+        pan = v.cc_pan if v.cc_pan is not None else v.pan
+        pan = min(max(int(pan), 0), 254)
+        mix = mixes[k]
+        left, right = xl[k], xr[k]
+        left *= PANLAW[pan]
+        right *= PANLAW[254 - pan]
+        mix[0, off:off + n] += left
+        mix[1, off:off + n] += right
+        v._advance(v.pos + float(speed[k, 0]) * n, float(vol_last[k]), n)
+
+
+# --------------------------------------------------------------------------
+# Caché de notas one-shot
+# --------------------------------------------------------------------------
+
+# Tope de memoria (MB) de la caché de notas de cada engine; 0 = sin caché.
+_NOTE_CACHE_MB: list = [16.0]
+
+
+def set_note_cache_mb(mb: float) -> float:
+    """Tope de la caché de notas de los engines que se creen a partir de
+    ahora (0 = sin caché). Devuelve el valor aplicado."""
+    _NOTE_CACHE_MB[0] = max(0.0, float(mb))
+    return _NOTE_CACHE_MB[0]
+
+
+def note_cache_mb() -> float:
+    return _NOTE_CACHE_MB[0]
+
+
+class NoteCache:
+    """LRU de notas one-shot ya leídas: la lectura interpolada y el crush de
+    una nota entera, de principio a fin.
+
+    Un bombo o una caja se disparan miles de veces por canción con el mismo
+    sample, nota e instrumento, y cada vez se volvía a interpolar. Con la
+    nota en caché la voz copia un tramo por bloque. Volumen, attenuate y pan
+    van después (rampas, knobs), así que no entran en la clave ni en el
+    buffer: la clave es lo que fija la lectura y el crush (sample, inicio,
+    fin, speed = nota + fine tune, crush, drive, downsample).
+
+    `attach` va en el disparo, en el hilo de audio: una nota que no está no
+    se renderiza ahí (hasta `max_bytes // 4` de golpe, segundos de audio en
+    un solo callback). Esa voz lee del sample como siempre y la nota se pide
+    a un hilo aparte; la siguiente vez que suene ya sale de la caché. Lo
+    que el hilo termina pasa a la caché en el siguiente `attach`, así que el
+    LRU solo se toca desde el hilo de audio.
+
+    Solo notas sin loop ni filtro, de samples en memoria; una voz que cambia
+    de speed por el camino (knob de pitch, LEGA, PTCH, PFIN) deja la caché
+    y sigue leyendo del sample. Las posiciones de lectura se calculan de una
+    vez para toda la nota en vez de bloque a bloque, así que a speed
+    fraccionario la salida puede diferir del render sin caché en el último
+    bit del float32.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._notes: OrderedDict = OrderedDict()
+        # Notas pedidas al hilo (clave, voz, pos) y las ya renderizadas
+        # (clave, buffer, data); `_queued` evita pedir dos veces la misma.
+        self._requests: deque = deque()
+        self._done: deque = deque()
+        self._queued: set = set()
+        self._sent = 0
+        self._finished = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @staticmethod
+    def cacheable(voice: Voice) -> bool:
+        return (not voice.loop and not voice.f_active
+                and voice.base_speed > 0.0
+                and isinstance(voice.data, np.ndarray))
+
+    def attach(self, voice: Voice) -> bool:
+        """Asigna a `voice` (recién creada) su nota cacheada. Si no estaba
+        la pide al hilo y devuelve False, como si no es cacheable o no
+        cabe: la voz lee del sample."""
+        self._collect()
+        if not self.cacheable(voice):
+            return False
+        key = (id(voice.data), voice.pos, voice.end, voice.base_speed,
+               voice.crush, voice.drive_gain, voice.ds_shift)
+        entry = self._notes.get(key)
+        if entry is None:
+            self.misses += 1
+            n = int(math.ceil((voice.end - 1 - voice.pos) / voice.base_speed))
+            size = max(n, 0) * voice.n_channels * 4
+            if size <= self.max_bytes // 4 and key not in self._queued:
+                self._queued.add(key)
+                self._sent += 1
+                self._requests.append((key, voice, voice.pos))
+                self._start()
+            return False               # larga (en directo) o pendiente
+        self._notes.move_to_end(key)
+        self.hits += 1
+        voice.cached = entry[0]
+        voice.cached_i = 0
+        return True
+
+    def _collect(self):
+        """Pasa a la caché las notas que ya renderizó el hilo."""
+        while self._done:
+            key, buf, data = self._done.popleft()
+            self._queued.discard(key)
+            if buf is None:             # falló al renderizar: sin entrada
+                continue
+            # La entrada guarda `data` para que su id no se reutilice.
+            self._notes[key] = (buf, data)
+            self.nbytes += buf.nbytes
+            while self.nbytes > self.max_bytes:
+                _k, (old, _d) = self._notes.popitem(last=False)
+                self.nbytes -= old.nbytes
+
+    def _start(self):
+        self._wake.set()
+        if self._thread is None:
+            # Con una referencia débil: el hilo acaba cuando la caché (su
+            # engine) se recoge.
+            self._thread = threading.Thread(
+                target=_note_worker, args=(weakref.ref(self), self._wake),
+                name="note-cache", daemon=True)
+            self._thread.start()
+
+    def _render_pending(self):
+        while self._requests:
+            key, voice, pos = self._requests.popleft()
+            n = int(math.ceil((voice.end - 1 - pos) / voice.base_speed))
+            try:
+                # `_read` y `_crush` solo usan lo que fija la clave (no
+                # `pos`, que la voz va moviendo mientras suena)
+                buf = voice._crush(voice._read(
+                    pos + voice.base_speed * np.arange(max(n, 1))))
+                self._done.append((key, buf, voice.data))
+            except Exception as exc:  # no debería: esa voz ya sonó igual
+                print(f"[engine] caché de notas: {exc}")
+                # `_queued` es del hilo de audio: se suelta en `_collect`,
+                # o la nota no se podría volver a pedir
+                self._done.append((key, None, None))
+            finally:
+                self._finished += 1
+
+    def wait(self):
+        """Espera a que el hilo haya renderizado lo pedido (tests)."""
+        while self._finished < self._sent:
+            time.sleep(0.001)
+
+
+def _note_worker(ref, wake: threading.Event):
+    while True:
+        wake.wait(1.0)
+        wake.clear()
+        cache = ref()
+        if cache is None:
+            return
+        cache._render_pending()
+        del cache
+
+
+# --------------------------------------------------------------------------
+# Núcleo del filtro del upstream (intercambiable)
+# --------------------------------------------------------------------------
+
+FILTER_SPAN = 64              # muestras por tramo en `filter_kernel_py`
+
+
+def filter_kernel_py(col, sp, hg, dl, freq, reso, dirt, mix_inv, f_mix,
+                     scream):
+    """Bucle de referencia del filtro LP del upstream sobre una columna.
+
+    Procesa `col` (vista float32 de un canal del bloque) in situ y devuelve
+    el estado (speed, height, delay) para el bloque siguiente. Es la versión
+    que vale siempre y contra la que se comparan los núcleos acelerados.
+    """
+    # Sobre una lista de Python y no indexando el array: leer y escribir
+    # numpy elemento a elemento cuesta un envoltorio por acceso. Medido en la
+    # Pi 4 con bloques de 2048: 13.09 ms indexando el array frente a 3.49 ms
+    # con la lista, 3.75x, y la salida es la misma (diferencia máxima
+    # 7.45e-08, el redondeo de volver a float32). El bucle no se puede
+    # vectorizar: es recursivo y con saturaciones dentro.
+    # Por tramos de FILTER_SPAN: la lista del bloque entero eran miles de
+    # floats de Python vivos a la vez, una reserva grande en cada bloque del
+    # hilo de audio; por tramos cuesta lo mismo (una llamada a tolist más
+    # cada FILTER_SPAN muestras).
+    for a in range(0, len(col), FILTER_SPAN):
+        part = col[a:a + FILTER_SPAN]
+        vals = part.tolist()
+        for i, s in enumerate(vals):
+            lpin = s * mix_inv
+            hpin = -s * f_mix
+            if scream:
+                if sp > 1.0:
+                    sp = 2.0 / 3.0
+                elif sp < -1.0:
+                    sp = -2.0 / 3.0
+                sp *= dirt
+            sp = sp * reso + (lpin - hg) * freq
+            if sp > 1.0:
+                sp = 1.0
+            elif sp < -1.0:
+                sp = -1.0
+            hg = hg + sp + dl - hpin
+            if hg > 1.0:
+                hg = 1.0
+            elif hg < -1.0:
+                hg = -1.0
+            dl = hpin
+            vals[i] = hg
+        part[:] = vals
+    return sp, hg, dl
+
+
+def _make_numba_kernel():
+    """Compila con numba el mismo bucle que `filter_kernel_py`.
+
+    El cuerpo es copia literal del de referencia (mismas operaciones en el
+    mismo orden, en double), así que la salida coincide con él salvo el
+    redondeo final a float32. `cache=True` guarda el código compilado junto
+    al módulo: en la Pi la primera compilación tarda segundos y no debe
+    repetirse en cada arranque.
+    """
+    import numba
+
+    @numba.njit(cache=True, nogil=True)
+    def _loop(col, sp, hg, dl, freq, reso, dirt, mix_inv, f_mix, scream):
+        for i in range(col.shape[0]):
+            s = float(col[i])
+            lpin = s * mix_inv
+            hpin = -s * f_mix
+            if scream:
+                if sp > 1.0:
+                    sp = 2.0 / 3.0
+                elif sp < -1.0:
+                    sp = -2.0 / 3.0
+                sp *= dirt
+            sp = sp * reso + (lpin - hg) * freq
+            if sp > 1.0:
+                sp = 1.0
+            elif sp < -1.0:
+                sp = -1.0
+            hg = hg + sp + dl - hpin
+            if hg > 1.0:
+                hg = 1.0
+            elif hg < -1.0:
+                hg = -1.0
+            dl = hpin
+            col[i] = hg
+        return sp, hg, dl
+
+    def kernel(col, sp, hg, dl, freq, reso, dirt, mix_inv, f_mix, scream):
+        return _loop(col, float(sp), float(hg), float(dl), float(freq),
+                     float(reso), float(dirt), float(mix_inv), float(f_mix),
+                     bool(scream))
+
+    # Compila ya (fuera del hilo de audio) con los tipos reales del render:
+    # columna float32 no contigua, que es lo que llega de x[:, c].
+    probe = np.zeros((4, 2), dtype=np.float32)
+    kernel(probe[:, 0], 0.0, 0.0, 0.0, 0.5, 0.5, 100.0, 1.0, 0.0, True)
+    return kernel
+
+
+# Núcleos disponibles: nombre -> fábrica. El de Python no depende de nada y
+# es el que queda si el acelerado no se puede cargar (numba no está en la Pi
+# por defecto: `pip install numba` en el venv para activarlo).
+FILTER_KERNELS = {
+    "python": lambda: filter_kernel_py,
+    "numba": _make_numba_kernel,
+}
+
+# Núcleo activo: [función, nombre]. Lista mutable para que set_filter_kernel
+# lo cambie sin `global` y Voice lo lea con un solo acceso por bloque.
+_FILTER_KERNEL = [filter_kernel_py, "python"]
+
+
+def set_filter_kernel(name: str = "auto") -> str:
+    """Elige el núcleo del filtro del upstream y devuelve el que queda.
+
+    "auto" prueba el acelerado y cae al de Python si no se puede cargar; un
+    nombre concreto que falle también cae al de Python (con aviso), porque
+    el filtro tiene que sonar aunque sea más lento. Hay que llamarlo fuera
+    del callback de audio: la primera carga de numba compila.
+    """
+    order = ["numba", "python"] if name == "auto" else [name, "python"]
+    for cand in order:
+        factory = FILTER_KERNELS.get(cand)
+        if factory is None:
+            print(f"[engine] núcleo de filtro desconocido: {cand}")
+            continue
+        try:
+            fn = factory()
+        except Exception as exc:  # sin numba, o falla al compilar
+            if name != "auto":
+                print(f"[engine] núcleo de filtro {cand} no disponible: {exc}")
+            continue
+        _FILTER_KERNEL[0] = fn
+        _FILTER_KERNEL[1] = cand
+        return cand
+    return _FILTER_KERNEL[1]
+
+
+def filter_kernel_name() -> str:
+    return _FILTER_KERNEL[1]
+
+
+# --------------------------------------------------------------------------
+# Render en paralelo por canal (opcional)
+# --------------------------------------------------------------------------
+
+# Pool compartido por todos los engines: [executor o None, nº de hilos].
+# Con 1 hilo no hay pool y el render es el serie de siempre.
+_RENDER_POOL: list = [None, 1]
+
+
+def set_render_workers(n: int) -> int:
+    """Reparte el trabajo por canal de `Engine.render` entre `n` hilos (el
+    que llama a render más n-1 del pool) y devuelve cuántos quedan.
+
+    Cada canal escribe solo en sus buffers y la suma final va en orden de
+    canal, así que la salida es idéntica bit a bit a la del render en serie.
+    Solo gana donde el trabajo suelta el GIL: gathers de numpy, llamadas a
+    LADSPA y el núcleo numba del filtro; con el de Python, no.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    n = max(1, min(int(n), CHANNEL_COUNT))
+    old = _RENDER_POOL[0]
+    _RENDER_POOL[0] = ThreadPoolExecutor(
+        n - 1, thread_name_prefix="render") if n > 1 else None
+    _RENDER_POOL[1] = n
+    if old is not None:
+        old.shutdown(wait=True)
+    return n
+
+
+def render_workers() -> int:
+    return _RENDER_POOL[1]
+
+
+def _run_group(fn, items, args):
+    for item in items:
+        fn(item, *args)
+
+
+def _parallel(fn, items: list, *args):
+    """fn(item, *args) para cada item, repartidos en grupos fijos (item k al
+    grupo k % hilos) entre el hilo actual y el pool. Vuelve cuando acaban
+    todos. Sin pool, o con un solo item, en serie y sin coste extra."""
+    pool, workers = _RENDER_POOL
+    if pool is None or len(items) < 2:
+        for item in items:
+            fn(item, *args)
+        return
+    k = min(workers, len(items))
+    futures = [pool.submit(_run_group, fn, items[g::k], args)
+               for g in range(1, k)]
+    _run_group(fn, items[0::k], args)
+    for f in futures:
+        f.result()
+
+
 # --------------------------------------------------------------------------
 # Tablas
 # --------------------------------------------------------------------------
@@ -652,6 +1844,74 @@ class TablePlayback:
 # Presets de efectos (cadena por canal, a la salida del delay)
 # --------------------------------------------------------------------------
 
+# Motor de los efectos: "ladspa" usa los plugins de la Pi (y si el .so no
+# carga, cae al de numpy) y "numpy" va directo a las versiones propias
+# (numpy_fx y los caminos sin plugin de cada preset), que corren en
+# cualquier máquina. Se puede fijar por preset; "eq" es el del MasterChain.
+# `bench_fx.py` mide los dos en la Pi para decidir cuál conviene en cada uno.
+FX_BACKENDS = ("ladspa", "numpy")
+
+# [motor por defecto, {preset: motor}]. Lista mutable, como _FILTER_KERNEL.
+_FX_BACKEND: list = ["ladspa", {}]
+
+
+def set_fx_backend(name: str = "ladspa",
+                   per_fx: Optional[dict] = None) -> str:
+    """Elige el motor de los efectos y devuelve el que queda por defecto.
+
+    `per_fx` ({preset: motor}) pisa el de defecto para esos presets. Un
+    nombre desconocido se ignora con aviso. Solo afecta a los efectos que
+    se creen después: hay que llamarlo antes de cargar canciones.
+    """
+    if name in FX_BACKENDS:
+        _FX_BACKEND[0] = name
+    else:
+        print(f"[engine] motor de efectos desconocido: {name}")
+    per: dict = {}
+    for fx, backend in (per_fx or {}).items():
+        if backend in FX_BACKENDS:
+            per[fx] = backend
+        else:
+            print(f"[engine] motor de efectos desconocido para {fx}: "
+                  f"{backend}")
+    _FX_BACKEND[1] = per
+    return _FX_BACKEND[0]
+
+
+def fx_backend(preset: str) -> str:
+    return _FX_BACKEND[1].get(preset, _FX_BACKEND[0])
+
+
+def _fx_plugin(preset: str, sr: int, ladspa_cls: str,
+               numpy_cls: Optional[str] = None, **kw):
+    """Motor de `preset` según `fx_backend`: la clase `ladspa_cls` de
+    ladspa_fx o, si no toca o no carga, `numpy_cls` de numpy_fx. None si
+    no queda ninguno (el preset sigue entonces por su camino sin plugin)."""
+    if fx_backend(preset) == "ladspa":
+        try:
+            import ladspa_fx
+            return getattr(ladspa_fx, ladspa_cls)(sr, **kw)
+        except Exception:
+            pass
+    if numpy_cls is None:
+        return None
+    try:
+        import numpy_fx
+        return getattr(numpy_fx, numpy_cls)(sr, **kw)
+    except Exception:       # sin scipy, los filtros recursivos no están
+        return None
+
+
+# Los caminos sin LADSPA de suboctave y acid_lp filtran por bloques con
+# lfilter (estado arrastrado entre bloques) si scipy está: el bucle muestra
+# a muestra de Python no llega a tiempo real. Sin scipy queda el bucle
+# (`pip install scipy` en el venv para activarlo).
+try:
+    from scipy.signal import lfilter as _lfilter
+except ImportError:
+    _lfilter = None
+
+
 class SuboctaveFx:
     """Audio Divider + paso bajo: peso una octava por debajo, SUMADO al
     original.
@@ -685,12 +1945,20 @@ class SuboctaveFx:
     LP_MAX = 6000.0
     GAIN = 8.0
     COMP = 0.8
+    # Lo que sigue sonando tras quedarse sin entrada (ver Engine.mix_live):
+    # aquí solo los polos de los filtros.
+    tail_s = 0.1
+    # Fallback por bloques con lfilter; False = el bucle de referencia (lo
+    # comparan los tests).
+    vectorized = True
 
     def __init__(self, sr: int):
         self.sr = sr
         self.pre = None
         self.lp = None
         try:
+            if fx_backend("suboctave") != "ladspa":
+                raise ImportError("motor numpy")
             from ladspa_fx import LadspaStereoDivider, LadspaStereoSVF
             self.pre = LadspaStereoSVF(sr)
             self.pre.set(freq_hz=self.PRE_HZ, res=0.0)
@@ -709,11 +1977,16 @@ class SuboctaveFx:
         self.prev = [0.0, 0.0]
         self.zpre = [0.0, 0.0]
         self.zlp = [0.0, 0.0]
+        self._wet = np.zeros((2, 0), dtype=np.float32)   # copia de trabajo
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
         if amount <= 0.0:
             return
-        wet = buf.copy()
+        wet = self._wet
+        if wet.shape != buf.shape:
+            wet = self._wet = np.empty_like(buf)
+        wet[:] = buf
         cut = self.LP_MIN * (self.LP_MAX / self.LP_MIN) ** amount
         if self.plugin is not None:
             # El pre-filtro no es opcional: el divisor cuenta cruces por cero
@@ -723,11 +1996,14 @@ class SuboctaveFx:
             # sin pre-filtro el wet se queda en 65 Hz, con él baja a 33.
             self.pre.run(wet)
             self.plugin.run(wet)
-            self.lp.set(freq_hz=cut, res=0.0)
+            if amount != self._amount:
+                self._amount = amount
+                self.lp.set(freq_hz=cut, res=0.0)
             self.lp.run(wet)
         else:
             self._divide(wet, cut)
-        buf += wet * (self.GAIN * amount)
+        wet *= self.GAIN * amount
+        buf += wet
         buf *= 1.0 / (1.0 + self.COMP * amount)
 
     def _divide(self, buf: np.ndarray, cut: float):
@@ -745,8 +2021,11 @@ class SuboctaveFx:
         """
         ap = math.exp(-2.0 * math.pi * self.PRE_HZ / self.sr)
         a = math.exp(-2.0 * math.pi * min(cut, self.sr * 0.45) / self.sr)
-        for side in range(buf.shape[1]):
-            xs = buf[:, side]
+        if _lfilter is not None and self.vectorized and buf.shape[1]:
+            self._divide_block(buf, ap, a)
+            return
+        for side in range(len(buf)):
+            xs = buf[side]
             flip, prev = self.flip[side], self.prev[side]
             zp, z = self.zpre[side], self.zlp[side]
             for i in range(len(xs)):
@@ -759,31 +2038,54 @@ class SuboctaveFx:
             self.flip[side], self.prev[side] = flip, prev
             self.zpre[side], self.zlp[side] = zp, z
 
+    def _divide_block(self, buf: np.ndarray, ap: float, a: float):
+        """`_divide` por bloques: los dos polos con lfilter y el biestable
+        contando los cruces por cero ascendentes (la paridad acumulada dice
+        cuántas veces ha cambiado de signo hasta cada muestra)."""
+        for side in range(len(buf)):
+            xs = buf[side]
+            zp, _ = _lfilter((1.0 - ap,), (1.0, -ap), xs.astype(np.float64),
+                             zi=(ap * self.zpre[side],))
+            prev = np.empty_like(zp)
+            prev[0] = self.prev[side]
+            prev[1:] = zp[:-1]
+            ups = np.cumsum((prev <= 0.0) & (zp > 0.0)) & 1
+            flip = np.where(ups, -self.flip[side], self.flip[side])
+            z, _ = _lfilter((1.0 - a,), (1.0, -a), np.abs(zp) * flip,
+                            zi=(a * self.zlp[side],))
+            np.multiply(z, 0.35, out=xs, casting="same_kind")
+            self.flip[side] = float(flip[-1])
+            self.prev[side] = self.zpre[side] = float(zp[-1])
+            self.zlp[side] = float(z[-1])
+
 
 class AcidLpFx:
     """C* AutoFilter LP: barrido 3800 -> 780 Hz (50% log) con resonancia
     y compensación de volumen progresiva hasta +40%."""
 
     COMP = 0.40
+    tail_s = 0.1        # resonancia del filtro
+    CLAMP = 4.0         # tope de la salida del biquad
+    vectorized = True   # como SuboctaveFx.vectorized
 
     def __init__(self, sr: int):
         self.sr = sr
         self.plugin = None
         for cls in ("LadspaStereoAutoFilter", "LadspaStereoSVF"):
-            try:
-                mod = __import__("ladspa_fx")
-                self.plugin = getattr(mod, cls)(sr)
+            self.plugin = _fx_plugin("acid_lp", sr, cls)
+            if self.plugin is not None:
                 break
-            except Exception:
-                continue
         self.coef: Optional[tuple] = None
         self.state = [0.0] * 8
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
         freq = 3800.0 * (160.0 / 3800.0) ** (amount * 0.5)
         res = 0.85 * amount * 0.5
         if self.plugin is not None:
-            self.plugin.set(freq_hz=freq, res=res)
+            if amount != self._amount:
+                self._amount = amount
+                self.plugin.set(freq_hz=freq, res=res)
             self.plugin.run(buf)
         else:
             self._biquad(buf, amount, freq, res)
@@ -803,38 +2105,64 @@ class AcidLpFx:
             self.coef = (cut, res, b0, b1, b0, a1, a2)
         _c, _r, b0, b1, b2, a1, a2 = self.coef
         st = self.state
+        if _lfilter is not None and self.vectorized and buf.shape[1]:
+            for side in range(2):
+                st[side * 4:side * 4 + 4] = self._biquad_block(
+                    buf[side], (b0, b1, b2, a1, a2), st[side * 4:side * 4 + 4])
+            return
+        top = self.CLAMP
         for side in range(2):
             x1, x2, y1, y2 = st[side * 4:side * 4 + 4]
-            xs = buf[:, side]
+            xs = buf[side]
             for i in range(len(xs)):
                 x = xs[i]
                 y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
                 x2, x1 = x1, x
                 y2, y1 = y1, y
-                if y > 4.0:
-                    y = 4.0
-                elif y < -4.0:
-                    y = -4.0
+                if y > top:
+                    y = top
+                elif y < -top:
+                    y = -top
                 xs[i] = y
             st[side * 4:side * 4 + 4] = [x1, x2, y1, y2]
 
+    def _biquad_block(self, xs: np.ndarray, coef: tuple, state: list) -> list:
+        """Una fila de `_biquad` por bloques con lfilter. El recorte a
+        ±CLAMP es solo de la salida (el bucle guarda en el estado la y sin
+        recortar), así que va después, sobre el bloque entero. Devuelve el
+        estado [x1, x2, y1, y2] para el bloque siguiente."""
+        b0, b1, b2, a1, a2 = coef
+        x1, x2, y1, y2 = state
+        x = xs.astype(np.float64)
+        # estado de la forma directa II transpuesta que usa lfilter
+        zi = (b1 * x1 - a1 * y1 + b2 * x2 - a2 * y2, b2 * x1 - a2 * y1)
+        y, _ = _lfilter((b0, b1, b2), (1.0, a1, a2), x, zi=zi)
+        n = len(x)
+        if n >= 2:
+            state = [float(x[-1]), float(x[-2]), float(y[-1]), float(y[-2])]
+        else:
+            state = [float(x[0]), x1, float(y[0]), y1]
+        np.clip(y, -self.CLAMP, self.CLAMP, out=y)
+        xs[:] = y
+        return state
+
 
 class SatanFx:
     """Barry's Satan Maximiser: knee 0 -> -60 dB (destrucción progresiva)
     con compensación de nivel para no disparar el volumen."""
 
     KNEE_MAX = -60.0
+    tail_s = 0.05       # envolvente del maximizador
 
     def __init__(self, sr: int):
-        try:
-            from ladspa_fx import LadspaStereoSatan
-            self.plugin = LadspaStereoSatan(sr)
-        except Exception:
-            self.plugin = None
+        self.plugin = _fx_plugin("satan", sr, "LadspaStereoSatan")
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
         if self.plugin is not None:
-            self.plugin.set(self.KNEE_MAX * amount)
+            if amount != self._amount:
+                self._amount = amount
+                self.plugin.set(self.KNEE_MAX * amount)
             self.plugin.run(buf)
         else:
             np.tanh(buf * (1.0 + 30.0 * amount), out=buf)
@@ -849,43 +2177,45 @@ class RingmodFx:
     en anillo con la frecuencia barriendo 30 -> 330 Hz (zona metálica).
     No sube el nivel."""
 
+    tail_s = 0.0        # sin memoria: silencio dentro, silencio fuera
+
     def __init__(self, sr: int):
-        try:
-            from ladspa_fx import LadspaStereoRingmod
-            self.plugin = LadspaStereoRingmod(sr)
-        except Exception:
-            self.plugin = None
+        self.plugin = _fx_plugin("ringmod", sr, "LadspaStereoRingmod",
+                                 "NumpyStereoRingmod")
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
-        if self.plugin is not None:
+        if self.plugin is None:         # sin motor: pasa seco
+            return
+        if amount != self._amount:
+            self._amount = amount
             self.plugin.set(2.0 * amount, 30.0 + 300.0 * amount)
-            self.plugin.run(buf)
-        else:
-            # fallback: tremolo rápido aproximado
-            n = np.arange(len(buf), dtype=np.float32)
-            mod = 1.0 - amount * (0.5 + 0.5 * np.sin(
-                2 * np.pi * (30 + 300 * amount) * n / 44100))
-            buf *= mod[:, None]
+        self.plugin.run(buf)
 
 
 class PhaserFx:
     """LFO Phaser: depth 0 = seco; al subir entra el phaser con feedback
     y rate 0.2 -> 1.7 Hz. No toca el nivel."""
 
+    tail_s = 0.2        # feedback de los pasatodo
+
     def __init__(self, sr: int):
-        try:
-            from ladspa_fx import LadspaStereoPhaser
-            self.plugin = LadspaStereoPhaser(sr)
-        except Exception:
-            self.plugin = None
+        self.plugin = _fx_plugin("phaser", sr, "LadspaStereoPhaser",
+                                 "NumpyStereoPhaser")
+        # El plugin colorea incluso a depth 0 (~1.4x); el de numpy no.
+        self._base = 1.0 if type(self.plugin).__name__.startswith(
+            "Numpy") else 1.4
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
         if self.plugin is not None:
-            self.plugin.set(0.2 + 1.5 * amount, amount, 0.6 * amount)
+            if amount != self._amount:
+                self._amount = amount
+                self.plugin.set(0.2 + 1.5 * amount, amount, 0.6 * amount)
             self.plugin.run(buf)
-            # el phaser colorea incluso a depth 0 (~1.4x) y sube con el
-            # feedback: compensación para mantener el nivel
-            buf *= 1.0 / (1.4 + amount)
+            # el nivel sube con el feedback (y en el plugin también a
+            # depth 0): compensación para mantenerlo
+            buf *= 1.0 / (self._base + amount)
 
 
 class DecimatorFx:
@@ -893,22 +2223,22 @@ class DecimatorFx:
     (100% -> 20%). La profundidad de bits es entera en el plugin (a
     pasos), así que el barrido principal va por el rate, que es continuo."""
 
+    tail_s = 0.0
+
     def __init__(self, sr: int):
         self.sr = sr
-        try:
-            from ladspa_fx import LadspaStereoDecimator
-            self.plugin = LadspaStereoDecimator(sr)
-        except Exception:
-            self.plugin = None
+        self.plugin = _fx_plugin("decimator", sr, "LadspaStereoDecimator",
+                                 "NumpyStereoDecimator")
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
-        bits = 24.0 - 8.0 * amount                # 24 -> 16 (textura leve)
-        if self.plugin is not None:
+        if self.plugin is None:
+            return
+        if amount != self._amount:
+            self._amount = amount
+            bits = 24.0 - 8.0 * amount            # 24 -> 16 (textura leve)
             self.plugin.set(bits, self.sr * (1.0 - 0.8 * amount))
-            self.plugin.run(buf)
-        else:
-            step = 2.0 ** (1.0 - bits)
-            buf[:] = np.round(buf / step) * step
+        self.plugin.run(buf)
 
 
 class ChopperFx:
@@ -916,48 +2246,33 @@ class ChopperFx:
     al subir, corte de 2 a 16 Hz con onda TRIANGULAR (bordes suaves).
     No sube el nivel."""
 
+    tail_s = 0.0
+
     def __init__(self, sr: int):
-        try:
-            from ladspa_fx import LadspaRingmod
-            self.left = LadspaRingmod(sr)
-            self.right = LadspaRingmod(sr)
-            for p in (self.left, self.right):
-                p.set_control(2, 0.0)      # sine off
-                p.set_control(3, 1.0)      # triangle on
-                p.set_control(5, 0.0)      # square off
-            self.ok = True
-        except Exception:
-            self.ok = False
+        self.plugin = _fx_plugin("chopper", sr, "LadspaStereoRingmod",
+                                 "NumpyStereoRingmod", wave="triangle")
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
-        if self.ok:
-            rate = 2.0 + 14.0 * amount
-            for p in (self.left, self.right):
-                p.set(2.0 * amount, rate)
-            left = np.ascontiguousarray(buf[:, 0])
-            self.left.run(left)
-            buf[:, 0] = left
-            right = np.ascontiguousarray(buf[:, 1])
-            self.right.run(right)
-            buf[:, 1] = right
-        else:
-            # fallback: tremolo cuadrado propio
-            n = np.arange(len(buf), dtype=np.float32)
-            rate = 2.0 + 14.0 * amount
-            mod = (np.sin(2 * np.pi * rate * n / 44100) > 0)
-            buf *= (1.0 - amount + amount * mod)[:, None]
+        if self.plugin is None:
+            return
+        if amount != self._amount:
+            self._amount = amount
+            self.plugin.set(2.0 * amount, 2.0 + 14.0 * amount)
+        self.plugin.run(buf)
 
 
 class FlangerFx:
     """Retro Flanger: barrido suave con LFO, sin distorsión ni pérdida de
     nivel (alternativa más limpia al chopper para el mismo canal)."""
 
+    tail_s = 0.2        # feedback del peine
+
     def __init__(self, sr: int):
-        try:
-            from ladspa_fx import LadspaStereoRetroFlange
-            self.plugin = LadspaStereoRetroFlange(sr)
-        except Exception:
-            self.plugin = None
+        self.plugin = _fx_plugin("flanger", sr, "LadspaStereoRetroFlange",
+                                 "NumpyStereoRetroFlange")
+        self._dry = np.zeros((2, 0), dtype=np.float32)   # copia de trabajo
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
         # El plugin procesa al 100% wet, así que la mezcla seco/procesado la
@@ -967,11 +2282,17 @@ class FlangerFx:
         # que interferir.
         if self.plugin is None or amount <= 0.001:
             return
-        dry = buf.copy()
-        self.plugin.set(6.0 * amount, 0.3 + 0.7 * amount)
+        dry = self._dry
+        if dry.shape != buf.shape:
+            dry = self._dry = np.empty_like(buf)
+        dry[:] = buf
+        if amount != self._amount:
+            self._amount = amount
+            self.plugin.set(6.0 * amount, 0.3 + 0.7 * amount)
         self.plugin.run(buf)
         buf *= amount
-        buf += dry * (1.0 - amount)
+        dry *= 1.0 - amount
+        buf += dry
 
 
 class MasterChain:
@@ -982,24 +2303,20 @@ class MasterChain:
     las canciones y, sobre todo, que ningún pico llegue a fondo de escala —
     en directo los knobs pueden sumar mucho nivel de golpe.
 
-    Sin los plugins LADSPA el EQ se desactiva (no merece la pena aproximarlo)
-    pero el limitador cae a un recorte suave, que es lo que protege.
+    El EQ sigue `fx_backend("eq")` (sin plugin, el de numpy_fx; sin scipy
+    tampoco, se desactiva). Sin el limitador LADSPA queda un recorte suave,
+    que es lo que protege.
     """
 
     def __init__(self, sr: int, lo_db=0.0, mid_db=0.0, hi_db=0.0,
                  limit_db=-1.0, release_s=0.15, gain_db=0.0):
         self.sr = sr
         self.limit = 10.0 ** (limit_db / 20.0)
-        self._l = np.zeros(0, dtype=np.float32)
-        self._r = np.zeros(0, dtype=np.float32)
-        try:
-            from ladspa_fx import LadspaDjEq
-            self.eq = LadspaDjEq(sr)
-            self.eq.set(lo_db, mid_db, hi_db)
-            if lo_db == mid_db == hi_db == 0.0:
-                self.eq = None          # plano: nos ahorramos el paso
-        except Exception:
-            self.eq = None
+        self.eq = None
+        if not lo_db == mid_db == hi_db == 0.0:     # plano: sin paso de EQ
+            self.eq = _fx_plugin("eq", sr, "LadspaDjEq", "NumpyDjEq")
+            if self.eq is not None:
+                self.eq.set(lo_db, mid_db, hi_db)
         try:
             from ladspa_fx import LadspaLimiter
             self.limiter = LadspaLimiter(sr)
@@ -1008,78 +2325,88 @@ class MasterChain:
             self.limiter = None
 
     def apply(self, buf: np.ndarray):
-        n = len(buf)
-        if self.eq is None and self.limiter is None:
-            # sin plugins: recorte suave (tanh) en vez de cortar cuadrado
-            np.tanh(buf / self.limit, out=buf)
-            buf *= self.limit
+        """`buf` (2, n) planar, in situ."""
+        if self.eq is not None:
+            self.eq.process(buf[0], buf[1], buf[0], buf[1])
+        if self.limiter is not None:
+            self.limiter.process(buf[0], buf[1], buf[0], buf[1])
             return
-        if len(self._l) != n:
-            self._l = np.zeros(n, dtype=np.float32)
-            self._r = np.zeros(n, dtype=np.float32)
-        left = np.ascontiguousarray(buf[:, 0])
-        right = np.ascontiguousarray(buf[:, 1])
-        for stage in (self.eq, self.limiter):
-            if stage is None:
-                continue
-            stage.process(left, right, self._l, self._r)
-            left, right = self._l.copy(), self._r.copy()
-        buf[:, 0] = left
-        buf[:, 1] = right
+        # sin limitador: recorte suave (tanh) en vez de cortar cuadrado
+        np.divide(buf, self.limit, out=buf)
+        np.tanh(buf, out=buf)
+        buf *= self.limit
 
 
 class _ReverbBase:
     """Mezcla wet/dry común a las reverbs: el plugin genera solo la cola y
     aquí se suma al dry. `amount` es la cantidad de wet; el dry se toca poco
     (si se recorta mucho, subir el knob solo se percibe como bajar volumen).
-    Sin el plugin LADSPA cae a un peine de 4 retardos primos entre sí (más
-    pobre, pero da cola).
+    Sin el plugin LADSPA (o con el motor "numpy") cae a un peine de 4
+    retardos primos entre sí (más pobre, pero da cola).
+
+    En el engine no van por canal sino como bus auxiliar (`AUX_SENDS`): los
+    canales mandan su envío, el bus saca una sola cola con `tail()` y la
+    suma a la mezcla; el canal solo baja su dry (`_DRY_DUCK`). `apply()`
+    queda para usarlo como efecto de inserto suelto.
     """
 
+    _PRESET = ""           # nombre en EFFECT_PRESETS (para fx_backend)
     _WET_GAIN = 1.0        # calibrado por reverb: el nivel de cola varía mucho
     _DRY_DUCK = 0.25
+    # Realimentación del peine: la suma de sus taps es 2.53, así que por
+    # encima de ~0.39 la cola crece sin fin en vez de apagarse.
+    _COMB_FB = 0.35
+    tail_s = 4.0           # hasta que la cola baja de -90 dB
+    tail_optional = True   # ver QualityGovernor: con carga se recorta
 
     def _make_plugin(self, sr):
         raise NotImplementedError
 
     def __init__(self, sr: int):
         self.sr = sr
-        self._l = np.zeros(0, dtype=np.float32)
-        self._r = np.zeros(0, dtype=np.float32)
+        self._wet = np.zeros((3, 0), dtype=np.float32)   # mono, cola L, R
         try:
+            if fx_backend(self._PRESET) != "ladspa":
+                raise ImportError("motor numpy")
             self.plugin = self._make_plugin(sr)
         except Exception:
             self.plugin = None
             self._taps = [int(sr * t) for t in (0.0297, 0.0371, 0.0411, 0.0437)]
-            self._ring = np.zeros((max(self._taps) + 1, 2), dtype=np.float32)
+            self._ring = np.zeros((2, max(self._taps) + 1), dtype=np.float32)
             self._pos = 0
 
-    def apply(self, buf: np.ndarray, amount: float):
-        if amount <= 0.001:
-            return
-        wet_gain = self._WET_GAIN * amount
-        dry_gain = 1.0 - self._DRY_DUCK * amount
-        n = len(buf)
+    def tail(self, src: np.ndarray, out: np.ndarray):
+        """Cola de `src` (2, n), sin ganancia de wet, en `out` (2, n)."""
+        n = src.shape[1]
         if self.plugin is not None:
-            if len(self._l) != n:
-                self._l = np.zeros(n, dtype=np.float32)
-                self._r = np.zeros(n, dtype=np.float32)
-            mono = np.ascontiguousarray((buf[:, 0] + buf[:, 1]) * 0.5)
-            self.plugin.wet(mono, self._l, self._r)
-            buf *= dry_gain
-            buf[:, 0] += self._l * wet_gain
-            buf[:, 1] += self._r * wet_gain
+            if self._wet.shape[1] < n:
+                self._wet = np.zeros((3, n), dtype=np.float32)
+            mono = self._wet[0, :n]
+            np.add(src[0], src[1], out=mono)
+            mono *= 0.5
+            self.plugin.wet(mono, out[0], out[1])
             return
-        ring, d = self._ring, len(self._ring)
+        ring, d = self._ring, self._ring.shape[1]
         pos = self._pos
-        wet = np.zeros_like(buf)
+        out[:] = 0.0
         idx = (pos + np.arange(n)) % d
         for k, tap in enumerate(self._taps):
-            wet += ring[(idx - tap) % d] * (0.7 ** k)
-        ring[idx] = buf + wet * 0.45
+            out += ring[:, (idx - tap) % d] * (0.7 ** k)
+        ring[:, idx] = src + out * self._COMB_FB
         self._pos = (pos + n) % d
-        buf *= dry_gain
-        buf += wet * (wet_gain * 0.3)
+        out *= 0.3
+
+    def apply(self, buf: np.ndarray, amount: float):
+        if amount <= 0.001:
+            return
+        n = buf.shape[1]
+        if self._wet.shape[1] < n:
+            self._wet = np.zeros((3, n), dtype=np.float32)
+        wet = self._wet[1:, :n]
+        self.tail(buf, wet)
+        buf *= 1.0 - self._DRY_DUCK * amount
+        wet *= self._WET_GAIN * amount
+        buf += wet
 
 
 class ReverbFx(_ReverbBase):
@@ -1087,6 +2414,7 @@ class ReverbFx(_ReverbBase):
     atención. La cola del plugin sale a ~0.3 del nivel de entrada, de ahí
     la ganancia alta del wet."""
 
+    _PRESET = "reverb"
     _WET_GAIN = 2.5
     _TIME_S = 1.6
     _DAMPING = 0.35
@@ -1105,6 +2433,7 @@ class SpaceFx(_ReverbBase):
 
     # Calibrado para que a tope se note de verdad: el dry baja a la mitad y
     # la cola pesa ~2x la señal original (respuesta lineal con el knob).
+    _PRESET = "space"
     _WET_GAIN = 1.4
     _DRY_DUCK = 0.5
     _ROOM_M = 60.0
@@ -1112,6 +2441,7 @@ class SpaceFx(_ReverbBase):
     _DAMPING = 0.5
     _BANDWIDTH = 0.75
     _EARLY_DB = -10.0
+    tail_s = 10.0
 
     def _make_plugin(self, sr):
         from ladspa_fx import LadspaGVerb
@@ -1127,21 +2457,47 @@ class BeatDelayFx:
     mezcla wet/dry y, con ella, cuántas repeticiones se oyen (feedback).
     Sin plugin LADSPA: línea de retardo propia en numpy, para tener el
     tiempo exacto en samples sin depender de puertos en segundos/pulgadas.
+
+    El anillo se reserva una vez para la negra más lenta (`MIN_BPM`) y el
+    tempo solo mueve el punto de lectura, con retardo fraccionario: con el
+    knob de tempo girando llega un tempo nuevo casi en cada bloque, y
+    antes cada uno reservaba un buffer nuevo en el callback y tiraba los
+    ecos. El salto de un retardo a otro se funde en `XFADE_S` para que no
+    haga clic; si llega otro tempo a mitad de fundido, espera a que acabe.
     """
 
+    MIN_BPM = 40.0
+    XFADE_S = 0.01
+    tail_optional = True
+    _CHUNK = 1024           # tamaño de los buffers de trabajo
+
     def __init__(self, sr: int):
         self.sr = sr
         self._tempo: Optional[float] = None
-        self._buf = np.zeros((1, 2), dtype=np.float32)
-        self._pos = 0
+        self._size = int(math.ceil(60.0 / self.MIN_BPM * sr)) + 2
+        self._buf = np.zeros((2, self._size), dtype=np.float32)
+        self._w = 0                                 # posición de escritura
+        self._delay = 60.0 / 120.0 * sr             # muestras (fraccionario)
+        self._target: Optional[float] = None        # tempo nuevo en espera
+        self._old = self._delay                     # el que se funde
+        self._xfade = max(1, int(self.XFADE_S * sr))
+        self._fade_left = 0
+        self._ramp = (np.arange(1, self._xfade + 1, dtype=np.float32)
+                      / np.float32(self._xfade))
+        # todos con el mismo paso de fila: si el destino de un ufunc es
+        # contiguo y la entrada no, numpy reserva un buffer intermedio
+        self._tmp, self._wet, self._wet_old = np.zeros(
+            (3, 2, self._CHUNK + 1), dtype=np.float32)
 
     def set_tempo(self, bpm: float):
         if bpm == self._tempo:
             return
         self._tempo = bpm
-        beat_samples = max(1, round(60.0 / max(bpm, 1.0) * self.sr))
-        self._buf = np.zeros((beat_samples, 2), dtype=np.float32)
-        self._pos = 0
+        delay = 60.0 / max(bpm, self.MIN_BPM) * self.sr
+        if self._w == 0:
+            self._delay = delay         # aún no hay ecos que fundir
+        else:
+            self._target = delay
 
     # Con feedback 0.6 se oían ~9 repeticiones y, al llegar el knob al tope,
     # el seco desaparecía del todo (solo ecos): demasiado delay y demasiado
@@ -1150,46 +2506,89 @@ class BeatDelayFx:
     _FEEDBACK_RANGE = 0.22
     _WET_MAX = 0.5
 
+    @property
+    def tail_s(self) -> float:
+        """Diez negras: con el feedback máximo (0.30) el décimo eco ya está
+        por debajo de -90 dB."""
+        return 10.0 * self._delay / self.sr
+
+    def _read(self, delay: float, m: int, out: np.ndarray):
+        """Las `m` muestras de hace `delay` (interpolación lineal) en `out`.
+        Hace falta m <= delay: todo lo leído ya está escrito."""
+        di = int(delay)
+        fr = delay - di
+        tmp = self._tmp[:, :m + 1]
+        p = (self._w - di - 1) % self._size
+        k = min(m + 1, self._size - p)
+        tmp[:, :k] = self._buf[:, p:p + k]
+        tmp[:, k:] = self._buf[:, :m + 1 - k]
+        if fr == 0.0:
+            out[:] = tmp[:, 1:]
+            return
+        np.multiply(tmp[:, 1:], 1.0 - fr, out=out)
+        tmp[:, :m] *= fr
+        out += tmp[:, :m]
+
     def apply(self, buf: np.ndarray, amount: float):
         if amount <= 0.001:
             return
         feedback = self._FEEDBACK_MIN + self._FEEDBACK_RANGE * amount
-        fb_buf = self._buf
-        d = len(fb_buf)
-        pos = self._pos
-        n = len(buf)
-        # d (una negra a tempo, miles de muestras) es siempre >> n (bloque
-        # de audio, cientos de muestras): el caso normal no envuelve el
-        # buffer circular y se puede vectorizar con slices en vez de un
-        # bucle Python muestra a muestra (caro en la Pi).
-        if pos + n <= d:
-            wet = fb_buf[pos:pos + n].copy()
-            fb_buf[pos:pos + n] = buf + wet * feedback
-        else:
-            k = d - pos
-            wet = np.concatenate((fb_buf[pos:], fb_buf[:n - k]))
-            fb_buf[pos:] = buf[:k] + fb_buf[pos:] * feedback
-            fb_buf[:n - k] = buf[k:] + fb_buf[:n - k] * feedback
-        self._pos = (pos + n) % d
         w = self._WET_MAX * amount
-        buf *= (1.0 - w)
-        buf += wet * w
+        n = buf.shape[1]
+        size = self._size
+        s = 0
+        while s < n:
+            if not self._fade_left and self._target is not None:
+                self._old, self._delay = self._delay, self._target
+                self._target = None
+                self._fade_left = self._xfade
+            # d (una negra a tempo, miles de muestras) es casi siempre > n
+            # (bloque de audio): un trozo por bloque, con slices en vez de
+            # un bucle Python muestra a muestra (caro en la Pi).
+            m = min(n - s, self._CHUNK, int(self._delay))
+            if self._fade_left:
+                m = min(m, self._fade_left, int(self._old))
+            x = buf[:, s:s + m]
+            wet = self._wet[:, :m]
+            self._read(self._delay, m, wet)
+            if self._fade_left:
+                old = self._wet_old[:, :m]
+                self._read(self._old, m, old)
+                j = self._xfade - self._fade_left
+                wet -= old
+                wet *= self._ramp[j:j + m]
+                wet += old
+                self._fade_left -= m
+            p = self._w % size
+            k = min(m, size - p)
+            for dst, a, b in ((self._buf[:, p:p + k], 0, k),
+                              (self._buf[:, :m - k], k, m)):
+                np.multiply(wet[:, a:b], feedback, out=dst)
+                dst += x[:, a:b]
+            self._w += m
+            x *= 1.0 - w
+            wet *= w
+            x += wet
+            s += m
 
 
 class TapeDelayFx:
     """Tape Delay: 0 = seco puro; al subir entra el eco (tap 1 a -6 dB,
     dry baja 2 dB para no inflar la mezcla)."""
 
+    tail_s = 4.0
+    tail_optional = True
+
     def __init__(self, sr: int):
-        try:
-            from ladspa_fx import LadspaStereoTapeDelay
-            self.plugin = LadspaStereoTapeDelay(sr)
-        except Exception:
-            self.plugin = None
+        self.plugin = _fx_plugin("tape_delay", sr, "LadspaStereoTapeDelay",
+                                 "NumpyStereoTapeDelay")
+        self._amount: Optional[float] = None   # último knob pasado al plugin
 
     def apply(self, buf: np.ndarray, amount: float):
         if self.plugin is not None:
-            self.plugin.set(-2.0 * amount, -90.0 + 84.0 * amount)
+            if amount != self._amount:
+                self._amount = amount
+                self.plugin.set(-2.0 * amount, -90.0 + 84.0 * amount)
             self.plugin.run(buf)
 
 
@@ -1209,6 +2608,114 @@ EFFECT_PRESETS = {
     "reverb": ReverbFx,
     "space": SpaceFx,
 }
+# Presets que no se instancian por canal sino una vez por engine, como bus
+# auxiliar: la cantidad del canal es su nivel de envío (ver mix_live).
+AUX_SENDS = ("reverb", "space")
+
+
+# --------------------------------------------------------------------------
+# Eventos externos
+# --------------------------------------------------------------------------
+
+# Tipos de evento de `Engine.push_event` como registro int64 [tipo, a, b, c]
+# (engine_proc manda los mismos números por la memoria compartida).
+EV_CC, EV_PARAM, EV_TRIGGER, EV_PLAY, EV_PAUSE, EV_STOP = range(1, 7)
+EV_DONE = 0     # ya aplicado al empezar el bloque (ver _apply_block_events)
+EVENT_KINDS = {"cc": EV_CC, "param": EV_PARAM, "trigger": EV_TRIGGER,
+               "play": EV_PLAY, "pause": EV_PAUSE, "stop": EV_STOP}
+_KIND_NAMES = {v: k for k, v in EVENT_KINDS.items()}
+# Los parámetros de `Engine._apply_param` viajan como índice en esta tupla.
+PARAM_NAMES = ("volume", "pan", "pitch", "cutoff", "tempo") + \
+    tuple(EFFECT_PRESETS)
+# Lo que se lee muestra a muestra (o mueve el secuenciador) y por eso se
+# aplica en su muestra del bloque. Volumen, pan y cantidades de efecto se
+# leen una vez por bloque en mix_live: esperar a su muestra solo los
+# retrasaría.
+SAMPLE_PARAMS = ("pitch", "cutoff", "tempo")
+SAMPLE_CCS = (1, 20)                # cutoff, pitch (ver Engine._apply_cc)
+
+
+def block_rate(kind: int, b: int) -> bool:
+    """Si el registro (kind, a, b, c) es de un parámetro de bloque."""
+    if kind == EV_CC:
+        return b not in SAMPLE_CCS
+    if kind == EV_PARAM:
+        return PARAM_NAMES[b] not in SAMPLE_PARAMS
+    return False
+
+
+def encode_event(event: tuple) -> tuple | None:
+    """Evento de `Engine.push_event` -> registro (tipo, a, b, c), o None si
+    no tiene traducción (tipo o parámetro desconocido)."""
+    kind = EVENT_KINDS.get(event[0])
+    if kind is None:
+        return None
+    if kind == EV_PARAM:
+        _k, ci, name, val = event
+        if name not in PARAM_NAMES:
+            return None
+        return (kind, ci, PARAM_NAMES.index(name), val)
+    args = tuple(int(a) for a in event[1:4])
+    return (kind,) + args + (0,) * (3 - len(args))
+
+
+def decode_event(rec) -> tuple:
+    """Inverso de `encode_event`."""
+    kind, a, b, c = (int(x) for x in rec)
+    name = _KIND_NAMES[kind]
+    if kind == EV_CC:
+        return (name, a, b, c)
+    if kind == EV_PARAM:
+        return (name, a, PARAM_NAMES[b], c)
+    if kind == EV_TRIGGER:
+        return (name, a)
+    return (name,)
+
+
+class EventRing:
+    """Cola de eventos externos: anillo preasignado de registros int64
+    [tipo, a, b, c, t], con t el instante de llegada en µs de time.time().
+
+    Escriben varios hilos (MIDI, UI), que se turnan con un lock entre ellos;
+    lee solo el render, sin lock: el registro se escribe antes de avanzar el
+    contador y se lee antes de liberarlo. Sin tuplas ni nodos de cola por
+    evento en el camino de audio. Con el anillo lleno el evento se pierde
+    (`perdidos`): 256 son segundos de knobs girando a la vez.
+    """
+
+    SLOTS = 256
+
+    def __init__(self, slots: int = SLOTS):
+        self.rec = np.zeros((slots, 5), dtype=np.int64)
+        self.cuenta = np.zeros(2, dtype=np.int64)   # [escritos, leídos]
+        self.perdidos = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self.cuenta[0] - self.cuenta[1])
+
+    def put(self, rec: tuple, t_us: int) -> bool:
+        slots = len(self.rec)
+        with self._lock:
+            w = int(self.cuenta[0])
+            if w - int(self.cuenta[1]) >= slots:
+                self.perdidos += 1
+                return False
+            row = self.rec[w % slots]
+            row[:4] = rec
+            row[4] = t_us
+            self.cuenta[0] = w + 1
+        return True
+
+    def head(self) -> Optional[np.ndarray]:
+        """El registro más viejo sin leer (una vista), o None."""
+        r = self.cuenta[1]
+        if r == self.cuenta[0]:
+            return None
+        return self.rec[r % len(self.rec)]
+
+    def pop(self):
+        self.cuenta[1] += 1
 
 
 # --------------------------------------------------------------------------
@@ -1223,7 +2730,8 @@ class Channel:
         "cc_vol", "cc_pan", "cc_pitch", "cc_cutoff",
         "kind", "midi_def", "midi_note", "midi_ticks", "midi_vel",
         "groove", "g_pos", "g_ticks",
-        "fx_amounts", "fx_objs",
+        "fx_amounts", "fx_objs", "fx_active", "fx_seen", "fx_sends",
+        "fx_duck", "quiet_for", "silent_out", "skipped",
     )
 
     def __init__(self, idx: int):
@@ -1259,6 +2767,20 @@ class Channel:
         # Efectos live del canal (presets LADSPA): nombre -> cantidad 0-1
         self.fx_amounts: dict[str, float] = {}
         self.fx_objs: dict[str, object] = {}
+        # Los encendidos, ya resueltos: (efecto, cantidad, set_tempo). Se
+        # rehace solo cuando fx_amounts deja de coincidir con fx_seen.
+        self.fx_active: list[tuple] = []
+        self.fx_seen: dict[str, float] = {}
+        # Envíos a los buses auxiliares: (índice en AUX_SENDS, nivel), y lo
+        # que baja el dry del canal por ellos.
+        self.fx_sends: list[tuple[int, float]] = []
+        self.fx_duck = 1.0
+        # Silencio a la salida del delay (ver Engine.mix_live): muestras
+        # seguidas sin señal, si el bloque de salida ha quedado a cero y
+        # cuántos pasos se ahorró en el último bloque.
+        self.quiet_for = 0
+        self.silent_out = False
+        self.skipped = 0
 
 
 # --------------------------------------------------------------------------
@@ -1276,7 +2798,10 @@ class Engine:
     """
 
     def __init__(self, project, sample_rate: int = SAMPLE_RATE,
-                 audio_delay: float = 0.0, wavs_dir: str | None = None):
+                 audio_delay: float = 0.0, wavs_dir: str | None = None,
+                 sample_cache: Optional[SampleCache] = None,
+                 lazy_samples: bool = False, sample_format: str = "float32",
+                 stream_mb: float = 0.0):
         if not isinstance(project, LGPTProject):
             project = LGPTProject(Path(project))
         if project.root is None:
@@ -1301,12 +2826,17 @@ class Engine:
         # exacto en que sonará, en vez de con "cuando lo recibió el bridge".
         self.block_time_ms: Optional[float] = None
         self._tick_offset = 0        # muestra del bloque en la que cae el tick
-        self.bank = SampleBank(project.dir)
         self.instruments = {
             iid: parse_instrument(iid, ins["params"])
             for iid, ins in project.instrument_bank.items()
             if ins["type"] == "Sample"
         }
+        # Con `lazy_samples` solo se cargan de entrada los samples que
+        # alguna frase dispara (ver `SampleBank`).
+        self.bank = SampleBank(
+            project.dir, sample_cache,
+            self._sample_order() if lazy_samples else None, sample_store(),
+            sample_format, stream_mb, self._sample_starts())
         self.midi_instruments = {
             iid: parse_midi_instrument(iid, ins["params"])
             for iid, ins in project.instrument_bank.items()
@@ -1327,9 +2857,37 @@ class Engine:
         self.channels = [Channel(i) for i in range(CHANNEL_COUNT)]
         self.tick_count = 0
         self.tick_phase = 0.0           # samples hasta el próximo tick
+        # Muestras de secuenciador desde start() (incluye las saltadas por
+        # catch_up): es el índice de lectura de los stems pre-renderizados.
+        self.song_sample = 0
+        # Stems (lgpt_stems.py): canal -> audio t=0 ya renderizado, (n, 2).
+        # Un canal con stem no sintetiza sus voces: copia del stem. Solo
+        # valen mientras el tempo sea el de la canción (ver set_tempo_scale).
+        self.stems: dict[int, np.ndarray] = {}
+        # Voces sin filtro ni rampas de pitch en un solo render por lotes.
+        self.batch_voices = True
+        # Saltarse canales, delays, efectos y buses cuyo audio se sabe cero
+        # (ver render_dry/mix_live). `skip_dry`/`skip_live`: pasos ahorrados
+        # en el último bloque de cada mitad del render.
+        self.skip_silence = True
+        self.skip_dry = 0
+        self.skip_live = 0
+        # Notas one-shot ya renderizadas (ver NoteCache); None = sin caché.
+        mb = _NOTE_CACHE_MB[0]
+        self.note_cache: Optional[NoteCache] = (
+            NoteCache(int(mb * 1024 * 1024)) if mb > 0 else None)
+        # Calidad según la carga (ver QualityGovernor); lo alimenta quien
+        # mide el render, y `enabled = False` lo deja siempre al máximo.
+        self.governor = QualityGovernor()
         self.playing = False
         self.finished = False           # True al recibir STOP
-        self.events: queue.SimpleQueue = queue.SimpleQueue()
+        # Eventos externos con su instante de llegada; el render los aplica
+        # en su muestra del bloque (ver `_event_offset`).
+        self.events = EventRing()
+        self._event_lead_ms = 0.0     # cuánto por delante suena el bloque
+        self._event_block_ms = 0.0
+        self._event_floor = 0         # los eventos no van hacia atrás
+        self._pad_off = 0             # muestra del bloque del último pad
         self.unsupported_cmds: set[str] = set()
         self.muted: set[int] = set()    # canales silenciados (índice 0-7)
         # Delay de audio POR CANAL (segundos): el secuenciador y los
@@ -1337,8 +2895,26 @@ class Engine:
         # La modulación del controlador (vol/pan/drive/LP) se aplica a la
         # salida del delay (t+1), en tiempo real para quien escucha.
         self._stage: dict[int, np.ndarray] = {}     # render t=0 por canal
+        # Arrays de trabajo de las voces: por canal (van en paralelo) y el
+        # de las que se renderizan por lotes, del tamaño de `_stage`
+        self._voice_work: dict[int, VoiceScratch] = {}
+        self._batch_work: Optional[BatchScratch] = None
         self._rings: list[Optional[np.ndarray]] = [None] * CHANNEL_COUNT
         self._ring_pos = [0] * CHANNEL_COUNT
+        # Salida del delay por canal (render_dry -> mix_live) en render() y
+        # la mezcla de mix_live, planar como todo el audio interno.
+        self._dry = np.zeros((CHANNEL_COUNT, 2, 0), dtype=np.float32)
+        self._mix = np.zeros((2, 0), dtype=np.float32)
+        # Buses auxiliares (reverbs compartidas por todos los canales): el
+        # efecto, creado al primer uso, y la suma de envíos de cada uno.
+        self.aux: list[Optional[_ReverbBase]] = [None] * len(AUX_SENDS)
+        self._aux_in = np.zeros((len(AUX_SENDS), 2, 0), dtype=np.float32)
+        self._aux_out = np.zeros((2, 0), dtype=np.float32)
+        self._aux_quiet = [0] * len(AUX_SENDS)   # muestras sin envío
+        # Hasta dónde puede tener señal cada buffer t=0 (lo que escribió el
+        # último bloque que sonó); de ahí en adelante está a cero. Con el
+        # tamaño de bloque cambiando no vale limpiar solo el bloque actual.
+        self._stage_used = [0] * CHANNEL_COUNT
         self.set_audio_delay(audio_delay)
         # Banco de WAVs para los pads (001.wav -> pad 0, 002.wav -> pad 1...)
         self.pad_samples: list[tuple[np.ndarray, int]] = []
@@ -1348,13 +2924,31 @@ class Engine:
         if wavs_dir:
             self._load_pad_samples(Path(wavs_dir))
 
+    def _sample_order(self) -> list[str]:
+        """Samples de los instrumentos que la canción dispara, en el orden
+        en que suenan por primera vez."""
+        return [self.instruments[iid].sample_name
+                for iid in instrument_order(self.project)
+                if iid in self.instruments]
+
+    def _sample_starts(self) -> dict[str, set[int]]:
+        """Donde empieza a sonar cada sample (el `start` de sus
+        instrumentos, que es también el punto de loop): lo que un sample
+        leído del disco tiene que tener ya en memoria al disparar."""
+        starts: dict[str, set[int]] = {}
+        for idef in self.instruments.values():
+            pos = idef.start if idef.end <= 0 else min(idef.start,
+                                                       idef.end - 1)
+            starts.setdefault(idef.sample_name, set()).add(max(pos, 0))
+        return starts
+
     def _load_pad_samples(self, wavs_dir: Path):
         if not wavs_dir.is_dir():
             return
         for wav in sorted(wavs_dir.glob("*.wav")):
             try:
-                data, sr = sf.read(str(wav), dtype="float32", always_2d=True)
-                self.pad_samples.append((np.ascontiguousarray(data), sr))
+                smp = self.bank.read(wav)
+                self.pad_samples.append((smp.data, smp.sr))
             except Exception as exc:
                 print(f"[engine] pad {wav.name}: {exc}")
 
@@ -1363,10 +2957,13 @@ class Engine:
         self.audio_delay = seconds
         n = int(seconds * self.sr)
         self._rings = [
-            np.zeros((n, 2), dtype=np.float32) if n > 0 else None
+            np.zeros((2, n), dtype=np.float32) if n > 0 else None
             for _ in range(CHANNEL_COUNT)
         ]
         self._ring_pos = [0] * CHANNEL_COUNT
+        # Muestras seguidas de silencio escritas en cada anillo: a partir de
+        # su longitud está entero a cero (uno recién creado ya lo está).
+        self._ring_quiet = [n] * CHANNEL_COUNT
 
     # -- transporte ---------------------------------------------------------
 
@@ -1394,6 +2991,7 @@ class Engine:
                     break
         self.tick_count = 0
         self.tick_phase = 0.0
+        self.song_sample = 0
         self.finished = False
         self.playing = True
         self.unsupported_cmds.clear()
@@ -1426,9 +3024,19 @@ class Engine:
         for ch in self.channels:
             self._midi_stop_note(ch)
 
-    def push_event(self, *event):
-        """Encola un evento externo (MIDI, teclado). Thread-safe."""
-        self.events.put(event)
+    def push_event(self, *event, t_ms: Optional[float] = None):
+        """Encola un evento externo (MIDI, teclado). Thread-safe.
+
+        Se sella con el instante en que llega (`t_ms`, reloj de time.time()
+        en ms, si lo trae quien lo produce) y suena un retardo fijo después,
+        en su muestra del bloque: el jitter de llegada no se cuantiza al
+        bloque (46 ms con 2048)."""
+        rec = encode_event(event)
+        if rec is None:
+            return
+        if t_ms is None:
+            t_ms = time.time() * 1000.0
+        self.events.put(rec, int(t_ms * 1000.0))
 
     # SyncMaster::SetTempo del upstream
     def _tick_samples(self) -> float:
@@ -1442,6 +3050,11 @@ class Engine:
         scale = min(max(scale, 1.0), 1.0 + TEMPO_BOOST_MAX)
         if scale == self.tempo_scale:
             return
+        if self.stems:
+            # Los stems se grabaron al tempo de la canción: acelerada, su
+            # audio ya no cae en los ticks. Esos canales vuelven a sintetizar
+            # desde la próxima nota.
+            self.drop_stems()
         self.tempo_scale = scale
         self.tempo = self.base_tempo * scale
         self.samples_per_tick = self._tick_samples()
@@ -1458,72 +3071,269 @@ class Engine:
           - t+1: el audio sale del delay y AHÍ se aplica la modulación
             del controlador (volumen, pan, drive, LP), así que los pots
             se oyen al instante. El pitch se aplica en la voz (t=0).
+
+        Es `render_dry` + `mix_live` seguidos; el player puede llamarlos por
+        separado para adelantar la primera parte en otro hilo.
         """
-        self._drain_events()
+        out = np.empty((frames, 2), dtype=np.float32)
+        self.render_into(out)
+        return out
+
+    @property
+    def events_lost(self) -> int:
+        """Eventos externos perdidos con la cola llena (`EventRing`)."""
+        return self.events.perdidos
+
+    @property
+    def skipped(self) -> int:
+        """Pasos del render ahorrados por silencio en el último bloque
+        (anillos de delay, efectos, canales y buses)."""
+        return self.skip_dry + self.skip_live
+
+    def render_into(self, out: np.ndarray):
+        """`render(len(out))` escrito directamente en `out` ((n, 2) float32,
+        p. ej. el buffer de PortAudio). Con la arena de `prepare()` hecha, un
+        bloque no reserva memoria para audio: todo va sobre buffers del
+        engine y de los efectos que se reutilizan."""
+        frames = len(out)
+        if self._dry.shape[2] < frames:
+            self.prepare(max(frames, 1024))
+        quiet = self.render_dry(frames, self._dry)
+        self.mix_live(self._dry, frames, out, quiet)
+
+    def prepare(self, frames: int):
+        """Arena de trabajo para bloques de hasta `frames` muestras: buffer
+        t=0, arrays de trabajo de las voces y salida del delay de cada
+        canal. El player la dimensiona al abrir el stream; un bloque mayor
+        la hace crecer."""
+        self._dry = np.zeros((CHANNEL_COUNT, 2, frames), dtype=np.float32)
+        self._mix = np.zeros((2, frames), dtype=np.float32)
+        self._aux_in = np.zeros((len(AUX_SENDS), 2, frames), dtype=np.float32)
+        self._aux_out = np.zeros((2, frames), dtype=np.float32)
+        for ci in range(CHANNEL_COUNT):
+            self._stage[ci] = np.zeros((2, frames), dtype=np.float32)
+            self._voice_work[ci] = VoiceScratch(frames)
+        self._batch_work = None
+        self._stage_used = [0] * CHANNEL_COUNT
+
+    def render_dry(self, frames: int, dest: np.ndarray) -> int:
+        """Parte t=0 del render: eventos, secuenciador, voces y línea de
+        retardo. Deja en `dest[ci, :, :frames]` lo que sale del delay de cada
+        canal, todavía sin efectos, volumen ni pan del controlador.
+
+        `dest` es (CHANNEL_COUNT, 2, >= frames), planar, y lo pone quien
+        llama: en modo render-ahead es un hueco del anillo entre hilos.
+
+        Devuelve la máscara de canales (bit ci) cuya salida se sabe cero:
+        sin voz ni stem que suene y con el anillo del delay ya vacío. Esos
+        no pasan por el delay, y `mix_live` se salta su parte.
+        """
+        self._event_clock(frames)
+        skip = self.skip_silence
+        live = [not skip] * CHANNEL_COUNT
         # 1. t=0: render de voces por canal
+        used = self._stage_used
+        for ch in self.channels:
+            ci = ch.idx
+            buf = self._stage.get(ci)
+            if buf is None or buf.shape[1] < frames:
+                buf = np.zeros((2, max(frames, 1024)), dtype=np.float32)
+                self._stage[ci] = buf
+                self._voice_work[ci] = VoiceScratch(buf.shape[1])
+            elif used[ci]:
+                buf[:, :used[ci]] = 0.0
+            used[ci] = 0
+        # Sub-bloques entre ticks y eventos: cada evento se aplica en su
+        # muestra, como los ticks.
+        stems = self.stems
+        off = 0
+        due = self._event_offset(frames, 0)
+        while True:
+            while due <= off and due < frames:
+                self._apply_event(off)
+                due = self._event_offset(frames, off)
+            if off >= frames:
+                break
+            if not self.playing:
+                off = due                     # parado: hasta el siguiente
+                continue
+            n = min(frames - off, int(self.tick_phase), due - off)
+            if n > 0:
+                busy = [ch for ch in self.channels
+                        if (ch.voice is not None or ch.release is not None)
+                        and ch.idx not in self.muted
+                        and ch.idx not in stems]
+                for ch in busy:
+                    live[ch.idx] = True
+                batched = self._render_batched(busy, off, n)
+                _parallel(self._render_voices, busy, off, n, batched)
+                if stems:
+                    self._play_stems(off, n, live)
+                self.song_sample += n
+                off += n
+                self.tick_phase -= n
+            if self.tick_phase < 1.0:
+                frac = self.tick_phase        # resto fraccionario ya consumido
+                self._tick_offset = off
+                self._process_tick()
+                self.tick_phase = self.samples_per_tick + frac
+        for ci in range(CHANNEL_COUNT):
+            if live[ci]:
+                used[ci] = frames
+        # 2. salida del delay de cada canal
+        quiet = 0
+        skipped = 0
         for ch in self.channels:
-            buf = self._stage.get(ch.idx)
-            if buf is None or len(buf) < frames:
-                buf = np.zeros((max(frames, 1024), 2), dtype=np.float32)
-                self._stage[ch.idx] = buf
+            ci = ch.idx
+            out = dest[ci, :, :frames]
+            if live[ci]:
+                self._ring_quiet[ci] = 0
             else:
-                buf[:frames] = 0.0
-        if self.playing:
-            off = 0
-            while off < frames and self.playing:
-                n = min(frames - off, int(self.tick_phase))
-                if n > 0:
-                    for ch in self.channels:
-                        if ch.idx in self.muted:
-                            continue
-                        v = ch.voice
-                        if v is not None:
-                            if v.active:
-                                v.cc_vol = 1.0       # vol/pan del controlador
-                                v.cc_pan = None      # van tras el delay
-                                v.cc_pitch = ch.cc_pitch
-                                v.cc_cutoff = ch.cc_cutoff
-                                v.render(self._stage[ch.idx], off, n)
-                            if not v.active:
-                                ch.voice = None
-                        r = ch.release      # voz anterior en fundido (declick)
-                        if r is not None:
-                            if r.active:
-                                r.cc_vol = 1.0
-                                r.cc_pan = None
-                                r.render(self._stage[ch.idx], off, n)
-                            if not r.active:
-                                ch.release = None
-                    off += n
-                    self.tick_phase -= n
-                if self.tick_phase < 1.0:
-                    frac = self.tick_phase    # resto fraccionario ya consumido
-                    self._tick_offset = off
-                    self._process_tick()
-                    self.tick_phase = self.samples_per_tick + frac
-        # 2. t+1: salida del delay, efectos del controlador y mezcla
-        out = np.zeros((frames, 2), dtype=np.float32)
+                ring = self._rings[ci]
+                if ring is None or self._ring_quiet[ci] >= ring.shape[1]:
+                    out[:] = 0.0       # el hueco puede traer un bloque viejo
+                    quiet |= 1 << ci
+                    skipped += ring is not None
+                    continue
+                self._ring_quiet[ci] += frames
+            self._delay_channel(ch, self._stage[ci][:, :frames], out)
+        self.skip_dry = skipped
+        return quiet
+
+    def _render_batched(self, busy: list[Channel], off: int,
+                        n: int) -> set[int]:
+        """Renderiza de una vez (`render_batch`) las voces que lo admiten y
+        devuelve sus id para que `_render_voices` no las repita."""
+        if not self.batch_voices:
+            return set()
+        voices, mixes = [], []
+        for ch in busy:
+            v = ch.voice
+            if v is not None and v.active and v.batchable():
+                v.cc_vol = 1.0
+                v.cc_pan = None
+                v.cc_pitch = ch.cc_pitch
+                v.cc_cutoff = ch.cc_cutoff
+                voices.append(v)
+                mixes.append(self._stage[ch.idx])
+            r = ch.release
+            if r is not None and r.active and r.batchable():
+                r.cc_vol = 1.0
+                r.cc_pan = None
+                voices.append(r)
+                mixes.append(self._stage[ch.idx])
+        if len(voices) < 2:          # una sola: el camino normal cuesta igual
+            return set()
+        work = self._batch_work
+        if work is None or not work.fits(len(voices), n):
+            # crece hasta el máximo de voces que se juntan, y ahí se queda
+            rows = len(voices) if work is None else max(len(voices),
+                                                        work.rows)
+            work = BatchScratch(rows, self._stage[busy[0].idx].shape[1])
+            self._batch_work = work
+        render_batch(voices, mixes, off, n, work)
+        return {id(v) for v in voices}
+
+    def _render_voices(self, ch: Channel, off: int, n: int,
+                       done: set[int] = frozenset()):
+        """Voz y release de un canal en su buffer t=0 (sub-bloque). Las de
+        `done` ya se renderizaron por lotes: solo se mira si acabaron."""
+        v = ch.voice
+        if v is not None:
+            if v.active and id(v) not in done:
+                v.cc_vol = 1.0       # vol/pan del controlador
+                v.cc_pan = None      # van tras el delay
+                v.cc_pitch = ch.cc_pitch
+                v.cc_cutoff = ch.cc_cutoff
+                v.render(self._stage[ch.idx], off, n,
+                         self._voice_work[ch.idx])
+            if not v.active:
+                ch.voice = None
+        r = ch.release      # voz anterior en fundido (declick)
+        if r is not None:
+            if r.active and id(r) not in done:
+                r.cc_vol = 1.0
+                r.cc_pan = None
+                r.render(self._stage[ch.idx], off, n,
+                         self._voice_work[ch.idx])
+            if not r.active:
+                ch.release = None
+
+    def mix_live(self, dry: np.ndarray, frames: int,
+                 out: Optional[np.ndarray] = None,
+                 quiet: Optional[int] = None) -> np.ndarray:
+        """Parte t+1 del render: efectos, volumen y pan del controlador
+        sobre la salida del delay (`dry`, de `render_dry`, se modifica in
+        situ), master, pads y cadena final. Devuelve el bloque estéreo
+        (frames, 2), en `out` si se pasa: es el único sitio donde el audio
+        se intercala, todo lo anterior va planar (2, n).
+
+        Es lo único que tiene que ir pegado al callback para que los knobs
+        se oigan al instante.
+
+        `quiet` es la máscara que devuelve `render_dry` (canales a cero);
+        sin ella se mira el propio `dry`. Un canal en silencio no pasa por
+        los efectos cuya cola ya se ha apagado (`tail_s`, acumulada a lo
+        largo de la cadena), ni por volumen, pan, envíos y mezcla si ya no
+        le queda ninguno sonando; igual los buses auxiliares.
+        """
+        if not self.skip_silence:
+            quiet = 0
+        elif quiet is None:
+            quiet = 0
+            for ch in self.channels:
+                if not dry[ch.idx, :, :frames].any():
+                    quiet |= 1 << ch.idx
+        _parallel(self._live_channel, self.channels, dry, frames, quiet)
+        if self._mix.shape[1] < frames:
+            self._mix = np.zeros((2, frames), dtype=np.float32)
+            self._aux_in = np.zeros((len(AUX_SENDS), 2, frames),
+                                    dtype=np.float32)
+            self._aux_out = np.zeros((2, frames), dtype=np.float32)
+        mix = self._mix[:, :frames]
+        mix[:] = 0.0
+        # Envíos post-fader a los buses auxiliares: una sola reverb para
+        # todos los canales que la piden, en vez de una por canal.
+        wanted = 0          # buses con algún canal que les manda
+        sending = 0         # ... y con señal en este bloque
+        skipped = 0
         for ch in self.channels:
-            block = self._delay_channel(ch, self._stage[ch.idx][:frames])
-            for name, cls in EFFECT_PRESETS.items():
-                amount = ch.fx_amounts.get(name, 0.0)
-                if amount > 0.001:
-                    fx = ch.fx_objs.get(name)
-                    if fx is None:
-                        fx = cls(self.sr)
-                        ch.fx_objs[name] = fx
-                    set_tempo = getattr(fx, "set_tempo", None)
-                    if set_tempo is not None:
-                        set_tempo(self.tempo)
-                    fx.apply(block, amount)
-            if ch.cc_vol != 1.0:
-                block *= ch.cc_vol
-            if ch.cc_pan is not None:
-                x = ch.cc_pan / 254.0
-                block[:, 0] *= min(1.0, 2.0 * (1.0 - x))
-                block[:, 1] *= min(1.0, 2.0 * x)
-            out += block
-        out *= self.master
+            skipped += ch.skipped
+            for k, _level in ch.fx_sends:
+                wanted |= 1 << k
+            if ch.silent_out:
+                continue
+            block = dry[ch.idx, :, :frames]
+            if ch.fx_sends:
+                for k, level in ch.fx_sends:
+                    send = self._aux_in[k, :, :frames]
+                    if not sending >> k & 1:
+                        sending |= 1 << k
+                        np.multiply(block, level, out=send)
+                    else:
+                        send += block * level
+                block *= ch.fx_duck
+            mix += block
+        if wanted:
+            wet = self._aux_out[:, :frames]
+            for k in range(len(AUX_SENDS)):
+                if not wanted >> k & 1:
+                    continue
+                bus = self._aux_bus(k)
+                if sending >> k & 1:
+                    self._aux_quiet[k] = 0
+                elif self._aux_quiet[k] >= \
+                        self._tail_s(bus, self.governor.tails) * self.sr:
+                    skipped += 1              # sin envío y con la cola ya muda
+                    continue
+                else:
+                    self._aux_quiet[k] += frames
+                    self._aux_in[k, :, :frames] = 0.0
+                bus.tail(self._aux_in[k, :, :frames], wet)
+                wet *= bus._WET_GAIN
+                mix += wet
+        self.skip_live = skipped
+        mix *= self.master
         # Pad sampler: suena directo (sin delay ni FX de canal) y DESPUÉS del
         # master, porque el banco es un instrumento de directo ajeno a la
         # canción: si escalara con el master sonaría distinto en cada tema
@@ -1531,12 +3341,17 @@ class Engine:
         pv = self.pad_voice
         if pv is not None:
             if pv.active:
-                pv.render(out, 0, frames)
+                k = min(self._pad_off, frames)  # disparado a mitad de bloque
+                pv.render(mix, k, frames - k)
             if not pv.active:
                 self.pad_voice = None
+        self._pad_off = 0
         if self.master_chain is not None:
-            self.master_chain.apply(out)
-        np.clip(out, -1.0, 1.0, out=out)
+            self.master_chain.apply(mix)
+        np.clip(mix, -1.0, 1.0, out=mix)
+        if out is None:
+            return np.ascontiguousarray(mix.T)
+        out[:] = mix.T
         return out
 
     # Tope de recuperación por llamada: si el hueco es enorme (proceso
@@ -1556,62 +3371,250 @@ class Engine:
             return
         seconds = min(seconds, self._MAX_CATCH_UP_SECONDS)
         self.tick_phase -= seconds * self.sr
+        self.song_sample += round(seconds * self.sr)
         while self.tick_phase < 1.0 and self.playing:
             frac = self.tick_phase
             self._process_tick()
             self.tick_phase = self.samples_per_tick + frac
 
-    def _delay_channel(self, ch: Channel, block: np.ndarray) -> np.ndarray:
-        """Línea de retardo circular del canal; devuelve el bloque
-        retrasado (copia nueva) o el propio `block` si no hay delay."""
+    def _play_stems(self, off: int, n: int, live: list[bool]):
+        """Copia al buffer t=0 de cada canal con stem, desde la muestra `off`
+        del bloque, las `n` que tocan en la posición actual de la canción.
+        Un stem que se acaba (la canción sigue en bucle más allá de lo
+        grabado) se suelta y el canal vuelve a sintetizar.
+
+        Lo escrito se apunta aquí en `live` y `_stage_used`: si el stem se
+        suelta en un sub-bloque posterior, `render_dry` ya no lo ve y sin
+        eso el buffer se quedaría sin limpiar para el bloque siguiente."""
+        start = self.song_sample
+        used = self._stage_used
+        for ci, stem in list(self.stems.items()):
+            if ci in self.muted:
+                continue
+            if start + n > len(stem):
+                self.drop_stems((ci,))
+                continue
+            self._stage[ci][:, off:off + n] = stem[start:start + n].T
+            if not getattr(stem, "silent", False):    # ceros: nada que ver
+                live[ci] = True
+                used[ci] = max(used[ci], off + n)
+
+    def drop_stems(self, channels=None):
+        """Deja de usar los stems de `channels` (todos si None).
+
+        Las voces de esos canales no han avanzado mientras sonaba el stem,
+        así que no se pueden retomar donde estaban: se descartan sin fundido
+        (su audio ya no sale) y el canal vuelve a sonar en la próxima nota.
+        """
+        for ci in list(self.stems if channels is None else channels):
+            if self.stems.pop(ci, None) is None:
+                continue
+            ch = self.channels[ci]
+            ch.voice = None
+            ch.release = None
+
+    def _live_channel(self, ch: Channel, dry: np.ndarray, frames: int,
+                      quiet: int = 0):
+        """Efectos, volumen y pan del controlador de un canal, in situ.
+
+        Con la entrada en silencio (bit del canal en `quiet`), un efecto se
+        salta si lleva callado más que la cola de todo lo que tiene delante
+        en la cadena más la suya: su entrada y su salida son cero. Si se
+        salta la cadena entera, el canal queda mudo (`silent_out`)."""
+        block = dry[ch.idx, :, :frames]
+        if ch.fx_amounts != ch.fx_seen:
+            self._rebuild_fx(ch)
+        if quiet >> ch.idx & 1:
+            age = ch.quiet_for            # muestras calladas antes del bloque
+            ch.quiet_for += frames
+        else:
+            age = -1
+            ch.quiet_for = 0
+        skipped = 0
+        ringing = False                   # algún efecto aún con cola
+        tail = 0.0
+        tails = self.governor.tails
+        for fx, amount, set_tempo in ch.fx_active:
+            if age >= 0:
+                tail += self._tail_s(fx, tails) * self.sr
+                if age >= tail:
+                    skipped += 1
+                    continue
+                ringing = True
+            if set_tempo is not None:
+                set_tempo(self.tempo)
+            fx.apply(block, amount)
+        if age >= 0 and not ringing:
+            ch.silent_out = True
+            ch.skipped = skipped + 1      # + volumen, pan, envíos y mezcla
+            return
+        ch.silent_out = False
+        ch.skipped = skipped
+        if ch.cc_vol != 1.0:
+            block *= ch.cc_vol
+        if ch.cc_pan is not None:
+            x = ch.cc_pan / 254.0
+            block[0] *= min(1.0, 2.0 * (1.0 - x))
+            block[1] *= min(1.0, 2.0 * x)
+
+    @staticmethod
+    def _tail_s(fx, tails: bool) -> float:
+        """Cola de `fx`; sin colas (`QualityGovernor.tails`), las de los
+        efectos de baja prioridad (`tail_optional`) se recortan."""
+        if tails or not getattr(fx, "tail_optional", False):
+            return fx.tail_s
+        return min(fx.tail_s, QualityGovernor.TAIL_S)
+
+    def _rebuild_fx(self, ch: Channel):
+        """Rehace la lista de efectos encendidos del canal (en el orden de
+        EFFECT_PRESETS). Un efecto que no se previó al cargar se crea aquí,
+        en el hilo de audio: solo pasa la primera vez."""
+        active = []
+        sends = []
+        duck = 1.0
+        for name, cls in EFFECT_PRESETS.items():
+            amount = ch.fx_amounts.get(name, 0.0)
+            if amount <= 0.001:
+                continue
+            if name in AUX_SENDS:
+                sends.append((AUX_SENDS.index(name), amount))
+                duck *= 1.0 - cls._DRY_DUCK * amount
+                continue
+            fx = ch.fx_objs.get(name)
+            if fx is None:
+                fx = cls(self.sr)
+                ch.fx_objs[name] = fx
+            active.append((fx, amount, getattr(fx, "set_tempo", None)))
+        ch.fx_active = active
+        ch.fx_sends = sends
+        ch.fx_duck = duck
+        ch.fx_seen = dict(ch.fx_amounts)
+
+    def _aux_bus(self, k: int) -> "_ReverbBase":
+        """Efecto del bus auxiliar `AUX_SENDS[k]`, creado si aún no existe
+        (normalmente ya lo ha creado `preload_fx` al cargar la canción)."""
+        bus = self.aux[k]
+        if bus is None:
+            bus = self.aux[k] = EFFECT_PRESETS[AUX_SENDS[k]](self.sr)
+        return bus
+
+    def preload_fx(self, targets):
+        """Instancia los efectos (canal, nombre) que puede pedir la canción,
+        antes de sonar. Los que ya existen, o nombres que no son efectos,
+        se ignoran."""
+        for ci, name in targets:
+            cls = EFFECT_PRESETS.get(name)
+            if cls is None or not 0 <= ci < CHANNEL_COUNT:
+                continue
+            if name in AUX_SENDS:
+                self._aux_bus(AUX_SENDS.index(name))
+                continue
+            ch = self.channels[ci]
+            if name not in ch.fx_objs:
+                ch.fx_objs[name] = cls(self.sr)
+
+    def _delay_channel(self, ch: Channel, block: np.ndarray,
+                       out: np.ndarray):
+        """Línea de retardo circular del canal: escribe en `out` lo que sale
+        del delay y guarda `block` en su lugar (sin delay, copia tal cual)."""
         ring = self._rings[ch.idx]
         if ring is None:
-            return block
-        frames = len(block)
-        d = len(ring)
+            out[:] = block
+            return
+        frames = block.shape[1]
+        d = ring.shape[1]
         pos = self._ring_pos[ch.idx]
-        result = np.empty_like(block)
         if frames <= d - pos:
-            result[:] = ring[pos:pos + frames]
-            ring[pos:pos + frames] = block
+            out[:] = ring[:, pos:pos + frames]
+            ring[:, pos:pos + frames] = block
         else:
             k = d - pos
-            result[:k] = ring[pos:]
-            ring[pos:] = block[:k]
-            result[k:] = ring[:frames - k]
-            ring[:frames - k] = block[k:]
+            out[:, :k] = ring[:, pos:]
+            ring[:, pos:] = block[:, :k]
+            out[:, k:] = ring[:, :frames - k]
+            ring[:, :frames - k] = block[:, k:]
         self._ring_pos[ch.idx] = (pos + frames) % d
-        return result
 
     # -- eventos externos -----------------------------------------------------
 
-    def _drain_events(self):
-        while True:
-            try:
-                ev = self.events.get_nowait()
-            except queue.Empty:
-                return
-            kind = ev[0]
-            if kind == "cc":
-                self._apply_cc(ev[1], ev[2], ev[3])
-            elif kind == "param":
-                self._apply_param(ev[1], ev[2], ev[3])
-            elif kind == "trigger":
-                self._trigger_pad(ev[1])
-            elif kind == "play":
-                if self.finished:
-                    self.start()
+    def _event_clock(self, frames: int):
+        """Al empezar un bloque, cuánto por delante del reloj va a sonar
+        (`block_time_ms` - ahora). Los eventos suenan ese adelanto más un
+        bloque después de llegar: lo que llegó durante el bloque anterior
+        cae entero en este, repartido como llegó. El adelanto se toma del
+        peor reciente (se olvida despacio, como `peor_desde`) para que el
+        retardo sea fijo y no baile con el jitter del callback. Los de
+        parámetros de bloque no esperan (`_apply_block_events`)."""
+        if self.block_time_ms is None:
+            return
+        lead = self.block_time_ms - time.time() * 1000.0
+        self._event_lead_ms = max(lead, self._event_lead_ms * 0.999)
+        self._event_floor = 0
+        self._event_block_ms = frames * 1000.0 / self.sr
+        self._apply_block_events()
+
+    def _apply_block_events(self):
+        """Aplica ya los eventos en cola de parámetros de bloque (volumen,
+        pan, efectos; ver `block_rate`), aunque vayan detrás de uno que aún
+        espera su muestra. Quedan en el anillo como EV_DONE: solo el render
+        lee, y las filas entre los dos contadores son suyas."""
+        events = self.events
+        rec = events.rec
+        slots = len(rec)
+        for i in range(int(events.cuenta[1]), int(events.cuenta[0])):
+            row = rec[i % slots]
+            kind, a, b, c = (int(x) for x in row[:4])
+            if block_rate(kind, b):
+                if kind == EV_CC:
+                    self._apply_cc(a, b, c)
                 else:
-                    self.playing = True
-            elif kind == "pause":
-                self.playing = False
-            elif kind == "stop":
-                self.playing = False
-                self.finished = True
-                for ch in self.channels:
-                    ch.voice = None
-                    self._midi_stop_note(ch)
-                self._transport("transport_stop", False)
+                    self._apply_param(a, PARAM_NAMES[b], c)
+                row[0] = EV_DONE
+
+    def _event_offset(self, frames: int, off: int) -> int:
+        """Muestra del bloque en la que toca el siguiente evento (>= `off`),
+        o `frames` si no hay ninguno para este bloque. Sin reloj del player
+        (`block_time_ms`: tests, render offline) todos al principio."""
+        rec = self.events.head()
+        if rec is None:
+            return frames
+        if self.block_time_ms is None or rec[0] == EV_DONE:
+            return off
+        at = (int(rec[4]) / 1000.0 + self._event_lead_ms
+              + self._event_block_ms - self.block_time_ms)
+        k = max(int(at * self.sr / 1000.0), off, self._event_floor)
+        return min(k, frames)
+
+    def _apply_event(self, off: int):
+        """Aplica el evento más viejo de la cola, que cae en la muestra
+        `off` del bloque."""
+        events = self.events
+        kind, a, b, c = (int(x) for x in events.head()[:4])
+        events.pop()
+        if kind == EV_DONE:
+            return
+        self._event_floor = off
+        if kind == EV_CC:
+            self._apply_cc(a, b, c)
+        elif kind == EV_PARAM:
+            self._apply_param(a, PARAM_NAMES[b], c)
+        elif kind == EV_TRIGGER:
+            self._trigger_pad(a)
+            self._pad_off = off
+        elif kind == EV_PLAY:
+            if self.finished:
+                self.start()
+            else:
+                self.playing = True
+        elif kind == EV_PAUSE:
+            self.playing = False
+        elif kind == EV_STOP:
+            self.playing = False
+            self.finished = True
+            for ch in self.channels:
+                ch.voice = None
+                self._midi_stop_note(ch)
+            self._transport("transport_stop", False)
 
     def _apply_cc(self, ci: int, cc: int, val: int):
         """Mapeo MIDI CC por canal: 1=cutoff, 7=volumen, 10=pan, 20=pitch."""
@@ -1864,7 +3867,9 @@ class Engine:
             if sample is None:
                 return
             ch.voice = Voice(sample, idef, final, self.sr,
-                             self.samples_per_tick)
+                             self.samples_per_tick, self.governor)
+            if self.note_cache is not None and ch.cc_pitch == 1.0:
+                self.note_cache.attach(ch.voice)
             ch.kind = "sample"
         else:
             self._midi_start_note(ch, mdef, final)
@@ -1888,7 +3893,7 @@ class Engine:
             index=0, sample_name="", volume=int(255 * vol),
             pan=127, root_note=60)
         self.pad_voice = Voice(Sample(sample, sr), idef, 60, self.sr,
-                               self.samples_per_tick)
+                               self.samples_per_tick, governor=self.governor)
 
     def _process_row_commands(self, ch: Channel):
         if not ch.playing or ch.phrase == 0xFF:
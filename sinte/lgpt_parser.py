@@ -255,6 +255,31 @@ class LGPTProject:
         return names
 
 
+def instrument_order(p: LGPTProject) -> list[int]:
+    """Instrumentos que la canción llega a disparar, en el orden en que
+    suenan por primera vez: recorre song -> chains -> phrases fila a fila
+    (los 8 canales a la par) con el "último instrumento" de cada canal, como
+    el engine. Los que solo están en el banco no salen."""
+    order: dict[int, None] = {}
+    last = [0] * 8
+    for pos in range(len(p.song) // 8):
+        chains = [p.song[pos * 8 + ci] for ci in range(8)]
+        for step in range(16):
+            for row in range(16):
+                for ci, chain in enumerate(chains):
+                    if chain == 0xFF:
+                        continue
+                    phrase = p.chains[chain * 16 + step]
+                    if phrase == 0xFF:
+                        continue
+                    idx = phrase * 16 + row
+                    if p.instruments[idx] != 0xFF:
+                        last[ci] = p.instruments[idx]
+                    if p.notes[idx] != 0xFF:
+                        order.setdefault(last[ci])
+    return list(order)
+
+
 def note_to_midi(note_byte: int) -> int:
     """Convierte una nota LGPT (00-7F?) a número MIDI."""
     return note_byte
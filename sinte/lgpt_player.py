@@ -38,8 +38,15 @@ from pathlib import Path
 import numpy as np
 import sounddevice as sd
 
+import lgpt_stems
+from audio_ring import RenderAhead
+from blocksizes import BlocksizeMemory
+from engine_proc import EngineProcess, load_engine, parse_pot_target, \
+    read_song_config, sube_prioridad
 from event_server import EventMidiOut, EventServer
-from lgpt_engine import Engine, MasterChain, MidiOut, SAMPLE_RATE
+from lgpt_engine import Engine, MidiOut, SAMPLE_FORMATS, SAMPLE_RATE, \
+    set_filter_kernel, set_fx_backend, set_note_cache_mb, \
+    set_render_workers, set_sample_store_mb
 
 DEFAULT_SONGS_DIR = "/home/angel/Documentos/canciones/"
 CONFIG_PATH = Path(__file__).resolve().parent / "lttileplayer.toml"
@@ -98,13 +105,24 @@ class EstadoAudio:
                   descoloca el sincronismo con los clientes y hay que
                   recuperarlo.
 
+    Con render adelantado (`audio_ring.RenderAhead`) el coste se parte en
+    dos: `ultima_ms`/`peor_*` son solo el callback (mezcla en directo) y
+    `render_*` el hilo que sintetiza por delante. `vacios` son los bloques
+    en que el callback no encontró nada renderizado y sacó silencio.
+
+    `carga_cancion` es la peor carga (fracción del presupuesto) desde que
+    empezó la canción, del callback o del render adelantado: con ella y los
+    contadores decide `BlocksizeMemory` si la canción pide otro blocksize.
+
     Se escribe solo desde el callback y se lee solo desde la UI. Sin locks a
     propósito: son enteros y floats sueltos, y una lectura a medias da un
     número viejo, nunca un fallo. En el camino de audio no se bloquea nada.
     """
 
     __slots__ = ("xruns", "apurados", "saltos", "bloques", "peor_ms",
-                 "ultima_ms", "peor_desde", "causa", "presupuesto_ms")
+                 "ultima_ms", "peor_desde", "causa", "presupuesto_ms",
+                 "vacios", "render_ultima_ms", "render_peor_ms",
+                 "render_peor_desde", "carga_cancion")
 
     def __init__(self, presupuesto_ms: float):
         self.presupuesto_ms = presupuesto_ms
@@ -119,6 +137,11 @@ class EstadoAudio:
         self.ultima_ms = 0.0
         self.peor_desde = 0.0      # peor de la ventana reciente (se va olvidando)
         self.causa = ""            # descripción del último incidente
+        self.vacios = 0            # render adelantado sin bloque listo
+        self.render_ultima_ms = 0.0
+        self.render_peor_ms = 0.0
+        self.render_peor_desde = 0.0
+        self.carga_cancion = 0.0
 
     @property
     def carga(self) -> float:
@@ -129,34 +152,7 @@ class EstadoAudio:
 
     @property
     def incidentes(self) -> int:
-        return self.xruns + self.saltos
-
-
-def sube_prioridad() -> str:
-    """Pide prioridad para el proceso; devuelve qué consiguió.
-
-    Se intenta primero tiempo real (SCHED_FIFO): con él, el hilo de audio no
-    espera a que el planificador atienda a otra cosa, que es de donde salen
-    los cortes cuando la CPU no está saturada de media pero sí a ratos.
-
-    Prioridad 10 y no más: por encima del resto pero por debajo de los hilos
-    del kernel, para que un cuelgue nuestro no deje la máquina inservible.
-
-    Si no hay permiso (hace falta rtprio en limits.conf o CAP_SYS_NICE) se
-    prueba con `nice`, y si tampoco, se sigue sin prioridad. Nunca es un
-    error fatal: el player tiene que arrancar igual.
-    """
-    try:
-        param = os.sched_param(10)
-        os.sched_setscheduler(0, os.SCHED_FIFO, param)
-        return "tiempo real (SCHED_FIFO 10)"
-    except (AttributeError, OSError, PermissionError):
-        pass
-    try:
-        os.nice(-10)
-        return f"nice {os.nice(0)}"
-    except (OSError, PermissionError):
-        return "sin prioridad (falta permiso)"
+        return self.xruns + self.saltos + self.vacios
 
 
 def load_config(path: Path) -> dict:
@@ -360,49 +356,6 @@ def match_button(mapping: dict, msg) -> str | None:
     return None
 
 
-def parse_pot_target(target: str) -> tuple | None:
-    """'canales:parametro[:tope]' -> (canales, parametro, escala).
-
-    canales: uno o varios separados por coma (`2` o `1,2`), canal tracker
-    0-7; un mismo knob puede así mover varias pistas a la vez (p.ej. la
-    reverb de todos los bajos).
-    tope: recorrido máximo del knob en % (100 por defecto). Sirve para dejar
-    un efecto en una zona discreta: `1,2:reverb:35` = de 0 a 35%.
-    Devuelve None si no es válido.
-    """
-    try:
-        parts = target.split(":")
-    except AttributeError:
-        return None
-    if len(parts) == 2:
-        chans_str, name = parts
-        scale = 1.0
-    elif len(parts) == 3:
-        chans_str, name, top = parts
-        try:
-            scale = float(top) / 100.0
-        except ValueError:
-            return None
-        if not 0.0 < scale <= 1.0:
-            return None
-    else:
-        return None
-    if not name:
-        return None
-    chans = []
-    for c in chans_str.split(","):
-        try:
-            ci = int(c)
-        except ValueError:
-            return None
-        if not 0 <= ci < 8:
-            return None
-        chans.append(ci)
-    if not chans:
-        return None
-    return (tuple(chans), name, scale)
-
-
 def match_pot(pots: list, msg) -> tuple | None:
     """Devuelve (canales, parámetro, nº de knob 0-7, escala) del pot que
     coincide con el mensaje, o None.
@@ -644,6 +597,26 @@ def pan_meter(pan: int, width: int = 5) -> str:
     return "".join(cells)
 
 
+def engine_opts(args) -> dict:
+    """Lo que necesita `engine_proc.load_engine` de la config del player
+    (un dict plano: tiene que poder mandarse al proceso del engine)."""
+    return {"samplerate": args.samplerate, "delay": args.delay,
+            "wavs_dir": args.wavs_dir, "master_fx": args.master_fx,
+            "pad_volume": args.pad_volume, "stems": args.stems,
+            "sample_cache": args.sample_cache,
+            "lazy_samples": args.lazy_samples,
+            "sample_format": args.sample_format,
+            "stream_mb": args.stream_mb,
+            "cache_dir": args.cache_dir,
+            "filter_kernel": args.filter_kernel,
+            "render_workers": args.render_workers,
+            "note_cache_mb": args.note_cache_mb,
+            "sample_store_mb": args.sample_store_mb,
+            "fx_backend": args.fx_backend,
+            "fx_backends": args.fx_backends,
+            "quality_governor": args.quality_governor}
+
+
 class Player:
     def __init__(self, args):
         self.args = args
@@ -661,10 +634,11 @@ class Player:
         self.event_out: EventMidiOut | None = None
         self.recorder: WavRecorder | None = None
         self._notice: tuple | None = None   # (mensaje, timestamp) para la UI
+        self._calidad_vista = 0.0           # hora del último cambio avisado
+        self._eventos_perdidos = 0          # `events_lost` ya avisados
         self.streamer: TcpStreamer | None = None
         self._expected_dac_time: float | None = None  # reloj real esperado
-        self.estado_audio = EstadoAudio(
-            args.blocksize / float(args.samplerate) * 1000.0)
+        self.estado_audio = EstadoAudio(0.0)   # presupuesto: _open_audio
         self._restart = False               # STOP en el menú: relanzar
         # visualizador en directo (ver constantes VIZ_*)
         self._view_mode = "viz"              # "viz" | "detail"
@@ -679,16 +653,103 @@ class Player:
         self._viz_rng = random.Random(0)     # glitch reproducible
         self.pot_labels: list = [None] * 8   # (pista, efecto) por knob activo
         self.engine_ref["pot_values"] = [0] * 8   # último valor MIDI por knob
+        # Blocksize aprendido por canción (ver blocksizes); None = el fijo.
+        self.blocksizes: BlocksizeMemory | None = None
+        if args.blocksize_auto and args.blocksize:
+            self.blocksizes = BlocksizeMemory(
+                Path(args.cache_dir) / "blocksizes.json", args.blocksize,
+                args.blocksize_min, args.blocksize_max)
+        # (canción, blocksize, cortes, apurados, bloques) al empezar la que
+        # suena: lo que hay que restar a EstadoAudio para juzgarla.
+        self._song_mark: tuple | None = None
+        self._open_audio(args.blocksize)
+
+    # -- audio ----------------------------------------------------------------
+
+    def _open_audio(self, blocksize: int):
+        """Stream de salida con bloques de `blocksize` y, si toca, el render
+        adelantado o el proceso del engine, que van al mismo tamaño. Se
+        llama al crear el player y al cambiar de blocksize entre canciones
+        (`_switch_blocksize`); `_start_audio` lo arranca."""
+        args = self.args
+        self.blocksize = blocksize
+        self._expected_dac_time = None      # stream nuevo: reloj nuevo
+        self.estado_audio.presupuesto_ms = \
+            (blocksize or 0) / float(args.samplerate) * 1000.0
+        # Render adelantado: la síntesis va en su hilo, `render_ahead`
+        # bloques por delante, y el callback solo mezcla (ver audio_ring).
+        self.render_ahead: RenderAhead | None = None
+        # Engine en un proceso hijo (ver engine_proc): el callback solo copia
+        # bloques ya mezclados de la memoria compartida.
+        self.engine_proc: EngineProcess | None = None
+        if args.engine_process:
+            self.engine_proc = EngineProcess(
+                self.projects, engine_opts(args), blocksize,
+                max(args.render_ahead, 2), self.estado_audio)
+        elif args.render_ahead > 0:
+            self.render_ahead = RenderAhead(
+                self.engine_ref, self.estado_audio, blocksize,
+                args.render_ahead, args.samplerate)
         self.stream = sd.OutputStream(
             samplerate=args.samplerate,
             channels=2,
             dtype="float32",
-            blocksize=args.blocksize,
+            blocksize=blocksize,
             device=args.device or None,
             callback=self._audio_callback,
         )
 
-    # -- audio ----------------------------------------------------------------
+    def _start_audio(self):
+        if self.render_ahead is not None:
+            self.render_ahead.start()
+        if self.engine_proc is not None:
+            self.engine_proc.midi_out = self.event_out
+            self.engine_proc.start()
+        self.stream.start()
+
+    def _close_audio(self):
+        self.stream.stop()
+        self.stream.close()
+        if self.render_ahead is not None:
+            self.render_ahead.close()
+        if self.engine_proc is not None:
+            self.engine_proc.close()
+
+    def _judge_song(self):
+        """Pasa a `BlocksizeMemory` cómo sonó la canción que acaba."""
+        mark = self._song_mark
+        if self.blocksizes is None or mark is None:
+            return
+        self._song_mark = None
+        song, blocksize, cortes, apurados, bloques = mark
+        est = self.estado_audio
+        self.blocksizes.decide(
+            song, blocksize, est.xruns + est.vacios - cortes,
+            est.apurados - apurados, est.bloques - bloques,
+            est.carga_cancion, self.args.samplerate)
+
+    def _switch_blocksize(self, project_dir: Path):
+        """Frontera de canción: juzga la que acaba y, si la que empieza
+        tiene apuntado otro blocksize, reabre el audio con él (un hueco de
+        silencio entre canciones en vez de cortes durante la canción). La
+        nueva empieza a contar en `_mark_song`, ya cargada."""
+        self._judge_song()
+        want = self.blocksizes.get(project_dir.name)
+        if want != self.blocksize:
+            self.engine_ref["engine"] = None
+            self._close_audio()
+            self._open_audio(want)
+            self._start_audio()
+            self._set_notice(f"blocksize {want}")
+
+    def _mark_song(self, project_dir: Path):
+        """Empieza a contar la canción que ya suena. Va después de la carga:
+        los cortes y apurados de cargarla (con la anterior aún sonando) no
+        son suyos, y con `XRUNS_SUBE` = 1 uno solo le doblaría el blocksize."""
+        est = self.estado_audio
+        self._song_mark = (project_dir.name, self.blocksize,
+                           est.xruns + est.vacios, est.apurados, est.bloques)
+        est.carga_cancion = 0.0
 
     def _audio_callback(self, outdata, frames, time_info, status):
         t_entrada = time.perf_counter()
@@ -704,13 +765,18 @@ class Player:
                 est.causa = f"aviso de PortAudio: {status}"
             self._set_notice(f"CORTE ({est.xruns}) {est.causa}")
         engine = self.engine_ref.get("engine")
+        ahead = self.render_ahead or self.engine_proc
         dac_time = time_info.outputBufferDacTime
         if engine is not None:
             expected = self._expected_dac_time
             if expected is not None:
                 drift = dac_time - expected
                 if drift > 0.002:      # >2ms: xrun real, no ruido de reloj
-                    engine.catch_up(drift)
+                    if ahead is not None:
+                        # el engine es de su hilo (o de su proceso)
+                        ahead.catch_up(drift)
+                    else:
+                        engine.catch_up(drift)
                     est.saltos += 1
                     est.causa = f"salto del reloj del DAC ({drift*1000:.0f}ms)"
                     self._set_notice(f"glitch recuperado ({drift * 1000:.0f}ms)")
@@ -722,9 +788,31 @@ class Player:
             # engine pueda sellar los eventos con el instante en que sonarán.
             # dac_time va en el reloj del stream, no en el del sistema: se
             # pasa a reloj de pared con la diferencia contra currentTime.
-            engine.block_time_ms = (
+            block_ms = (
                 time.time() + (dac_time - time_info.currentTime)) * 1000.0
-            outdata[:] = engine.render(frames)
+            if ahead is None:
+                engine.block_time_ms = block_ms
+                engine.render_into(outdata)
+            elif ahead is self.engine_proc:
+                block = ahead.pop()
+                if block is None:
+                    outdata[:] = 0
+                    # mientras el hijo carga la canción no es un corte
+                    if ahead.cargado():
+                        est.vacios += 1
+                        est.causa = "el proceso del engine no llega"
+                else:
+                    outdata[:] = block
+                    ahead.done(block_ms)
+            else:
+                dry = ahead.pop(engine)
+                if dry is None:
+                    outdata[:] = 0
+                    est.vacios += 1
+                    est.causa = "render adelantado sin bloque listo"
+                else:
+                    engine.mix_live(dry, frames, outdata)
+                    ahead.done(block_ms)
         recorder = self.recorder
         if recorder is not None:
             recorder.write(outdata)
@@ -742,7 +830,8 @@ class Player:
                 self._viz_ring = np.concatenate((self._viz_ring[n:], mono))
         # Coste real de este bloque. Se mide al final, con todo hecho
         # (render + grabación + streaming + visualizador), porque lo que
-        # provoca el corte es el total, no solo el motor.
+        # provoca el corte es el total, no solo el motor. Con render
+        # adelantado es solo la mezcla: la síntesis la mide su hilo.
         ms = (time.perf_counter() - t_entrada) * 1000.0
         est.ultima_ms = ms
         est.bloques += 1
@@ -751,89 +840,58 @@ class Player:
         # El peor reciente se olvida poco a poco: si no, un pico al arrancar
         # se queda en pantalla toda la sesión y deja de informar.
         est.peor_desde = max(ms, est.peor_desde * 0.999)
+        if est.presupuesto_ms and ms > est.carga_cancion * est.presupuesto_ms:
+            est.carga_cancion = ms / est.presupuesto_ms
         if ms > est.presupuesto_ms * CARGA_AVISO:
             est.apurados += 1
             if not est.causa:
                 est.causa = f"bloque apurado ({ms:.0f}ms de {est.presupuesto_ms:.0f})"
+        if ahead is None and engine is not None:
+            # todo el render va aquí: es la carga que gobierna la calidad
+            # (con render adelantado la apunta su hilo o el proceso hijo)
+            block_s = frames / self.args.samplerate
+            engine.governor.update(ms / (block_s * 1000.0), block_s)
 
     def _load_song(self, index: int):
         project_dir = self.projects[index]
         old = self.engine_ref.get("engine")
         if old is not None:
             old.panic()                   # note off de notas MIDI colgadas
-        engine = Engine(project_dir, sample_rate=self.args.samplerate,
-                        audio_delay=self.args.delay,
-                        wavs_dir=self.args.wavs_dir)
-        engine.midi_out = self.event_out
+        if self.blocksizes is not None:
+            self._switch_blocksize(project_dir)
         # Los knobs arrancan a cero en cada canción: el controlador no
         # responde a consultas (solo emite CC al moverlo), así que no hay
         # forma de leer su posición física. El motor ya nace sin efectos, y
         # esto deja la pantalla acorde hasta que se toque un mando.
         self.engine_ref["pot_values"] = [0] * 8
-        m = self.args.master_fx
-        if m:
-            engine.master_chain = MasterChain(
-                self.args.samplerate,
-                lo_db=float(m.get("eq_lo", 0.0)),
-                mid_db=float(m.get("eq_mid", 0.0)),
-                hi_db=float(m.get("eq_hi", 0.0)),
-                limit_db=float(m.get("limit", -1.0)),
-                release_s=float(m.get("release", 0.15)),
-                gain_db=float(m.get("gain", 0.0)))
-        engine.start()
-        self._apply_song_config(project_dir, engine)
+        song_cfg = read_song_config(project_dir)
+        self._apply_song_config(song_cfg)
+        live = lgpt_stems.live_channels(self.args.pots)
+        if self.engine_proc is not None:
+            engine = self.engine_proc.load(index, live)
+        else:
+            engine = load_engine(project_dir, engine_opts(self.args),
+                                 song_cfg, live)
+            if self.blocksize:               # arena del tamaño del stream
+                engine.prepare(self.blocksize)
+            engine.midi_out = self.event_out
+            notice = engine.bank.report()
+            if engine.stems:
+                notice += (f" · stems: {len(engine.stems)} de "
+                           f"{len(engine.channels)} canales")
+            self._set_notice(notice)
         self.engine_ref["engine"] = engine   # swap atómico de referencia
+        if getattr(old, "bank", None) is not None:
+            # después de cargar la nueva: lo que comparten sigue en memoria
+            old.bank.close()
+        if self.blocksizes is not None:
+            self._mark_song(project_dir)
         return engine
 
-    def _apply_song_config(self, project_dir: Path, engine: Engine):
-        """Config por canción (robotraca.json en la carpeta del proyecto):
-        mute de canales y targets de los knobs (canal:efecto).
-        Sin JSON: sin mute y sin efectos."""
-        import json
-        cfg_file = project_dir / "robotraca.json"
-        song_cfg = {}
-        if cfg_file.is_file():
-            try:
-                song_cfg = json.loads(cfg_file.read_text())
-            except (OSError, json.JSONDecodeError) as exc:
-                print(f"[config] {cfg_file.name}: {exc}")
-        engine.muted = set(song_cfg.get("mute", []))
-        # Volumen general de la canción (0-200, 100 = el del proyecto LGPT).
-        # Sirve para igualar la sonoridad entre canciones sin tocar el
-        # lgptsav.dat: unas están mezcladas más fuerte que otras.
-        master = song_cfg.get("master")
-        if master is not None:
-            try:
-                engine.master = engine.base_master * float(master) / 100.0
-            except (TypeError, ValueError):
-                print(f"[config] master inválido: {master!r}")
-        # volumen de pads: número (todos) o dict por pad {"2": 40}
-        pv = song_cfg.get("pad_volume", self.args.pad_volume)
-        if isinstance(pv, dict):
-            engine.pad_volume_map = {
-                int(k) - 1: float(v) / 100 for k, v in pv.items()}
-            # los pads que el dict no menciona siguen el volumen global,
-            # no el que trae el engine de fábrica
-            engine.pad_volume_default = float(self.args.pad_volume) / 100
-        else:
-            engine.pad_volume_map = {}
-            engine.pad_volume_default = float(pv) / 100
-        # targets por canción sobre el mapeo físico global de knobs
-        # Efectos fijos por canal, siempre activos y sin gastar un knob:
-        #   "fx": {"2": {"reverb": 15}}   (canal tracker 0-7, cantidad 0-100)
-        # Si un knob apunta al mismo efecto y canal, al moverlo manda el knob.
-        for ch_key, effects in (song_cfg.get("fx") or {}).items():
-            try:
-                ci = int(ch_key)
-            except (TypeError, ValueError):
-                continue
-            if not 0 <= ci < len(engine.channels) or not isinstance(effects, dict):
-                continue
-            for name, amount in effects.items():
-                if name in EFFECT_PRESETS:
-                    engine.channels[ci].fx_amounts[name] = float(amount) / 100.0
-                else:
-                    print(f"[config] efecto desconocido: {name}")
+    def _apply_song_config(self, song_cfg: dict):
+        """Knobs de la canción (los "pots" de robotraca.json) sobre el mapeo
+        físico global. El resto del JSON (mute, master, pads, efectos
+        fijos) va al engine en `engine_proc.apply_song_config`."""
         song_pots = song_cfg.get("pots", {})
         self.args.pots.clear()
         self.pot_labels = [None] * 8       # (nº pista, efecto) por knob activo
@@ -885,7 +943,12 @@ class Player:
 
     def _draw_carga(self, scr, curses, y: int, w: int):
         """Margen de audio arriba a la derecha: `72% ·3` = el peor bloque
-        reciente consumió el 72% de su presupuesto y van 3 incidentes.
+        reciente consumió el 72% de su presupuesto y van 3 incidentes. Con
+        caché de notas, delante `c85% 3M`: aciertos y memoria que ocupa; y
+        `s9` si el último bloque se ahorró 9 pasos de render por silencio
+        (canales, delays, efectos o buses callados). `q2` es el escalón del
+        `QualityGovernor` (0 = calidad completa, no sale): cada cambio sale
+        además en la línea de avisos con su hora.
 
         Se muestra siempre y no solo al fallar: un corte se ve venir cuando
         el porcentaje sube, y así se sabe si una canción va justa antes de
@@ -894,11 +957,40 @@ class Player:
         est = self.estado_audio
         pct = est.peor_desde / est.presupuesto_ms * 100 if est.presupuesto_ms else 0
         txt = f"{pct:.0f}%"
+        if self.render_ahead is not None or self.engine_proc is not None:
+            # render adelantado: `r` = el hilo de síntesis, que es el que va
+            # justo; el callback (primera cifra) solo mezcla.
+            rpct = (est.render_peor_desde / est.presupuesto_ms * 100
+                    if est.presupuesto_ms else 0)
+            txt += f" r{rpct:.0f}%"
+            pct = max(pct, rpct)
         if est.incidentes:
             txt += f" ·{est.incidentes}"
-        if est.xruns:
+        engine = self.engine_ref.get("engine")
+        gov = getattr(engine, "governor", None)
+        if gov is not None:
+            if gov.log and gov.log[-1][0] != self._calidad_vista:
+                ts, level, what = gov.log[-1]
+                self._calidad_vista = ts
+                hora = time.strftime("%H:%M:%S", time.localtime(ts))
+                self._set_notice(f"calidad {level}: {what} ({hora})")
+            if gov.level:
+                txt = f"q{gov.level} " + txt
+        skipped = getattr(engine, "skipped", 0)
+        if skipped:
+            txt = f"s{skipped}  " + txt
+        lost = getattr(engine, "events_lost", 0)
+        if lost != self._eventos_perdidos:
+            if lost > self._eventos_perdidos:
+                self._set_notice(f"COLA LLENA: {lost} eventos perdidos")
+            self._eventos_perdidos = lost
+        nc = getattr(engine, "note_cache", None)
+        if nc is not None and nc.hits + nc.misses:
+            hit = nc.hits / (nc.hits + nc.misses) * 100
+            txt = f"c{hit:.0f}% {nc.nbytes / 2**20:.0f}M  " + txt
+        if est.xruns or est.vacios:
             color = 6          # rojo: hubo cortes de verdad
-        elif pct >= CARGA_AVISO * 100:
+        elif pct >= CARGA_AVISO * 100 or (gov is not None and gov.level):
             color = 5          # ámbar: apurado, aún sin cortar
         else:
             color = 3          # verde tenue: con margen
@@ -1369,6 +1461,7 @@ class Player:
                     elif key in ("q", "esc"):
                         engine.push_event("stop")
                         self.engine_ref["engine"] = None
+                        self._judge_song()  # el menú no cuenta como canción
                         self._want_viz = False
                         scr.timeout(100)
                         needs_clear = True
@@ -1711,7 +1804,7 @@ class Player:
             self.streamer = TcpStreamer(self.args.stream, self.args.samplerate,
                                         on_event=self._set_notice)
             self._set_notice(f"stream puerto {self.args.stream}")
-        self.stream.start()
+        self._start_audio()
         try:
             if sys.stdin.isatty():
                 import curses
@@ -1722,8 +1815,8 @@ class Player:
             engine = self.engine_ref.get("engine")
             if engine is not None:
                 engine.panic()
-            self.stream.stop()
-            self.stream.close()
+            self._judge_song()
+            self._close_audio()
             if self.recorder is not None:
                 self.recorder.close()
             if self.streamer is not None:
@@ -1779,6 +1872,10 @@ def main():
     if not songs_path.is_absolute():
         songs_path = CONFIG_PATH.parent / songs_path
     args.songs = str(songs_path)
+    cache_path = Path(cfg.get("cache_dir", "cache"))
+    if not cache_path.is_absolute():
+        cache_path = CONFIG_PATH.parent / cache_path
+    args.cache_dir = str(cache_path)
     args.device = args.device or audio_cfg.get("output") or None
     args.samplerate = args.samplerate or audio_cfg.get("samplerate", SAMPLE_RATE)
     args.blocksize = args.blocksize or audio_cfg.get("blocksize", 512)
@@ -1811,9 +1908,50 @@ def main():
     args.master_fx = cfg.get("master", {})   # EQ + limitador de la mezcla
     args.events = cfg.get("events", {})      # servidor TCP para los clientes
     args.pad_volume = audio_cfg.get("pad_volume", 60)
+    args.filter_kernel = audio_cfg.get("filter_kernel", "auto")
+    args.render_workers = int(audio_cfg.get("render_workers", 1))
+    args.note_cache_mb = float(audio_cfg.get("note_cache_mb", 16))
+    args.fx_backend = audio_cfg.get("fx_backend", "ladspa")
+    args.fx_backends = dict(audio_cfg.get("fx_backends", {}))
+    args.quality_governor = bool(audio_cfg.get("quality_governor", True))
+    args.stems = bool(audio_cfg.get("stems", True))
+    args.sample_cache = bool(audio_cfg.get("sample_cache", True))
+    args.lazy_samples = bool(audio_cfg.get("lazy_samples", True))
+    args.sample_format = audio_cfg.get("sample_format", "float32")
+    if args.sample_format not in SAMPLE_FORMATS:
+        print(f"[audio] sample_format desconocido: {args.sample_format!r}; "
+              f"float32")
+        args.sample_format = "float32"
+    args.sample_store_mb = float(audio_cfg.get("sample_store_mb", 256))
+    args.stream_mb = float(audio_cfg.get("stream_mb", 0))
+    args.render_ahead = int(audio_cfg.get("render_ahead", 0))
+    args.engine_process = bool(audio_cfg.get("engine_process", False))
+    args.blocksize_auto = bool(audio_cfg.get("blocksize_auto", True))
+    args.blocksize_min = int(audio_cfg.get("blocksize_min", 0)) or None
+    args.blocksize_max = int(audio_cfg.get("blocksize_max", 8192))
+    if not args.blocksize and (args.render_ahead > 0 or args.engine_process):
+        print("[audio] render_ahead y engine_process necesitan un blocksize "
+              "fijo; desactivados")
+        args.render_ahead = 0
+        args.engine_process = False
 
     prioridad = sube_prioridad()
     print(f"[audio] prioridad: {prioridad}")
+    # Antes de abrir el stream: cargar el núcleo acelerado puede compilar.
+    print(f"[audio] filtro del upstream: "
+          f"{set_filter_kernel(args.filter_kernel)}")
+    print(f"[audio] hilos de render: "
+          f"{set_render_workers(args.render_workers)}")
+    print(f"[audio] motor de efectos: "
+          f"{set_fx_backend(args.fx_backend, args.fx_backends)}"
+          + "".join(f", {fx}={b}" for fx, b in args.fx_backends.items()))
+    mb = set_note_cache_mb(args.note_cache_mb)
+    print(f"[audio] caché de notas: {f'{mb:g} MB' if mb else 'apagada'}")
+    mb = set_sample_store_mb(args.sample_store_mb)
+    print(f"[audio] samples compartidos entre canciones: "
+          f"{f'hasta {mb:g} MB' if mb else 'no'}")
+    print(f"[audio] calidad según carga: "
+          f"{'sí' if args.quality_governor else 'no'}")
     Player(args).run()
 
 
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Stems pre-renderizados por canal para el reproductor.
+
+La mayoría de canales de una canción nunca reciben un knob que toque la voz
+(pitch o cutoff): los pots de `robotraca.json` apuntan a dos o tres pistas y
+casi siempre a efectos, que van DESPUÉS del delay. Aun así el engine
+resintetiza las ocho voces en cada bloque. Aquí se graba una vez, offline,
+el audio t=0 de cada canal (lo que entra en su línea de retardo) y en
+directo el engine lo copia en vez de sintetizarlo (`Engine.stems`).
+
+Los stems se guardan en crudo (float32 estéreo intercalado) en
+`<cache>/stems/<hash>/`, donde el hash cubre el lgptsav.dat, los WAV del
+proyecto y el sample rate: si cambia cualquiera, se regraban. Se leen con
+`np.memmap`, así que no ocupan RAM más allá de la caché de páginas.
+
+Uso:
+    lgpt_stems.py [--songs DIR] [--cache DIR] [--seconds N] [canción ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from lgpt_engine import CHANNEL_COUNT, SAMPLE_RATE, Engine
+from sample_cache import SampleCache
+
+# Sube si cambia algo del render que invalide los stems ya grabados.
+STEMS_VERSION = 1
+# Tope de lo que se graba. Las canciones de LGPT suelen ir en bucle (no hay
+# STOP), así que hace falta un final; pasado el tope el canal vuelve a
+# sintetizar. 6 min cubren cualquier tema del repertorio con margen.
+DEFAULT_SECONDS = 360.0
+BOUNCE_BLOCK = 2048
+# Parámetros de pot que actúan en la voz (t=0) y no a la salida del delay:
+# un canal con uno de estos no puede salir de un stem.
+VOICE_PARAMS = ("pitch", "cutoff")
+
+
+def project_hash(project_dir: Path, sample_rate: int) -> str:
+    """Huella de todo lo que determina el audio t=0 de un proyecto."""
+    h = hashlib.sha1()
+    h.update(f"v{STEMS_VERSION}:{sample_rate}".encode())
+    h.update((project_dir / "lgptsav.dat").read_bytes())
+    sample_dir = project_dir / "samples"
+    if sample_dir.is_dir():
+        for wav in sorted(sample_dir.glob("*.wav")):
+            st = wav.stat()
+            h.update(f"{wav.name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def stems_dir(cache_root: Path, project_dir: Path, sample_rate: int) -> Path:
+    return Path(cache_root) / "stems" / (
+        f"{project_dir.name}-{project_hash(project_dir, sample_rate)}")
+
+
+def render_stems(engine: Engine, seconds: float = DEFAULT_SECONDS,
+                 block: int = BOUNCE_BLOCK, sink=None) -> int:
+    """Renderiza el audio t=0 de cada canal de `engine` (ya arrancado).
+
+    `sink(ci, chunk)` recibe los bloques de cada canal en orden; devuelve
+    cuántas muestras se renderizaron (se para antes si la canción acaba con
+    STOP). El engine debe estar sin delay ni knobs: es el audio tal cual lo
+    sintetizan las voces, que es lo que luego entra en el delay en directo.
+    """
+    total = int(seconds * engine.sr)
+    done = 0
+    while done < total and engine.playing:
+        n = min(block, total - done)
+        before = engine.song_sample
+        engine.render(n)
+        played = engine.song_sample - before
+        if sink is not None:
+            for ch in engine.channels:
+                sink(ch.idx, engine._stage[ch.idx][:, :played].T)
+        done += played
+    return done
+
+
+def bounce(project_dir: Path, cache_root: Path,
+           sample_rate: int = SAMPLE_RATE,
+           seconds: float = DEFAULT_SECONDS) -> Path:
+    """Graba los stems de un proyecto en la caché (si no estaban ya)."""
+    out_dir = stems_dir(cache_root, project_dir, sample_rate)
+    if (out_dir / "meta.json").is_file():
+        return out_dir
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    engine = Engine(project_dir, sample_rate=sample_rate,
+                    sample_cache=SampleCache(Path(cache_root) / "samples"))
+    engine.start()
+    files = [open(tmp / f"ch{ci}.f32", "wb") for ci in range(CHANNEL_COUNT)]
+    peaks = [0.0] * CHANNEL_COUNT
+
+    def sink(ci, chunk):
+        if len(chunk):
+            peaks[ci] = max(peaks[ci], float(np.abs(chunk).max()))
+        files[ci].write(np.ascontiguousarray(chunk, dtype=np.float32)
+                        .tobytes())
+
+    try:
+        length = render_stems(engine, seconds, sink=sink)
+    finally:
+        for f in files:
+            f.close()
+    # Un canal que no suena en toda la canción no merece su fichero: se
+    # apunta como silencioso y en directo se le da un stem de ceros.
+    silent = [ci for ci in range(CHANNEL_COUNT) if peaks[ci] == 0.0]
+    for ci in silent:
+        (tmp / f"ch{ci}.f32").unlink()
+    meta = {"version": STEMS_VERSION, "samplerate": sample_rate,
+            "length": length, "silent": silent}
+    (tmp / "meta.json").write_text(json.dumps(meta))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp.rename(out_dir)
+    return out_dir
+
+
+def load(project_dir: Path, cache_root: Path,
+         sample_rate: int = SAMPLE_RATE) -> dict[int, np.ndarray] | None:
+    """Stems cacheados de un proyecto (canal -> memmap (n, 2)), o None si
+    no se han grabado para este contenido y sample rate."""
+    try:
+        out_dir = stems_dir(cache_root, project_dir, sample_rate)
+        meta = json.loads((out_dir / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != STEMS_VERSION:
+        return None
+    length = int(meta["length"])
+    stems: dict[int, np.ndarray] = {}
+    for ci in range(CHANNEL_COUNT):
+        if ci in meta.get("silent", []):
+            stems[ci] = _Silence(length)
+            continue
+        path = out_dir / f"ch{ci}.f32"
+        if length == 0 or not path.is_file():
+            return None
+        stems[ci] = np.memmap(path, dtype=np.float32, mode="r",
+                              shape=(length, 2))
+    return stems
+
+
+class _Silence:
+    """Stem de un canal mudo: longitud conocida y slices de ceros, sin
+    fichero ni memoria detrás (una vista de un solo cero)."""
+
+    _ZERO = np.zeros(1, dtype=np.float32)
+    silent = True       # el engine no lo cuenta como canal con señal
+
+    def __init__(self, length: int):
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, key):
+        n = len(range(*key.indices(self._length)))
+        return np.broadcast_to(self._ZERO, (n, 2))
+
+
+def live_channels(pots: list) -> set[int] | None:
+    """Canales que un knob puede tocar en la voz (no se pueden servir de un
+    stem). None = cualquiera: sin pots configurados manda el mapeo CC por
+    defecto del engine, que llega a todos los canales, y un knob de tempo
+    desplaza todo el secuenciador.
+
+    pots: la lista (spec, (canales, parámetro, escala), idx) del player.
+    """
+    if not pots:
+        return None
+    live: set[int] = set()
+    for _spec, (chans, name, _scale), _idx in pots:
+        if name == "tempo":
+            return None
+        if name in VOICE_PARAMS:
+            live.update(chans)
+    return live
+
+
+def prune(cache_root: Path, songs: list[Path], sample_rate: int) -> int:
+    """Borra los stems que ya no corresponden a ninguna canción actual."""
+    keep = {stems_dir(cache_root, p, sample_rate).name for p in songs}
+    removed = 0
+    root = Path(cache_root) / "stems"
+    if not root.is_dir():
+        return 0
+    for d in root.iterdir():
+        if d.is_dir() and d.name not in keep:
+            shutil.rmtree(d, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def main():
+    from lgpt_player import CONFIG_PATH, find_projects, load_config
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--songs", default=None)
+    parser.add_argument("--cache", default=None)
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS)
+    parser.add_argument("--prune", action="store_true",
+                        help="borra los stems de canciones que ya no existen")
+    parser.add_argument("names", nargs="*",
+                        help="canciones (nombre de carpeta); todas si no hay")
+    args = parser.parse_args()
+    cfg = load_config(Path(args.config))
+    base = Path(args.config).resolve().parent
+    songs = Path(args.songs or cfg.get("songs_dir", "songs"))
+    if not songs.is_absolute():
+        songs = base / songs
+    cache = Path(args.cache or cfg.get("cache_dir", "cache"))
+    if not cache.is_absolute():
+        cache = base / cache
+    sr = cfg.get("audio", {}).get("samplerate", SAMPLE_RATE)
+    projects = find_projects(songs)
+    if args.prune:
+        print(f"[stems] {prune(cache, projects, sr)} directorios borrados")
+    for project_dir in projects:
+        if args.names and project_dir.name not in args.names:
+            continue
+        print(f"[stems] {project_dir.name}...", flush=True)
+        out = bounce(project_dir, cache, sr, args.seconds)
+        print(f"[stems]   -> {out}")
+
+
+if __name__ == "__main__":
+    main()
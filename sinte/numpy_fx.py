@@ -0,0 +1,378 @@
+"""Efectos en numpy para los presets que sin LADSPA no tenían camino propio.
+
+Cada clase imita la interfaz de su pareja estéreo de `ladspa_fx` (mismo
+`set()` con los mismos rangos, `run(buf)` in situ sobre (2, n) planar, o
+`process()` en el EQ), así que el preset no distingue un motor del otro:
+`lgpt_engine.set_fx_backend` elige cuál se instancia. No son copias
+muestra a muestra de los swh-plugins sino versiones por bloques con el
+mismo papel musical: nada de bucles de Python por muestra.
+
+Los filtros recursivos (phaser y EQ) necesitan scipy (`lfilter`
+arrastrando el estado entre bloques); sin scipy su constructor falla y el
+preset se queda como estaba. El resto es numpy puro.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter as _lfilter
+except ImportError:
+    _lfilter = None
+
+# Las líneas de retardo procesan como mucho este número de muestras de una
+# vez (bloques más largos se trocean): es lo que se reserva de más en el
+# anillo para poder escribir el bloque entero antes de leerlo.
+CHUNK = 4096
+
+_RAMPS: dict[int, np.ndarray] = {}
+
+
+def _ramp(n: int) -> np.ndarray:
+    """0..n-1 en float64, cacheado por longitud (los bloques se repiten)."""
+    r = _RAMPS.get(n)
+    if r is None:
+        r = _RAMPS[n] = np.arange(n, dtype=np.float64)
+    return r
+
+
+def _db(db: float) -> float:
+    """dB -> ganancia lineal; -90 dB o menos es silencio, como en swh."""
+    return 0.0 if db <= -90.0 else 10.0 ** (db / 20.0)
+
+
+class _DelayLine:
+    """Historia circular (2, size) de la entrada, para leer hacia atrás.
+
+    `push()` escribe un trozo (hasta CHUNK muestras) y devuelve la posición
+    absoluta de su primera muestra; `read()` lee posiciones absolutas ya
+    escritas. El anillo guarda `max_delay` muestras más el trozo, así que
+    leer dentro del trozo recién escrito también vale.
+    """
+
+    def __init__(self, max_delay: int):
+        self.size = int(max_delay) + CHUNK + 2
+        self.buf = np.zeros((2, self.size), dtype=np.float32)
+        self.count = 0
+
+    def push(self, x: np.ndarray) -> int:
+        n = x.shape[1]
+        start = self.count
+        pos = start % self.size
+        k = min(n, self.size - pos)
+        self.buf[:, pos:pos + k] = x[:, :k]
+        self.buf[:, :n - k] = x[:, k:]
+        self.count += n
+        return start
+
+    def read(self, pos: np.ndarray) -> np.ndarray:
+        return self.buf[:, pos % self.size]
+
+
+class NumpyStereoRingmod:
+    """Ringmod with LFO: la señal por un oscilador, `depth` 0 = seco,
+    1 = AM (ganancia 0..1), 2 = anillo (ganancia -1..1). `wave` es la forma
+    del oscilador: "sine" para ringmod, "triangle" para chopper. Los dos
+    canales comparten fase, como las dos instancias LADSPA que arrancan a
+    la vez."""
+
+    def __init__(self, sample_rate: int, wave: str = "sine"):
+        if wave not in ("sine", "triangle"):
+            raise ValueError(f"onda desconocida: {wave}")
+        self.sr = sample_rate
+        self.wave = wave
+        self.depth = 0.0
+        self.freq = 1.0
+        self._phase = 0.0           # en ciclos, [0, 1)
+
+    def set(self, depth: float, freq_hz: float):
+        self.depth = min(max(depth, 0.0), 2.0)
+        self.freq = min(max(freq_hz, 1.0), 1000.0)
+
+    def run(self, buf: np.ndarray):
+        """buf (2, n) float32 planar, in-place."""
+        n = buf.shape[1]
+        step = self.freq / self.sr
+        ph = _ramp(n) * step
+        ph += self._phase
+        self._phase = (self._phase + n * step) % 1.0
+        if self.depth == 0.0:
+            return
+        if self.wave == "sine":
+            osc = np.sin(2.0 * np.pi * ph)
+        else:
+            ph += 0.75
+            ph %= 1.0
+            osc = 4.0 * np.abs(ph - 0.5) - 1.0
+        half = 0.5 * self.depth
+        osc *= half
+        osc += 1.0 - half
+        buf *= osc.astype(np.float32)
+
+
+class NumpyStereoPhaser:
+    """LFO Phaser: tres pasatodo de segundo orden con la frecuencia barrida
+    por un LFO senoidal; la salida es seco + `depth` * fase desplazada
+    (depth 0 = seco, sin coloración), con tres muescas que suben y bajan.
+
+    El `feedback` del plugin (realimentar la cadena) no se puede hacer por
+    bloques: aquí afila las muescas subiendo la Q de los pasatodo, que es
+    lo que se oye de él. Los coeficientes se recalculan cada `_SUB`
+    muestras (6 ms: el LFO va a menos de 2 Hz), todos los del bloque de una
+    vez, y cada trozo pasa por lfilter sección a sección con su estado
+    arrastrado (un pasatodo de 2º orden por llamada: cambiar la frecuencia
+    no dispara nada, cosa que con la cadena entera en un solo filtro de
+    orden 6 no está garantizada).
+    """
+
+    STAGES = 3
+    F_MIN = 300.0
+    F_MAX = 3000.0
+    SPREAD = 1.5            # octavas entre el primer y el último pasatodo
+    Q_MIN = 0.5
+    Q_FEEDBACK = 4.0        # Q extra con |feedback| = 1
+    _SUB = 256
+
+    def __init__(self, sample_rate: int):
+        if _lfilter is None:
+            raise ImportError("el phaser en numpy necesita scipy")
+        self.sr = sample_rate
+        self.rate = 0.0
+        self.depth = 0.0
+        self.feedback = 0.0
+        self._phase = 0.0                   # del LFO en la muestra actual
+        self._off = 0                       # muestras hechas del trozo actual
+        self._zi = np.zeros((self.STAGES, 2, 2))    # (sección, canal, 2)
+        self._spread = 2.0 ** (self.SPREAD * np.arange(self.STAGES)
+                               / max(self.STAGES - 1, 1))
+
+    def set(self, rate: float, depth: float, feedback: float):
+        self.rate = min(max(rate, 0.0), 100.0)
+        self.depth = min(max(depth, 0.0), 1.0)
+        self.feedback = min(max(feedback, -1.0), 1.0)
+
+    def _coefs(self, starts: np.ndarray) -> np.ndarray:
+        """Secciones (trozos, STAGES, 6) de los trozos que empiezan en
+        `starts` (muestras desde la actual; el primero puede ser < 0)."""
+        ph = self._phase + starts * (self.rate / self.sr)
+        lfo = 0.5 + 0.5 * np.sin(2.0 * np.pi * ph)
+        f = self.F_MIN * (self.F_MAX / self.F_MIN) ** lfo[:, None] \
+            * self._spread
+        w0 = 2.0 * np.pi * np.minimum(f, 0.45 * self.sr) / self.sr
+        alpha = np.sin(w0) / (2.0 * (self.Q_MIN
+                                     + self.Q_FEEDBACK * abs(self.feedback)))
+        cw = -2.0 * np.cos(w0)
+        a0 = 1.0 + alpha
+        sos = np.empty(f.shape + (6,))
+        sos[..., 0] = sos[..., 5] = (1.0 - alpha) / a0
+        sos[..., 1] = sos[..., 4] = cw / a0
+        sos[..., 2] = 1.0
+        sos[..., 3] = 1.0
+        return sos
+
+    def run(self, buf: np.ndarray):
+        """buf (2, n) float32 planar, in-place."""
+        n = buf.shape[1]
+        if n == 0:
+            return
+        sub = self._SUB
+        # trozos en una rejilla fija de la señal, no del bloque: se trocee
+        # como se trocee, los coeficientes cambian en las mismas muestras
+        starts = np.arange(-self._off, n, sub)
+        sos = self._coefs(starts)
+        for i, s in enumerate(starts):
+            x = buf[:, max(s, 0):s + sub]
+            y = x
+            for k, sec in enumerate(sos[i]):
+                y, self._zi[k] = _lfilter(sec[:3], sec[3:], y, axis=1,
+                                          zi=self._zi[k])
+            if self.depth:
+                y *= self.depth
+                x += y.astype(np.float32)
+        self._phase = (self._phase + n * self.rate / self.sr) % 1.0
+        self._off = (self._off + n) % sub
+
+
+class NumpyStereoDecimator:
+    """Decimator: muestreo-y-retención a `rate_hz` y cuantización a `bits`.
+    El reloj de retención cuenta muestras desde el último cambio de rate
+    (no acumula fracciones de bloque en bloque), así que cae en las mismas
+    muestras se trocee como se trocee la señal."""
+
+    def __init__(self, sample_rate: int):
+        self.sr = sample_rate
+        self.bits = 24.0
+        self.rate = float(sample_rate)
+        self._n = 0                         # muestras desde el último rate
+        self._held = np.zeros(2, dtype=np.float32)
+
+    def set(self, bits: float, rate_hz: float):
+        self.bits = min(max(bits, 1.0), 24.0)
+        rate = min(max(rate_hz, 1.0), float(self.sr))
+        if rate != self.rate:
+            self.rate = rate
+            self._n = 0
+
+    def run(self, buf: np.ndarray):
+        """buf (2, n) float32 planar, in-place."""
+        n = buf.shape[1]
+        if n == 0:
+            return
+        step = self.rate / self.sr
+        if step < 1.0:
+            # la muestra k se retiene si el reloj cruza un entero en ella
+            clock = np.floor((_ramp(n) + (self._n + 1)) * step)
+            new = np.diff(clock, prepend=np.floor(self._n * step)) > 0
+            idx = np.where(new, np.arange(n), -1)
+            np.maximum.accumulate(idx, out=idx)
+            self._n += n
+            held = buf[:, np.maximum(idx, 0)]
+            held[:, idx < 0] = self._held[:, None]
+            buf[:] = held
+            self._held[:] = buf[:, -1]
+        q = 2.0 ** (1.0 - self.bits)
+        if q > 1e-6:                        # a 24 bits no se nota en float32
+            buf[:] = np.round(buf / q) * q
+
+
+class NumpyStereoTapeDelay:
+    """Tape Delay: un tap a `TAP_S` segundos (1.5 pulgadas a 1 pulgada/s,
+    como se configura el plugin) sumado al seco, sin feedback."""
+
+    TAP_S = 1.5
+
+    def __init__(self, sample_rate: int):
+        self.delay = int(round(self.TAP_S * sample_rate))
+        self.line = _DelayLine(self.delay)
+        self.dry = 1.0
+        self.tap = 0.0
+
+    def set(self, dry_db: float, tap_db: float):
+        self.dry = _db(min(max(dry_db, -90.0), 0.0))
+        self.tap = _db(min(max(tap_db, -90.0), 0.0))
+
+    def run(self, buf: np.ndarray):
+        """buf (2, n) float32 planar, in-place."""
+        for s in range(0, buf.shape[1], CHUNK):
+            x = buf[:, s:s + CHUNK]
+            start = self.line.push(x)
+            if self.dry != 1.0:
+                x *= self.dry
+            if self.tap:
+                pos = np.arange(start - self.delay,
+                                start - self.delay + x.shape[1])
+                x += self.line.read(pos) * np.float32(self.tap)
+
+
+class NumpyStereoRetroFlange:
+    """Retro Flanger: la señal más una copia con retardo barrido por un
+    LFO alrededor de `stall_ms` (interpolación lineal), a partes iguales.
+    Sale al 100% de efecto, como el plugin: la mezcla la hace FlangerFx."""
+
+    DEPTH = 0.9             # el retardo oscila entre (1 ± DEPTH) * stall
+
+    def __init__(self, sample_rate: int):
+        self.sr = sample_rate
+        self.line = _DelayLine(int(0.002 * 10.0 * sample_rate) + 2)
+        self.stall = 0.0                    # muestras
+        self.freq = 0.5
+        self._phase = 0.0
+
+    def set(self, stall_ms: float, freq_hz: float):
+        self.stall = min(max(stall_ms, 0.0), 10.0) * 0.001 * self.sr
+        self.freq = min(max(freq_hz, 0.5), 8.0)
+
+    def run(self, buf: np.ndarray):
+        """buf (2, n) float32 planar, in-place."""
+        for s in range(0, buf.shape[1], CHUNK):
+            x = buf[:, s:s + CHUNK]
+            n = x.shape[1]
+            start = self.line.push(x)
+            t = _ramp(n) * (self.freq / self.sr)
+            t += self._phase
+            self._phase = (self._phase + n * self.freq / self.sr) % 1.0
+            d = np.sin(2.0 * np.pi * t)
+            d *= self.DEPTH * self.stall
+            d += self.stall
+            np.maximum(d, 1.0, out=d)       # nunca por delante de lo escrito
+            t = _ramp(n) + start
+            t -= d
+            i0 = np.floor(t)
+            frac = (t - i0).astype(np.float32)
+            i0 = i0.astype(np.int64)
+            a = self.line.read(i0)
+            wet = self.line.read(i0 + 1)
+            wet -= a
+            wet *= frac
+            wet += a
+            x += wet
+            x *= 0.5
+
+
+class NumpyDjEq:
+    """EQ de 3 bandas tipo DJ con las bandas de dj_eq_1901: picos en 100 Hz
+    y 1 kHz y estante de agudos en 10 kHz (biquads RBJ), multiplicados en
+    un solo filtro de orden 6 que pasa por lfilter con los dos canales.
+
+    Va en el master, que no reserva memoria de audio en régimen (ver
+    `Engine.render_into`): lfilter devuelve un array nuevo, así que se le
+    pasa la señal en trozos de `_PIECE` muestras y las copias quedan en
+    pocos KB. (sosfilt no vale aquí: deja ciclos de referencias en cada
+    llamada y la memoria crece hasta que pasa el recolector.)
+    """
+
+    BANDS = ((100.0, "peak"), (1000.0, "peak"), (10000.0, "shelf"))
+    PEAK_BW = 1.0           # octavas
+    SHELF_SLOPE = 1.0
+    _PIECE = 256
+
+    def __init__(self, sample_rate: int):
+        if _lfilter is None:
+            raise ImportError("el EQ en numpy necesita scipy")
+        self.sr = sample_rate
+        order = 2 * len(self.BANDS)
+        self.b = np.zeros(order + 1)
+        self.a = np.zeros(order + 1)
+        self.b[0] = self.a[0] = 1.0
+        self._zi = np.zeros((2, order))
+        self._x = np.zeros((2, self._PIECE), dtype=np.float32)
+
+    def _biquad(self, f0: float, kind: str, db: float) -> tuple:
+        A = 10.0 ** (db / 40.0)
+        w0 = 2.0 * np.pi * min(f0, 0.45 * self.sr) / self.sr
+        cw, sw = np.cos(w0), np.sin(w0)
+        if kind == "peak":
+            alpha = sw * np.sinh(np.log(2.0) / 2.0 * self.PEAK_BW * w0 / sw)
+            b = (1 + alpha * A, -2 * cw, 1 - alpha * A)
+            a = (1 + alpha / A, -2 * cw, 1 - alpha / A)
+        else:
+            alpha = sw / 2.0 * np.sqrt((A + 1 / A) * (1 / self.SHELF_SLOPE - 1)
+                                       + 2.0)
+            r = 2.0 * np.sqrt(A) * alpha
+            b = (A * ((A + 1) + (A - 1) * cw + r),
+                 -2 * A * ((A - 1) + (A + 1) * cw),
+                 A * ((A + 1) + (A - 1) * cw - r))
+            a = ((A + 1) - (A - 1) * cw + r,
+                 2 * ((A - 1) - (A + 1) * cw),
+                 (A + 1) - (A - 1) * cw - r)
+        return np.array(b) / a[0], np.array(a) / a[0]
+
+    def set(self, lo_db: float, mid_db: float, hi_db: float):
+        b, a = np.ones(1), np.ones(1)
+        for (f0, kind), db in zip(self.BANDS, (lo_db, mid_db, hi_db)):
+            bk, ak = self._biquad(f0, kind, min(max(db, -70.0), 6.0))
+            b, a = np.convolve(b, bk), np.convolve(a, ak)
+        self.b[:], self.a[:] = b, a
+
+    def process(self, left: np.ndarray, right: np.ndarray,
+                out_l: np.ndarray, out_r: np.ndarray):
+        x = self._x
+        for s in range(0, len(left), self._PIECE):
+            k = min(self._PIECE, len(left) - s)
+            x[0, :k] = left[s:s + k]
+            x[1, :k] = right[s:s + k]
+            y, self._zi = _lfilter(self.b, self.a, x[:, :k], axis=1,
+                                   zi=self._zi)
+            out_l[s:s + k] = y[0]
+            out_r[s:s + k] = y[1]
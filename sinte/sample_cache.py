@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Caché de samples ya decodificados, leídos con mmap.
+
+`SampleBank` decodifica con soundfile cada WAV de la canción al cargarla, y
+en la tarjeta SD de la Pi eso es casi toda la espera entre canciones. Aquí
+cada WAV se guarda la primera vez como `.npy` crudo (float32, (n, canales))
+en `<cache>/samples/` y las siguientes se abre con `np.load(mmap_mode="r")`:
+no se decodifica nada y, con la canción ya tocada, las páginas siguen en la
+caché del kernel, así que cambiar de canción es casi gratis.
+
+Con `sample_format = "int16"` el `.npy` es int16 (la mitad) y la clave
+lleva el formato, así que los dos conviven.
+
+La clave cubre la ruta del WAV, su tamaño, su mtime y `CACHE_VERSION`: si
+el WAV cambia, se decodifica de nuevo (la entrada vieja queda hasta el
+próximo `--prune`). El sample rate del WAV va en el nombre del fichero; el
+engine no remuestrea al cargar (la voz lee a la velocidad que toca), así
+que no hace falta otro `.npy` por sample rate de salida.
+
+Uso:
+    sample_cache.py [--songs DIR] [--cache DIR] [--prune] [canción ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+# Sube si cambia cómo se decodifica o se guarda un sample.
+CACHE_VERSION = 1
+
+
+def sample_key(wav: Path, dtype: str = "float32") -> str:
+    """Huella de un WAV: ruta, tamaño y mtime (y el formato si no es el
+    float32 de siempre)."""
+    st = wav.stat()
+    text = f"v{CACHE_VERSION}:{wav.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+    if dtype != "float32":
+        text += f":{dtype}"
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class SampleCache:
+    """Los `.npy` de `root` (normalmente `<cache_dir>/samples`), por clave
+    de `sample_key`. `read` decodifica y guarda lo que falte; si no se puede
+    escribir (caché de solo lectura) avisa una vez y sigue decodificando."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+        self._index: dict[str, tuple[Path, int]] | None = None
+        self._writable = True
+
+    def _entries(self) -> dict[str, tuple[Path, int]]:
+        """clave -> (fichero, sample rate), de un solo listado del dir."""
+        if self._index is None:
+            self._index = {}
+            try:
+                names = os.listdir(self.root)
+            except OSError:
+                names = []
+            for name in names:
+                if not name.endswith(".npy"):
+                    continue
+                try:
+                    _stem, key, sr = name[:-4].rsplit("-", 2)
+                    self._index[key] = (self.root / name, int(sr))
+                except ValueError:
+                    continue
+        return self._index
+
+    def read(self, wav: Path, dtype: str = "float32"
+             ) -> tuple[np.ndarray, int]:
+        """(datos (n, canales) `dtype`, sample rate) de `wav`, como
+        `sf.read(..., always_2d=True)`. Los de la caché son de solo
+        lectura (mmap). Un WAV ilegible lanza lo mismo que soundfile."""
+        wav = Path(wav)
+        key = sample_key(wav, dtype)
+        entry = self._entries().get(key)
+        if entry is not None:
+            path, sr = entry
+            try:
+                data = np.load(path, mmap_mode="r")
+            except (OSError, ValueError):   # truncado: se rehace
+                data = None
+            if data is not None and data.ndim == 2 \
+                    and data.dtype == np.dtype(dtype):
+                self.hits += 1
+                # vista ndarray normal: numba no acepta np.memmap
+                return np.asarray(data), sr
+        data, sr = sf.read(str(wav), dtype=dtype, always_2d=True)
+        data = np.ascontiguousarray(data)
+        self.misses += 1
+        self._store(wav, key, data, sr)
+        return data, sr
+
+    def _store(self, wav: Path, key: str, data: np.ndarray, sr: int):
+        if not self._writable:
+            return
+        path = self.root / f"{wav.stem}-{key}-{sr}.npy"
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.save(f, data)
+            tmp.replace(path)
+        except OSError as exc:
+            self._writable = False
+            print(f"[samples] no se puede escribir en {self.root}: {exc}")
+            return
+        old = self._entries().get(key)
+        if old is not None and old[0] != path:
+            old[0].unlink(missing_ok=True)
+        self._entries()[key] = (path, sr)
+
+    def prune(self, keep: set[str]) -> tuple[int, int]:
+        """Borra las entradas cuya clave no está en `keep` (y los `.tmp` de
+        escrituras cortadas). Devuelve (ficheros, bytes) borrados."""
+        removed = freed = 0
+        if not self.root.is_dir():
+            return 0, 0
+        for path in self.root.iterdir():
+            if path.suffix == ".npy":
+                try:
+                    key = path.stem.rsplit("-", 2)[1]
+                except IndexError:
+                    continue
+                if key in keep:
+                    continue
+            elif not path.name.endswith(".npy.tmp"):
+                continue
+            freed += path.stat().st_size
+            path.unlink()
+            removed += 1
+        self._index = None
+        return removed, freed
+
+
+def song_wavs(project_dir: Path) -> list[Path]:
+    """Los WAV que carga `SampleBank` para un proyecto."""
+    sample_dir = project_dir / "samples"
+    return sorted(sample_dir.glob("*.wav")) if sample_dir.is_dir() else []
+
+
+def main():
+    from lgpt_player import CONFIG_PATH, find_projects, load_config
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--songs", default=None)
+    parser.add_argument("--cache", default=None)
+    parser.add_argument("--prune", action="store_true",
+                        help="borra los samples de WAV que ya no existen o "
+                             "han cambiado")
+    parser.add_argument("names", nargs="*",
+                        help="canciones (nombre de carpeta); todas si no hay")
+    args = parser.parse_args()
+    cfg = load_config(Path(args.config))
+    base = Path(args.config).resolve().parent
+    songs = Path(args.songs or cfg.get("songs_dir", "songs"))
+    if not songs.is_absolute():
+        songs = base / songs
+    cache_root = Path(args.cache or cfg.get("cache_dir", "cache"))
+    if not cache_root.is_absolute():
+        cache_root = base / cache_root
+    wavs = []
+    for project_dir in find_projects(songs):
+        if not args.names or project_dir.name in args.names:
+            wavs.extend(song_wavs(project_dir))
+    fmt = cfg.get("audio", {}).get("sample_format", "float32")
+    pads = cfg.get("audio", {}).get("wavs_dir")
+    if pads and not args.names:
+        pads = Path(pads) if Path(pads).is_absolute() else base / pads
+        if pads.is_dir():
+            wavs.extend(sorted(pads.glob("*.wav")))
+    cache = SampleCache(cache_root / "samples")
+    if args.prune:
+        if args.names:
+            parser.error("--prune va sin nombres de canción: borraría los "
+                         "samples de las demás")
+        removed, freed = cache.prune({sample_key(w, fmt) for w in wavs})
+        print(f"[samples] {removed} ficheros borrados "
+              f"({freed / 1e6:.1f} MB)")
+    for wav in wavs:
+        try:
+            cache.read(wav, fmt)
+        except Exception as exc:  # WAV ilegible: se ignora con aviso
+            print(f"[samples] no se puede cargar {wav}: {exc}")
+    print(f"[samples] {cache.misses} decodificados, {cache.hits} ya estaban "
+          f"en {cache.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Samples largos leídos del disco mientras suenan.
+
+Las bases largas (voces, loops de decenas de segundos) se cargaban enteras
+en RAM aunque una voz solo las recorre hacia delante. Un `SampleStream`
+deja en memoria solo la cabeza del WAV y la de cada punto donde empieza a
+sonar (el `start` de los instrumentos que lo usan, que es también su
+punto de loop): `HEAD_S` desde cada uno, para que el disparo sea
+inmediato. Cada voz que lo toca lleva su `StreamReader`: una ventana de
+trozos de `CHUNK` muestras por delante de donde lee, que un hilo de fondo
+(`_Streamer`) va llenando según la posición y la velocidad de lectura de la
+voz, dando la vuelta en los puntos de loop.
+
+El reader se indexa como el array de datos de un `Sample` (enteros, arrays
+de índices y slices), así que `Voice` lee igual que de memoria y la salida
+es la misma muestra a muestra. Se indexa desde el hilo de audio, que no
+lee el disco ni toma locks: si el hilo de fondo no llegó a tiempo el trozo
+que falta suena en silencio y se cuenta (`underruns`).
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+SHIFT = 14
+CHUNK = 1 << SHIFT            # muestras por trozo (~0.37 s a 44.1 kHz)
+HEAD_S = 0.5                  # cabeza residente
+LOOKAHEAD_S = 1.5             # lo que el hilo lee por delante de cada voz
+
+
+class SampleStream:
+    """Un WAV abierto para leer por trozos, con la cabeza ya en memoria, y
+    la de cada posición de `starts`. Hace de `Sample.data` (len, shape,
+    dtype, nbytes); cada voz pide el suyo con `reader()`."""
+
+    def __init__(self, wav: Path, dtype: str = "float32", starts=()):
+        self.path = Path(wav)
+        self._file = sf.SoundFile(str(wav))
+        self._lock = threading.Lock()
+        self.sr = self._file.samplerate
+        self.dtype = np.dtype(dtype)
+        self.shape = (self._file.frames, self._file.channels)
+        head = -(-int(HEAD_S * self.sr) // CHUNK) * CHUNK
+        self.head = self._read(0, min(head, len(self)))
+        # trozos enteros, o el fichero entero si es más corto
+        self.head_chunks = -(-len(self.head) // CHUNK)
+        # Trozos residentes fuera de la cabeza: los HEAD_S desde cada start
+        self.resident: dict[int, np.ndarray] = {}
+        span = int(HEAD_S * self.sr)
+        for pos in starts:
+            pos = min(max(int(pos), 0), len(self) - 1)
+            for cid in range(pos >> SHIFT, ((pos + span) >> SHIFT) + 1):
+                if cid * CHUNK >= len(self):
+                    break
+                if cid >= self.head_chunks and cid not in self.resident:
+                    self.resident[cid] = self.chunk(cid)
+        # Trozo de ceros que sirve el reader cuando el hilo no llegó
+        self.silence = np.zeros((CHUNK, self.shape[1]), dtype=self.dtype)
+        self.underruns = 0
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Lo residente: la cabeza y la de cada start (las ventanas de las
+        voces van aparte)."""
+        return self.head.nbytes + sum(c.nbytes
+                                      for c in self.resident.values())
+
+    def _read(self, a: int, b: int) -> np.ndarray:
+        with self._lock:
+            self._file.seek(a)
+            return self._file.read(b - a, dtype=self.dtype.name,
+                                   always_2d=True)
+
+    def chunk(self, cid: int) -> np.ndarray:
+        """El trozo `cid`, de memoria si es residente y si no del disco: no
+        se llama desde el hilo de audio."""
+        if cid < self.head_chunks:
+            return self.head[cid * CHUNK:(cid + 1) * CHUNK]
+        data = self.resident.get(cid)
+        if data is not None:
+            return data
+        a = cid * CHUNK
+        return self._read(a, min(a + CHUNK, len(self)))
+
+    def reader(self, pos: float, loop_start: int = -1,
+               loop_end: int = 0) -> "StreamReader":
+        """Ventana de lectura para una voz que empieza en `pos` (con loop
+        entre `loop_start` y `loop_end` si `loop_start` >= 0)."""
+        return StreamReader(self, int(pos), loop_start, loop_end)
+
+
+class StreamReader:
+    """Los datos de un `SampleStream` vistos por una voz. Lo que se indexa
+    se sirve de lo residente o de los trozos ya leídos; `prefetch` (lo llama
+    el hilo de fondo) lee los que vienen y suelta los que quedaron atrás.
+
+    `chunks` es el paso de un hilo al otro: el de fondo solo mete y saca
+    entradas enteras, y el de audio solo las consulta, sin lock."""
+
+    def __init__(self, stream: SampleStream, pos: int, loop_start: int,
+                 loop_end: int):
+        self.stream = stream
+        self.shape = stream.shape
+        self.dtype = stream.dtype
+        self.loop_start = loop_start
+        self.loop_end = loop_end
+        self.chunks: dict[int, np.ndarray] = {}
+        self.next = pos              # siguiente muestra que va a leer
+        self.step = 0                # muestras recorridas en la última
+        self.underruns = 0
+        _streamer().add(self)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in list(self.chunks.values()))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            a, b, _ = key.indices(len(self))
+            if b <= a:
+                return np.empty((0, self.shape[1]), dtype=self.dtype)
+            cid = a >> SHIFT
+            self._seen(a, b - 1, b - a)
+            if (b - 1) >> SHIFT == cid:           # dentro de un trozo
+                base = cid * CHUNK
+                return self._chunk(cid)[a - base:b - base]
+            key = np.arange(a, b)
+        idx = np.asarray(key)
+        if idx.ndim == 0:
+            cid = int(idx) >> SHIFT
+            return self._chunk(cid)[int(idx) - cid * CHUNK]
+        if not len(idx):
+            return np.empty((0, self.shape[1]), dtype=self.dtype)
+        self._seen(int(idx[0]), int(idx[-1]), len(idx))
+        cids = idx >> SHIFT
+        c0 = int(cids[0])
+        if c0 == int(cids[-1]) and (cids == c0).all():
+            return self._chunk(c0)[idx - c0 * CHUNK]
+        out = np.empty((len(idx), self.shape[1]), dtype=self.dtype)
+        for cid in np.unique(cids):
+            sel = cids == cid
+            out[sel] = self._chunk(int(cid))[idx[sel] - int(cid) * CHUNK]
+        return out
+
+    def _seen(self, first: int, last: int, n: int):
+        self.next = last + 1
+        span = last - first + 1
+        self.step = span if 0 < span <= 8 * n else n   # con loop: vuelta
+
+    def _chunk(self, cid: int) -> np.ndarray:
+        stream = self.stream
+        if cid < stream.head_chunks:
+            return stream.head[cid * CHUNK:(cid + 1) * CHUNK]
+        data = stream.resident.get(cid)
+        if data is None:
+            data = self.chunks.get(cid)
+        if data is None:              # el hilo no llegó: silencio
+            self.underruns += 1
+            stream.underruns += 1
+            return stream.silence
+        return data
+
+    def _wanted(self) -> list[int]:
+        """Trozos que va a leer la voz de aquí a LOOKAHEAD_S (o 4 bloques
+        de los suyos si va más deprisa), dando la vuelta en el loop."""
+        stream = self.stream
+        size = len(self)
+        span = max(int(LOOKAHEAD_S * stream.sr), 4 * self.step)
+        loop_len = self.loop_end - self.loop_start
+        looped = self.loop_start >= 0 and loop_len > 0
+        want: dict[int, None] = {}
+        q = self.next
+        stop = q + span
+        while q <= stop:
+            r = q
+            if looped and r >= self.loop_end:
+                r = self.loop_start + (r - self.loop_start) % loop_len
+            if r >= size:
+                break
+            cid = r >> SHIFT
+            if cid >= stream.head_chunks and cid not in stream.resident:
+                want.setdefault(cid)
+            # al borde del trozo (o del loop), lo que queda hasta él
+            q += max(1, min(CHUNK - (r & (CHUNK - 1)),
+                            (self.loop_end - r) if looped else CHUNK))
+        return list(want)
+
+    def prefetch(self):
+        want = self._wanted()
+        for cid in want:
+            if cid not in self.chunks:
+                self.chunks[cid] = self.stream.chunk(cid)
+        keep = set(want)
+        keep.add(max(self.next - 1, 0) >> SHIFT)  # el que está leyendo
+        for cid in list(self.chunks):
+            if cid not in keep:
+                self.chunks.pop(cid, None)
+
+
+class _Streamer:
+    """Hilo de fondo de todos los readers vivos (los suelta el GC con la
+    voz). Da una vuelta cada `PERIOD_S`, o enseguida si llega uno nuevo."""
+
+    PERIOD_S = 0.01
+
+    def __init__(self):
+        self._readers: weakref.WeakSet = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._loop, name="sample-stream",
+                         daemon=True).start()
+
+    def add(self, reader: StreamReader):
+        with self._lock:
+            self._readers.add(reader)
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.PERIOD_S)
+            self._wake.clear()
+            with self._lock:
+                readers = list(self._readers)
+            for reader in readers:
+                try:
+                    reader.prefetch()
+                except Exception as exc:  # fichero desaparecido...
+                    print(f"[engine] stream {reader.stream.path.name}: {exc}")
+            del readers
+
+
+_STREAMER: list = [None]
+_STREAMER_LOCK = threading.Lock()
+
+
+def _streamer() -> _Streamer:
+    with _STREAMER_LOCK:
+        if _STREAMER[0] is None:
+            _STREAMER[0] = _Streamer()
+        return _STREAMER[0]
@@ -0,0 +1,79 @@
+"""Blocksize por canción: cuándo sube, cuándo baja y que se recuerda."""
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from blocksizes import BlocksizeMemory  # noqa: E402
+
+SR = 44100
+
+
+class TestBlocksizeMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache" / "blocksizes.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def bloques(self, seconds, blocksize=2048):
+        return int(seconds * SR / blocksize)
+
+    def test_sube_con_un_corte_y_se_recuerda(self):
+        mem = BlocksizeMemory(self.path, 2048)
+        self.assertEqual(mem.get("lgpt_Bulebule"), 2048)
+        got = mem.decide("lgpt_Bulebule", 2048, 1, 0, self.bloques(200),
+                         0.6, SR)
+        self.assertEqual(got, 4096)
+        self.assertEqual(json.loads(self.path.read_text()),
+                         {"lgpt_Bulebule": 4096})
+        again = BlocksizeMemory(self.path, 2048)
+        self.assertEqual(again.get("lgpt_Bulebule"), 4096)
+        self.assertEqual(again.get("lgpt_AGIA"), 2048)
+
+    def test_sube_con_apurados(self):
+        mem = BlocksizeMemory(self.path, 2048)
+        n = self.bloques(200)
+        self.assertEqual(mem.decide("a", 2048, 0, n // 200, n, 0.8, SR),
+                         2048)
+        self.assertEqual(mem.decide("a", 2048, 0, n // 50, n, 0.8, SR),
+                         4096)
+
+    def test_baja_con_margen_hasta_el_minimo(self):
+        mem = BlocksizeMemory(self.path, 2048)
+        mem.decide("a", 2048, 2, 0, self.bloques(100), 0.9, SR)
+        self.assertEqual(mem.get("a"), 4096)
+        # poco rato sonando: no se juzga
+        self.assertEqual(mem.decide("a", 4096, 0, 0, self.bloques(10, 4096),
+                                    0.2, SR), 4096)
+        # con margen, vuelve; del configurado no baja
+        self.assertEqual(mem.decide("a", 4096, 0, 0,
+                                    self.bloques(100, 4096), 0.2, SR), 2048)
+        self.assertEqual(mem.decide("a", 2048, 0, 0, self.bloques(100),
+                                    0.1, SR), 2048)
+        # sin margen suficiente se queda donde está
+        low = BlocksizeMemory(self.path, 2048, minimum=512)
+        self.assertEqual(low.decide("b", 2048, 0, 0, self.bloques(100),
+                                    0.5, SR), 2048)
+        self.assertEqual(low.decide("b", 2048, 0, 0, self.bloques(100),
+                                    0.2, SR), 1024)
+
+    def test_tope_y_fichero_roto(self):
+        self.path.parent.mkdir(parents=True)
+        self.path.write_text('{"a": 65536, "b": "x"')
+        mem = BlocksizeMemory(self.path, 2048, maximum=8192)
+        self.assertEqual(mem.get("a"), 2048)
+        self.assertEqual(mem.decide("a", 8192, 5, 0, 100, 1.5, SR), 8192)
+        self.path.write_text('{"a": 65536, "b": "x"}')
+        mem = BlocksizeMemory(self.path, 2048, maximum=8192)
+        self.assertEqual(mem.get("a"), 8192)
+        self.assertEqual(mem.get("b"), 2048)
+
+
+if __name__ == "__main__":
+    unittest.main()
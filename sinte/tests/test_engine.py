@@ -11,14 +11,33 @@ from pathlib import Path
 
 import numpy as np
 
+import lgpt_engine
 from lgpt_engine import (
+    CHANNEL_COUNT,
     Engine,
+    EventRing,
+    FILTER_KERNELS,
+    InstrumentDef,
+    MasterChain,
+    QualityGovernor,
     Sample,
+    SampleBank,
+    SampleStore,
     TICKS_PER_STEP,
     SAMPLE_RATE,
+    Voice,
+    filter_kernel_name,
+    filter_kernel_py,
     parse_midi_instrument,
+    fx_backend,
+    render_workers,
+    set_filter_kernel,
+    set_fx_backend,
+    set_render_workers,
+    set_sample_store_mb,
+    sample_store,
 )
-from lgpt_parser import LGPTProject
+from lgpt_parser import LGPTProject, instrument_order
 
 SONGS_DIR = Path("/home/angel/LGPT/songs")
 SONGS = ["lgpt_abduccion", "lgpt_Bulebule", "lgpt_Energia",
@@ -445,6 +464,1564 @@ class TestAudioDelay(unittest.TestCase):
         self.assertEqual(float(np.abs(out).max()), 0.0)
 
 
+class TestRenderAhead(unittest.TestCase):
+    """El render partido (render_dry en un hilo, mix_live en el callback)
+    suena igual que render() de una pieza, knobs incluidos."""
+
+    @staticmethod
+    def estado():
+        # los contadores del hilo que lleva EstadoAudio (lgpt_player importa
+        # sounddevice, que pide PortAudio)
+        from types import SimpleNamespace
+        return SimpleNamespace(render_ultima_ms=0.0, render_peor_ms=0.0,
+                               render_peor_desde=0.0, carga_cancion=0.0)
+
+    def make_song(self):
+        engine = make_engine()
+        engine.project.song[1] = 0
+        for step, note in ((0, 60), (4, 67), (8, 64)):
+            note_row(engine.project, step, note=note)
+        engine.set_audio_delay(700 / SAMPLE_RATE)
+        engine.channels[1].fx_amounts["reverb"] = 0.3
+        return engine
+
+    def test_partido_igual_que_render(self):
+        whole = self.make_song()
+        split = self.make_song()
+        dry = np.zeros((8, 2, 512), dtype=np.float32)
+        for i in range(20):
+            if i == 7:
+                for e in (whole, split):
+                    e.push_event("param", 0, "volume", 40)
+                    e.push_event("param", 1, "pan", 200)
+            a = whole.render(512)
+            split.render_dry(512, dry)
+            b = split.mix_live(dry, 512)
+            np.testing.assert_array_equal(a, b)
+
+    def test_hilo_adelantado_igual_que_directo(self):
+        import time
+        from audio_ring import RenderAhead
+        ref = self.make_song()
+        expected = np.concatenate([ref.render(512) for _ in range(30)])
+        engine = self.make_song()
+        est = self.estado()
+        ahead = RenderAhead({"engine": engine}, est, 512, 3, SAMPLE_RATE)
+        ahead.start()
+        got = []
+        try:
+            while len(got) < 30:
+                dry = ahead.pop(engine)
+                if dry is None:
+                    time.sleep(0.001)
+                    continue
+                got.append(engine.mix_live(dry, 512))
+                ahead.done(0.0)
+        finally:
+            ahead.close()
+        np.testing.assert_array_equal(np.concatenate(got), expected)
+        self.assertGreater(est.render_peor_ms, 0.0)
+
+    def test_anillo_descarta_otra_cancion(self):
+        from audio_ring import RenderAhead
+        old, new = self.make_song(), self.make_song()
+        ahead = RenderAhead({"engine": old}, self.estado(), 512, 2,
+                            SAMPLE_RATE)
+        ring = ahead.ring
+        for owner in (old, new):
+            ring.escritura()[:] = 0
+            ring.publica(owner)
+        self.assertTrue(ring.llena())
+        self.assertIsNotNone(ahead.pop(new))
+        self.assertEqual(len(ring), 1)         # el de `old`, fuera
+        ahead.done(0.0)
+        self.assertIsNone(ahead.pop(new))
+
+
+class TestRenderBatch(unittest.TestCase):
+    """El render por lotes suena igual bit a bit que voz a voz: loop,
+    estéreo, crush, downsample, rampas de volumen y releases; y las voces
+    con filtro o rampa de pitch siguen por su camino."""
+
+    def make_song(self, batch: bool) -> Engine:
+        p = make_project()
+        p.instrument_bank.update({
+            1: {"type": "Sample", "params": {
+                "sample": "stereo.wav", "volume": "200", "pan": "40",
+                "loopmode": "loop", "start": "100", "end": "3000"}},
+            2: {"type": "Sample", "params": {
+                "sample": "test.wav", "crush": "6", "crushdrive": "180",
+                "downsample": "2", "pan": "220", "fine tune": "140"}},
+            3: {"type": "Sample", "params": {
+                "sample": "test.wav", "filter cut": "90", "filter res": "40"}},
+        })
+        rows = {0: (0, (0, 2, 5, 8, 12)), 1: (1, (0, 6, 9)),
+                2: (2, (1, 4, 7, 10, 13)), 3: (3, (0, 8)), 4: (0, (3, 11))}
+        for ci, (instr, steps) in rows.items():
+            p.song[ci] = ci
+            p.chains[ci * 16] = ci
+            for k, step in enumerate(steps):
+                p.notes[ci * 16 + step] = 48 + 5 * k + ci
+                p.instruments[ci * 16 + step] = instr
+        p.cmd1[0 * 16 + 5] = "VOLM"
+        p.param1[0 * 16 + 5] = 0x0320
+        p.cmd1[4 * 16 + 11] = "PTCH"
+        p.param1[4 * 16 + 11] = 0x0405
+        engine = Engine(p)
+        t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+        mono = (0.5 * np.sin(2 * np.pi * 440 * t))[:, None]
+        stereo = np.stack([0.4 * np.sin(2 * np.pi * 220 * t),
+                           0.3 * np.sin(2 * np.pi * 331 * t)], axis=1)
+        engine.bank.samples["test.wav"] = Sample(mono.astype(np.float32),
+                                                 SAMPLE_RATE)
+        engine.bank.samples["stereo.wav"] = Sample(
+            stereo.astype(np.float32), 22050)
+        engine.batch_voices = batch
+        engine.start()
+        return engine
+
+    def test_igual_que_voz_a_voz(self):
+        from unittest import mock
+        import lgpt_engine
+        ref = self.make_song(False)
+        expected = np.concatenate([ref.render(700) for _ in range(80)])
+        engine = self.make_song(True)
+        with mock.patch.object(lgpt_engine, "render_batch",
+                               wraps=lgpt_engine.render_batch) as spy:
+            got = np.concatenate([engine.render(700) for _ in range(80)])
+        self.assertTrue(spy.called)
+        self.assertGreater(float(np.abs(expected).max()), 0.0)
+        np.testing.assert_array_equal(got, expected)
+
+    def test_filtro_y_rampas_fuera_del_lote(self):
+        engine = self.make_song(True)
+        engine.render(2000)
+        self.assertFalse(engine.channels[3].voice.batchable())
+        self.assertTrue(engine.channels[1].voice.batchable())
+
+
+class TestVoiceFastPaths(unittest.TestCase):
+    """Los caminos rápidos de Voice.render (copia a speed 1, speed y
+    volumen constantes) suenan igual bit a bit que el camino general."""
+
+    def make_song(self) -> Engine:
+        p = make_project()
+        p.instrument_bank.update({
+            1: {"type": "Sample", "params": {
+                "sample": "test.wav", "loopmode": "loop", "start": "100",
+                "end": "900", "pan": "40"}},
+            2: {"type": "Sample", "params": {
+                "sample": "test.wav", "crush": "6", "downsample": "1"}},
+        })
+        rows = {0: (0, ((0, 60), (4, 60), (9, 67))), 1: (1, ((0, 60), (8, 60))),
+                2: (2, ((2, 60), (10, 55))), 3: (0, ((1, 48), (6, 60)))}
+        for ci, (instr, steps) in rows.items():
+            p.song[ci] = ci
+            p.chains[ci * 16] = ci
+            for step, note in steps:
+                p.notes[ci * 16 + step] = note
+                p.instruments[ci * 16 + step] = instr
+        p.cmd1[0 * 16 + 4] = "VOLM"
+        p.param1[0 * 16 + 4] = 0x0330
+        p.cmd1[3 * 16 + 6] = "PTCH"
+        p.param1[3 * 16 + 6] = 0x0402
+        engine = Engine(p)
+        t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+        mono = (0.5 * np.sin(2 * np.pi * 440 * t))[:, None]
+        engine.bank.samples["test.wav"] = Sample(mono.astype(np.float32),
+                                                 SAMPLE_RATE)
+        engine.batch_voices = False
+        engine.start()
+        return engine
+
+    def render(self, fast: bool) -> np.ndarray:
+        Voice.fast_paths = fast
+        try:
+            engine = self.make_song()
+            return np.concatenate([engine.render(700) for _ in range(80)])
+        finally:
+            Voice.fast_paths = True
+
+    def test_igual_que_camino_general(self):
+        expected = self.render(False)
+        got = self.render(True)
+        self.assertGreater(float(np.abs(expected).max()), 0.0)
+        np.testing.assert_array_equal(got, expected)
+
+    def test_speed_uno_es_copia(self):
+        engine = self.make_song()
+        engine.render(64)
+        v = engine.channels[0].voice
+        self.assertEqual(v.base_speed, 1.0)
+        np.testing.assert_array_equal(v._read_unity(32),
+                                      v._read(v.pos + np.arange(32.0)))
+        v.ds_shift = 1
+        self.assertIsNone(v._read_unity(32))
+
+
+class TestNoteCache(unittest.TestCase):
+    """Las notas one-shot repetidas salen de la caché y suenan igual que
+    leídas del sample (bit a bit a speed 1)."""
+
+    def make_song(self, cache: bool, note: int = 60) -> Engine:
+        p = make_project()
+        p.song[1] = 0
+        p.instrument_bank[1] = {"type": "Sample", "params": {
+            "sample": "test.wav", "crush": "5", "crushdrive": "200"}}
+        for step in range(0, 16, 2):
+            note_row(p, step, note=note, instr=1 if step == 4 else 0)
+        engine = Engine(p)
+        t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+        data = (0.5 * np.sin(2 * np.pi * 440 * t))[:, None]
+        engine.bank.samples["test.wav"] = Sample(data.astype(np.float32),
+                                                 SAMPLE_RATE)
+        engine.batch_voices = False
+        if not cache:
+            engine.note_cache = None
+        engine.start()
+        return engine
+
+    def render(self, engine, blocks=120):
+        # la nota que falta se renderiza en otro hilo: se espera en cada
+        # bloque para que los aciertos no dependan de cuándo acaba
+        out = []
+        for _ in range(blocks):
+            out.append(engine.render(500))
+            if engine.note_cache is not None:
+                engine.note_cache.wait()
+        return np.concatenate(out)
+
+    def test_speed_uno_igual_bit_a_bit(self):
+        expected = self.render(self.make_song(False))
+        engine = self.make_song(True)
+        got = self.render(engine)
+        self.assertGreater(float(np.abs(expected).max()), 0.0)
+        np.testing.assert_array_equal(got, expected)
+        nc = engine.note_cache
+        # instrumento 0 y 1, en los dos canales a la vez: el segundo disparo
+        # llega con la nota aún pedida
+        self.assertEqual(nc.misses, 4)
+        self.assertEqual(nc.hits, 8)              # 12 notas en 2 canales
+        self.assertGreater(nc.hit_rate(), 0.6)
+        self.assertGreater(nc.nbytes, 0)
+
+    def test_speed_fraccionario_casi_igual(self):
+        expected = self.render(self.make_song(False, note=55))
+        got = self.render(self.make_song(True, note=55))
+        np.testing.assert_allclose(got, expected, atol=1e-6)
+
+    def test_pitch_en_directo_deja_la_cache(self):
+        expected = self.make_song(False)
+        engine = self.make_song(True)
+        for e in (expected, engine):
+            self.render(e, 24)             # segunda nota: ya de la caché
+            e.channels[0].cc_pitch = 1.5
+        v = engine.channels[0].voice
+        self.assertIsNotNone(v.cached)
+        np.testing.assert_allclose(self.render(engine, 10),
+                                   self.render(expected, 10), atol=1e-6)
+        self.assertIsNone(v.cached)
+
+    def test_lru_respeta_el_tope(self):
+        from lgpt_engine import NoteCache
+        engine = self.make_song(False)
+        nc = NoteCache(2_000_000)
+        sample = engine.bank.get("test.wav")
+        idef = engine.instruments[0]
+        for note in range(50, 70):
+            v = Voice(sample, idef, note, SAMPLE_RATE, 1000.0)
+            # en el disparo no se renderiza: se pide al hilo
+            self.assertFalse(nc.attach(v))
+            self.assertIsNone(v.cached)
+        nc.wait()
+        v = Voice(sample, idef, 69, SAMPLE_RATE, 1000.0)
+        self.assertTrue(nc.attach(v))                 # la última sigue
+        self.assertEqual(nc.hits, 1)
+        self.assertLessEqual(nc.nbytes, nc.max_bytes)
+        self.assertLess(len(nc), 20)
+
+    def test_fallo_al_renderizar_no_bloquea_la_nota(self):
+        import contextlib
+        import io
+        from unittest import mock
+        from lgpt_engine import NoteCache
+        engine = self.make_song(False)
+        nc = NoteCache(2_000_000)
+        sample = engine.bank.get("test.wav")
+        idef = engine.instruments[0]
+        with mock.patch.object(Voice, "_crush", side_effect=MemoryError), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(nc.attach(Voice(sample, idef, 60, SAMPLE_RATE,
+                                             1000.0)))
+            nc.wait()
+        # el fallo suelta la nota: se vuelve a pedir y esta vez entra
+        self.assertFalse(nc.attach(Voice(sample, idef, 60, SAMPLE_RATE,
+                                         1000.0)))
+        self.assertEqual(nc._sent, 2)
+        nc.wait()
+        self.assertTrue(nc.attach(Voice(sample, idef, 60, SAMPLE_RATE,
+                                        1000.0)))
+
+
+class TestRenderInto(unittest.TestCase):
+    """`render_into` escribe el bloque en el buffer de quien llama y, con la
+    arena hecha, no reserva memoria de audio bloque a bloque."""
+
+    BLOCK = 2048
+
+    def make_song(self):
+        engine = make_engine()
+        engine.set_audio_delay(0.1)
+        engine.master_chain = MasterChain(SAMPLE_RATE, lo_db=2.0)
+        engine.stems = {
+            ci: np.random.default_rng(ci).uniform(
+                -0.5, 0.5, (SAMPLE_RATE * 4, 2)).astype(np.float32)
+            for ci in range(CHANNEL_COUNT)}
+        engine.channels[1].cc_vol = 0.5
+        engine.channels[2].cc_pan = 30
+        return engine
+
+    def test_igual_que_render(self):
+        ref = self.make_song()
+        engine = self.make_song()
+        engine.prepare(self.BLOCK)
+        out = np.zeros((self.BLOCK, 2), dtype=np.float32)
+        for _ in range(10):
+            expected = ref.render(self.BLOCK)
+            engine.render_into(out)
+            np.testing.assert_array_equal(out, expected)
+
+    def test_sin_reservas_en_regimen(self):
+        import tracemalloc
+        engine = self.make_song()
+        if type(engine.master_chain.eq).__module__ == "numpy_fx":
+            # lfilter reserva ~12 KB fijos por llamada (objetos de Python,
+            # no audio): el EQ de numpy se mide aparte, en test_numpy_fx
+            engine.master_chain.eq = None
+        engine.prepare(self.BLOCK)
+        out = np.zeros((self.BLOCK, 2), dtype=np.float32)
+        for _ in range(10):
+            engine.render_into(out)
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            for _ in range(40):
+                engine.render_into(out)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # Solo objetos pequeños de Python (listas, floats): ni un buffer de
+        # audio, que ya serían 16 KB por bloque.
+        self.assertLess(peak - base, self.BLOCK * 2 * 4 // 2)
+
+    def test_voces_sin_reservas_en_regimen(self):
+        # Voces de sample de verdad, no stems: unity, con pitch y crush,
+        # filtrada, int16 con downsample y con rampa de volumen (VOLM), voz
+        # a voz y por lotes. A 30 BPM un tick son 3675 muestras, así que
+        # cada voz lee sub-bloques de miles: un solo array por bloque ya
+        # pasaría del tope. Quedan fuera las rampas de speed (LEGA, PTCH,
+        # PFIN), que acaban con el glide, y los samples del disco.
+        import tracemalloc
+        block = 4096
+        t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+        wav16 = Sample((np.stack([np.sin(2 * np.pi * 330 * t),
+                                  np.sin(2 * np.pi * 220 * t)], axis=1)
+                        * 16000).astype(np.int16), SAMPLE_RATE)
+        loop = dict(index=0, sample_name="", loop=True)
+        cases = [
+            (None, InstrumentDef(**loop), 60),
+            (None, InstrumentDef(**loop, crush=6), 67),
+            (None, InstrumentDef(**loop, cutoff=0x80, reso=0x40), 55),
+            (wav16, InstrumentDef(**loop, downsample=1), 62),
+            (wav16, InstrumentDef(**loop), 60),
+        ]
+        previous = filter_kernel_name()
+        try:
+            for kernel in ("python", "numba"):
+                for batch in (False, True):
+                    with self.subTest(kernel=kernel, batch=batch):
+                        set_filter_kernel(kernel)
+                        engine = make_engine("30")
+                        engine.batch_voices = batch
+                        engine.set_audio_delay(0.1)
+                        sample = engine.bank.get("test.wav")
+                        for ci, (smp, idef, note) in enumerate(cases, 1):
+                            engine.channels[ci].voice = Voice(
+                                smp or sample, idef, note, SAMPLE_RATE,
+                                engine.samples_per_tick)
+                        engine.channels[5].voice.set_volm(0x2040)
+                        engine.prepare(block)
+                        out = np.zeros((block, 2), dtype=np.float32)
+                        for _ in range(10):
+                            engine.render_into(out)
+                        tracemalloc.start()
+                        try:
+                            base = tracemalloc.get_traced_memory()[0]
+                            for _ in range(20):
+                                engine.render_into(out)
+                            peak = tracemalloc.get_traced_memory()[1]
+                        finally:
+                            tracemalloc.stop()
+                        for ci in range(1, 6):
+                            self.assertIsNotNone(engine.channels[ci].voice)
+                        self.assertNotEqual(engine.channels[5].voice.vol_kinc,
+                                            0.0)
+                        self.assertEqual(engine._batch_work is not None,
+                                         batch)
+                        self.assertGreater(float(np.abs(out).max()), 0.0)
+                        # antes: 90 KB voz a voz y 350 KB por lotes
+                        self.assertLess(peak - base, block * 2 * 4 // 2)
+        finally:
+            set_filter_kernel(previous)
+
+
+class TestPlanar(unittest.TestCase):
+    """Audio interno planar (2, n): filas contiguas para los puertos LADSPA
+    y un solo intercalado a la salida."""
+
+    def test_buffers_planar_y_contiguos(self):
+        engine = make_engine()
+        engine.set_audio_delay(0.05)
+        engine.prepare(512)
+        engine.render(512)
+        self.assertEqual(engine._dry.shape, (CHANNEL_COUNT, 2, 512))
+        self.assertEqual(engine._stage[0].shape, (2, 512))
+        self.assertEqual(engine._rings[0].shape, (2, int(0.05 * SAMPLE_RATE)))
+        self.assertTrue(engine._dry[3, 1, :300].flags.c_contiguous)
+
+    def test_efectos_sobre_bloque_planar(self):
+        from lgpt_engine import EFFECT_PRESETS
+        rng = np.random.default_rng(0)
+        for name, cls in EFFECT_PRESETS.items():
+            with self.subTest(fx=name):
+                fx = cls(SAMPLE_RATE)
+                if hasattr(fx, "set_tempo"):
+                    fx.set_tempo(120.0)
+                buf = rng.uniform(-0.5, 0.5, (2, 512)).astype(np.float32)
+                fx.apply(buf, 0.5)
+                self.assertEqual(buf.shape, (2, 512))
+                self.assertTrue(np.isfinite(buf).all())
+
+    def test_pan_del_canal_por_filas(self):
+        engine = make_engine()
+        note_row(engine.project, 0)
+        engine.channels[0].cc_pan = 0          # todo a la izquierda
+        out = np.concatenate([engine.render(512) for _ in range(10)])
+        self.assertGreater(float(np.abs(out[:, 0]).max()), 0.0)
+        self.assertEqual(float(np.abs(out[:, 1]).max()), 0.0)
+
+
+class TestLadspaPuertos(unittest.TestCase):
+    """Controles LADSPA solo cuando cambian, puertos conectados al bloque y
+    buffers propios alineados."""
+
+    class FakePlugin:
+        def __init__(self):
+            self.sets = []
+
+        def set(self, *args, **kw):
+            self.sets.append((args, kw))
+
+        def run(self, buf):
+            pass
+
+    def test_set_solo_si_cambia_el_knob(self):
+        from lgpt_engine import EFFECT_PRESETS
+        for name in ("acid_lp", "satan", "ringmod", "phaser", "decimator",
+                     "tape_delay"):
+            with self.subTest(fx=name):
+                fx = EFFECT_PRESETS[name](SAMPLE_RATE)
+                fx.plugin = self.FakePlugin()
+                buf = np.zeros((2, 64), dtype=np.float32)
+                for amount in (0.5, 0.5, 0.5, 0.7, 0.7):
+                    fx.apply(buf, amount)
+                self.assertEqual(len(fx.plugin.sets), 2)
+
+    def stub(self, properties=0):
+        """Plugin LADSPA de mentira hecho con ctypes (ganancia: puerto 0
+        control, 1 entrada, 2 salida), registrado como si se hubiera
+        cargado de un .so. Devuelve la lista de conexiones que recibe."""
+        import ctypes
+        import ladspa_fx
+        ports, connects = {}, []
+        INSTANTIATE = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p,
+                                       ctypes.c_ulong)
+        CONNECT = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_ulong,
+                                   ctypes.c_void_p)
+        RUN = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_ulong)
+
+        def connect(_h, port, ptr):
+            ports[port] = ptr
+            connects.append((port, ptr))
+
+        def run(_h, n):
+            f = ctypes.POINTER(ctypes.c_float)
+            gain = ctypes.cast(ports[0], f)[0]
+            src = ctypes.cast(ports[1], f)
+            dst = ctypes.cast(ports[2], f)
+            for i in range(n):
+                dst[i] = src[i] * gain
+
+        funcs = (INSTANTIATE(lambda _d, _sr: 1), CONNECT(connect), RUN(run))
+        kinds = (ctypes.c_int * 3)(0x1 | 0x4, 0x1 | 0x8, 0x2 | 0x8)
+        desc = ladspa_fx._Descriptor(
+            UniqueID=9999, Properties=properties, PortCount=3,
+            PortDescriptors=ctypes.cast(kinds, ctypes.POINTER(ctypes.c_int)),
+            instantiate=ctypes.cast(funcs[0], ctypes.c_void_p),
+            connect_port=ctypes.cast(funcs[1], ctypes.c_void_p),
+            run=ctypes.cast(funcs[2], ctypes.c_void_p))
+        key = ("stub.so", 9999 + properties)
+        ladspa_fx._DESCRIPTORS[key] = (funcs, ctypes.pointer(desc))
+        self.addCleanup(ladspa_fx._DESCRIPTORS.pop, key)
+        self.keep = (kinds, desc)             # vivos mientras dure el test
+        plugin = ladspa_fx.LadspaPlugin(*key, SAMPLE_RATE)
+        plugin.set_control(0, 0.5)
+        return plugin, connects
+
+    def test_puertos_sobre_el_bloque(self):
+        plugin, connects = self.stub()
+        block = np.ones((2, 4096), dtype=np.float32)
+        for _ in range(3):
+            buf = block[:, :512]
+            plugin.run(buf[0], 1, 2)
+        np.testing.assert_array_equal(block[0, :512], 0.125)
+        np.testing.assert_array_equal(block[0, 512:], 1.0)
+        addr = block.ctypes.data
+        # conectados al bloque una sola vez, sin buffer propio
+        self.assertEqual([c for c in connects if c[0] != 0],
+                         [(1, addr), (2, addr)])
+        self.assertEqual(plugin._io, {})
+        # otra dirección: se reconecta; una columna (no contigua) se copia
+        plugin.run(block[1, :512], 1, 2)
+        self.assertEqual(connects[-1], (2, block[1].ctypes.data))
+        col = np.ones((512, 2), dtype=np.float32)
+        plugin.run(col[:, 0], 1, 2)
+        np.testing.assert_array_equal(col, [[0.5, 1.0]] * 512)
+        self.assertEqual(len(plugin._io), 1)
+        plugin.run(block[1, :512], 1, 2)      # y vuelve al bloque
+        np.testing.assert_array_equal(block[1, :512], 0.25)
+
+    def test_puertos_sin_inplace(self):
+        from ladspa_fx import LADSPA_PROPERTY_INPLACE_BROKEN
+        plugin, connects = self.stub(LADSPA_PROPERTY_INPLACE_BROKEN)
+        buf = np.ones(256, dtype=np.float32)
+        plugin.run(buf, 1, 2)
+        plugin.run(buf, 1, 2)
+        np.testing.assert_array_equal(buf, 0.25)
+        self.assertNotIn(buf.ctypes.data, [c[1] for c in connects])
+
+    def test_buffers_alineados(self):
+        from ladspa_fx import _aligned
+        for n in (1, 63, 512, 2049):
+            buf = _aligned(2, n)
+            self.assertEqual(buf.shape[0], 2)
+            self.assertGreaterEqual(buf.shape[1], n)
+            self.assertEqual(buf.dtype, np.float32)
+            self.assertEqual(buf.ctypes.data % 64, 0)
+            self.assertEqual(buf[1].ctypes.data % 64, 0)
+
+
+class TestFxPrecargados(unittest.TestCase):
+    """Efectos instanciados al cargar y lista de encendidos por canal."""
+
+    def test_preload_crea_solo_efectos_validos(self):
+        engine = make_engine()
+        engine.preload_fx([(1, "flanger"), (1, "flanger"), (2, "volume"),
+                           (9, "flanger"), (3, "acid_lp"), (4, "space")])
+        self.assertEqual(set(engine.channels[1].fx_objs), {"flanger"})
+        self.assertEqual(engine.channels[2].fx_objs, {})
+        self.assertEqual(set(engine.channels[3].fx_objs), {"acid_lp"})
+        # las reverbs son buses del engine, no efectos del canal
+        self.assertEqual(engine.channels[4].fx_objs, {})
+        self.assertIsNone(engine.aux[0])
+        self.assertIsNotNone(engine.aux[1])
+
+    def test_render_usa_el_precargado(self):
+        engine = make_engine()
+        engine.preload_fx([(0, "flanger")])
+        fx = engine.channels[0].fx_objs["flanger"]
+        engine.channels[0].fx_amounts["flanger"] = 0.4
+        engine.render(512)
+        self.assertIs(engine.channels[0].fx_objs["flanger"], fx)
+        self.assertEqual([a for _fx, a, _t in engine.channels[0].fx_active],
+                         [0.4])
+
+    def test_lista_activa_sigue_a_fx_amounts(self):
+        engine = make_engine()
+        ch = engine.channels[0]
+        ch.fx_amounts["flanger"] = 0.3
+        ch.fx_amounts["satan"] = 0.2
+        ch.fx_amounts["reverb"] = 0.5
+        engine.render(512)
+        active = ch.fx_active
+        # orden de EFFECT_PRESETS, no el de inserción; la reverb es un envío
+        self.assertEqual([fx for fx, _a, _t in active],
+                         [ch.fx_objs["satan"], ch.fx_objs["flanger"]])
+        self.assertEqual(ch.fx_sends, [(0, 0.5)])
+        engine.render(512)
+        self.assertIs(ch.fx_active, active)        # sin cambios: no se rehace
+        ch.fx_amounts["satan"] = 0.0
+        engine.render(512)
+        self.assertEqual([fx for fx, _a, _t in ch.fx_active],
+                         [ch.fx_objs["flanger"]])
+
+
+class TestAuxBuses(unittest.TestCase):
+    """reverb y space como buses auxiliares compartidos por los canales."""
+
+    BLOCK = 512
+
+    @staticmethod
+    def engine_con_notas():
+        engine = make_engine()
+        for ci in range(4):
+            engine.project.song[ci] = 0
+        for step, note in ((0, 60), (4, 67), (8, 64), (12, 48)):
+            note_row(engine.project, step, note=note)
+        return engine
+
+    def render(self, engine, n=40):
+        return np.concatenate([engine.render(self.BLOCK) for _ in range(n)])
+
+    def por_canal(self, amounts):
+        """Referencia: cada canal con su propia reverb de inserto, como
+        antes de los buses."""
+        from lgpt_engine import EFFECT_PRESETS
+        engine = self.engine_con_notas()
+        insert = {ci: {name: EFFECT_PRESETS[name](SAMPLE_RATE)
+                       for name in fx} for ci, fx in amounts.items()}
+        mix_live = engine.mix_live
+
+        def con_insertos(dry, frames, out=None, quiet=None):
+            for ci, fx in insert.items():
+                for name, obj in fx.items():
+                    obj.apply(dry[ci, :, :frames], amounts[ci][name])
+            return mix_live(dry, frames, out)    # las colas cambian `quiet`
+
+        engine.mix_live = con_insertos
+        return self.render(engine)
+
+    def test_una_instancia_para_todos(self):
+        engine = self.engine_con_notas()
+        for ci in range(3):
+            engine.channels[ci].fx_amounts["reverb"] = 0.5
+        self.render(engine, 2)
+        self.assertIsNotNone(engine.aux[0])
+        self.assertIsNone(engine.aux[1])
+        self.assertTrue(all(ch.fx_objs == {} for ch in engine.channels))
+
+    def test_nivel_como_por_canal(self):
+        amounts = {0: {"reverb": 0.6}, 1: {"reverb": 0.3},
+                   2: {"space": 0.5}, 3: {"reverb": 0.4, "space": 0.2}}
+        engine = self.engine_con_notas()
+        for ci, fx in amounts.items():
+            engine.channels[ci].fx_amounts.update(fx)
+        got = self.render(engine)
+        ref = self.por_canal(amounts)
+        rms = float(np.sqrt(np.mean(ref ** 2)))
+        self.assertGreater(rms, 0.0)
+        # Sin pan las colas son lineales: la suma de envíos da lo mismo que
+        # una reverb por canal. Lo único que cambia es que `space` ya no
+        # recibe la cola de `reverb` del mismo canal (canal 3).
+        self.assertAlmostEqual(float(np.sqrt(np.mean(got ** 2))) / rms,
+                               1.0, delta=0.05)
+
+
+class TestSilencio(unittest.TestCase):
+    """Canales, delays, efectos y buses en silencio se saltan sin cambiar
+    lo que suena."""
+
+    BLOCK = 512
+
+    def make_song(self, skip=True):
+        engine = make_engine()             # solo suena el canal 0
+        note_row(engine.project, 0)
+        engine.project.cmd1[2] = "STOP"    # y se calla en el paso 2
+        engine.set_audio_delay(0.05)
+        engine.skip_silence = skip
+        engine.channels[0].fx_amounts["beat_delay"] = 0.8
+        engine.channels[3].fx_amounts.update(satan=0.5, beat_delay=0.5)
+        engine.channels[5].fx_amounts["space"] = 0.5
+        return engine
+
+    def render(self, engine, n):
+        return np.concatenate([engine.render(self.BLOCK) for _ in range(n)])
+
+    def test_igual_que_sin_saltos(self):
+        n = 20                             # antes del STOP
+        ref = self.render(self.make_song(skip=False), n)
+        engine = self.make_song()
+        got = self.render(engine, n)
+        self.assertGreater(float(np.abs(ref).max()), 0.0)
+        np.testing.assert_array_equal(got, ref)
+        # siete anillos vacíos; en directo la mezcla de los canales 1-7
+        # menos el 3, al que aún le suena la cola del beat_delay (pero ya
+        # no la de satan, que va delante)
+        self.assertEqual(engine.skip_dry, 7)
+        self.assertEqual(engine.skip_live, 7)
+        self.assertEqual(engine.channels[3].skipped, 1)
+
+    def test_la_cola_suena_hasta_apagarse(self):
+        engine = self.make_song()
+        ref = self.make_song(skip=False)
+        blocks = int(12.0 * SAMPLE_RATE / self.BLOCK)
+        got = self.render(engine, blocks)
+        want = self.render(ref, blocks)
+        # el beat_delay del canal 0 sigue sonando tras el STOP...
+        tail = want[int(1.5 * SAMPLE_RATE):int(2.0 * SAMPLE_RATE)]
+        self.assertGreater(float(np.abs(tail).max()), 1e-3)
+        # ... y al saltarse cuando ya no se oyen la diferencia es inaudible
+        self.assertLess(float(np.abs(got - want).max()), 1e-4)
+        self.assertTrue(engine.channels[0].silent_out)
+        self.assertEqual(float(np.abs(got[-self.BLOCK:]).max()), 0.0)
+
+    def test_bloques_de_tamaño_variable(self):
+        # La voz del canal 0 suena, se apaga en bloques cortos y vuelve con
+        # bloques largos: lo que dejó un bloque largo más allá de los cortos
+        # no puede volver a sumarse.
+        sizes = [2048] * 10 + [512] * 60 + [2048] * 60
+
+        def render(skip):
+            engine = make_engine()
+            note_row(engine.project, 0)
+            engine.skip_silence = skip
+            return np.concatenate([engine.render(n) for n in sizes])
+
+        ref = render(False)
+        back = ref[2048 * 10 + 512 * 60:]   # la nota vuelve a sonar
+        self.assertGreater(float(np.abs(back).max()), 0.0)
+        np.testing.assert_array_equal(render(True), ref)
+
+    def test_stem_que_se_acaba_a_medio_bloque(self):
+        # El stem escribe parte del bloque y se suelta: esas muestras se
+        # limpian como las de una voz y no vuelven con la nota del paso 4.
+        def render(skip):
+            engine = make_engine()
+            note_row(engine.project, 4)
+            engine.skip_silence = skip
+            engine.stems = {0: np.full((3000, 2), 0.25, dtype=np.float32)}
+            return np.concatenate([engine.render(1024) for _ in range(30)])
+
+        ref = render(False)
+        self.assertEqual(float(ref[:2048].min()), 0.25)
+        np.testing.assert_array_equal(render(True), ref)
+
+    def test_mascara_de_render_dry(self):
+        engine = self.make_song()
+        dry = np.zeros((CHANNEL_COUNT, 2, self.BLOCK), dtype=np.float32)
+        dry[:] = 1.0                       # hueco con un bloque viejo
+        quiet = engine.render_dry(self.BLOCK, dry)
+        self.assertEqual(quiet, 0xFE)
+        self.assertEqual(float(np.abs(dry[1:]).max()), 0.0)
+        # sin máscara (render adelantado) mix_live mira el propio bloque
+        split = self.make_song()
+        dry2 = np.zeros_like(dry)
+        split.render_dry(self.BLOCK, dry2)
+        np.testing.assert_array_equal(split.mix_live(dry2, self.BLOCK),
+                                      engine.mix_live(dry, self.BLOCK, None,
+                                                      quiet))
+
+
+@unittest.skipIf(lgpt_engine._lfilter is None, "sin scipy")
+class TestFallbackVectorizado(unittest.TestCase):
+    """Los caminos sin LADSPA de acid_lp y suboctave por bloques (lfilter)
+    suenan como el bucle muestra a muestra de referencia."""
+
+    def señal(self, hz=55.0, seconds=1.0):
+        rng = np.random.default_rng(3)
+        t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+        x = 2.5 * np.sin(2 * np.pi * hz * t) + rng.normal(0, 0.3, len(t))
+        x = x.astype(np.float32)
+        return np.stack([x, np.roll(x, 100)])
+
+    def compara(self, cls, amounts, hz=55.0, block=512):
+        fast, ref = cls(SAMPLE_RATE), cls(SAMPLE_RATE)
+        fast.plugin = ref.plugin = None
+        ref.vectorized = False
+        x = self.señal(hz)
+        got, want = x.copy(), x.copy()
+        # bloques de tamaño variable (incluido uno de 1 muestra): el estado
+        # tiene que pasar bien de uno a otro
+        cuts = [0, 1, 2, 300] + list(range(812, x.shape[1], block))
+        cuts.append(x.shape[1])
+        for k, (a, b) in enumerate(zip(cuts, cuts[1:])):
+            amount = amounts[k % len(amounts)]
+            fast.apply(got[:, a:b], amount)
+            ref.apply(want[:, a:b], amount)
+        return got, want
+
+    def test_acid_lp_igual_que_el_bucle(self):
+        from lgpt_engine import AcidLpFx
+        got, want = self.compara(AcidLpFx, (0.2, 0.9, 1.0, 0.5))
+        # el bucle de referencia calcula en float32 y lfilter en double
+        np.testing.assert_allclose(got, want, rtol=0, atol=2e-4)
+
+    def test_acid_lp_recorte_de_salida(self):
+        from lgpt_engine import AcidLpFx
+        # seno en el corte a tope (780 Hz), donde la resonancia lo dispara
+        got, want = self.compara(AcidLpFx, (1.0,), hz=780.0)
+        top = AcidLpFx.CLAMP * (1.0 + AcidLpFx.COMP)
+        self.assertAlmostEqual(float(np.abs(want).max()), top, places=5)
+        self.assertAlmostEqual(float(np.abs(got).max()), top, places=5)
+        # resonancia a tope: la y interna dobla el tope, y el error de
+        # float32 del bucle crece con ella (sigue en -75 dB del pico)
+        np.testing.assert_allclose(got, want, rtol=0, atol=1e-3)
+
+    def test_suboctava_igual_que_el_bucle(self):
+        from lgpt_engine import SuboctaveFx
+        got, want = self.compara(SuboctaveFx, (0.3, 0.8, 1.0))
+        np.testing.assert_allclose(got, want, rtol=0, atol=1e-4)
+
+
+class TestFxBackend(unittest.TestCase):
+    """`set_fx_backend` elige entre LADSPA y numpy_fx por preset, y con
+    cualquiera de los dos todos los presets suenan."""
+
+    def tearDown(self):
+        set_fx_backend()
+
+    def motor(self, fx, attr="plugin"):
+        plugin = getattr(fx, attr)
+        return None if plugin is None else type(plugin).__module__
+
+    def test_numpy_en_todos(self):
+        from lgpt_engine import ChopperFx, PhaserFx, SatanFx, TapeDelayFx
+        self.assertEqual(set_fx_backend("numpy"), "numpy")
+        for cls in (ChopperFx, TapeDelayFx):
+            self.assertEqual(self.motor(cls(SAMPLE_RATE)), "numpy_fx")
+        self.assertIsNone(SatanFx(SAMPLE_RATE).plugin)   # camino propio
+        master = MasterChain(SAMPLE_RATE, lo_db=2.0)
+        if lgpt_engine._lfilter is not None:
+            self.assertEqual(self.motor(PhaserFx(SAMPLE_RATE)), "numpy_fx")
+            self.assertEqual(self.motor(master, "eq"), "numpy_fx")
+        self.assertIsNone(MasterChain(SAMPLE_RATE).eq)   # plano: sin EQ
+
+    def test_por_preset_y_desconocidos(self):
+        from lgpt_engine import RingmodFx
+        set_fx_backend("numpy", {"ringmod": "ladspa", "phaser": "vst"})
+        self.assertEqual(fx_backend("ringmod"), "ladspa")
+        self.assertEqual(fx_backend("phaser"), "numpy")
+        self.assertEqual(set_fx_backend("vst"), "numpy")
+        # pedido LADSPA: el plugin si carga y si no, el de numpy; nunca nada
+        set_fx_backend("ladspa")
+        self.assertIn(self.motor(RingmodFx(SAMPLE_RATE)),
+                      ("ladspa_fx", "numpy_fx"))
+
+    def test_todos_los_presets_suenan(self):
+        set_fx_backend("numpy")
+        engine = make_engine()
+        note_row(engine.project, 0)
+        engine.project.song[1] = 0
+        for ci, name in enumerate(lgpt_engine.EFFECT_PRESETS):
+            engine.channels[ci % 2].fx_amounts[name] = 0.6
+        engine.master_chain = MasterChain(SAMPLE_RATE, lo_db=2.0)
+        engine.start()
+        out = np.concatenate([engine.render(1024) for _ in range(40)])
+        self.assertTrue(np.isfinite(out).all())
+        self.assertGreater(float(np.abs(out).max()), 0.01)
+
+    def test_sin_motor_pasa_seco(self):
+        # _fx_plugin puede devolver None: el preset deja el bloque como
+        # estaba en vez de romper el callback
+        from lgpt_engine import ChopperFx, DecimatorFx, RingmodFx
+        for cls in (RingmodFx, DecimatorFx, ChopperFx):
+            fx = cls(SAMPLE_RATE)
+            fx.plugin = None
+            buf = np.full((2, 256), 0.25, dtype=np.float32)
+            fx.apply(buf, 0.6)
+            np.testing.assert_array_equal(buf, 0.25, err_msg=cls.__name__)
+
+    def test_peine_de_reverb_se_apaga(self):
+        from lgpt_engine import ReverbFx
+        set_fx_backend("numpy")
+        rev = ReverbFx(SAMPLE_RATE)
+        src = np.zeros((2, 4096), dtype=np.float32)
+        out = np.empty_like(src)
+        src[:, 0] = 1.0
+        rev.tail(src, out)
+        src[:] = 0.0
+        for _ in range(int(8 * SAMPLE_RATE / 4096)):
+            rev.tail(src, out)
+        self.assertLess(float(np.abs(out).max()), 1e-3)
+
+
+class TestBeatDelayTempo(unittest.TestCase):
+    """Con el knob de tempo girando, el beat_delay no reserva memoria, no
+    pierde los ecos ni hace clic."""
+
+    BLOCK = 512
+
+    def test_sin_reservas_al_cambiar_tempo(self):
+        import tracemalloc
+        from lgpt_engine import BeatDelayFx
+        fx = BeatDelayFx(SAMPLE_RATE)
+        block = 2048                       # como en TestRenderInto
+        buf = np.random.default_rng(0).uniform(
+            -0.5, 0.5, (2, block)).astype(np.float32)
+        fx.set_tempo(120.0)
+        fx.apply(buf, 0.7)
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            for k in range(60):
+                fx.set_tempo(120.0 * (1.0 + 0.002 * k))
+                fx.apply(buf, 0.7)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # antes: un anillo nuevo de una negra (176 KB a 120 BPM) por cambio
+        self.assertLess(peak - base, block * 2 * 4 // 2)
+
+    def test_el_eco_sobrevive_al_cambio(self):
+        from lgpt_engine import BeatDelayFx
+        fx = BeatDelayFx(SAMPLE_RATE)
+        fx.set_tempo(120.0)
+        x = np.zeros((2, SAMPLE_RATE), dtype=np.float32)
+        x[:, 100] = 1.0
+        for a in range(0, 1024, self.BLOCK):
+            fx.apply(x[:, a:a + self.BLOCK], 0.5)
+        fx.set_tempo(130.0)                # antes de que llegue el eco
+        for a in range(1024, x.shape[1], self.BLOCK):
+            fx.apply(x[:, a:a + self.BLOCK], 0.5)
+        echo = 100 + 60.0 / 130.0 * SAMPLE_RATE
+        peak = int(np.argmax(np.abs(x[0, 200:]))) + 200
+        self.assertLessEqual(abs(peak - echo), 1.0)
+        self.assertGreater(float(np.abs(x[0, peak - 1:peak + 2]).sum()), 0.2)
+
+    def test_sin_clics(self):
+        from lgpt_engine import BeatDelayFx
+        fx = BeatDelayFx(SAMPLE_RATE)
+        t = np.arange(4 * SAMPLE_RATE) / SAMPLE_RATE
+        x = np.stack([0.5 * np.sin(2 * np.pi * 220.0 * t)] * 2).astype(
+            np.float32)
+        for k, a in enumerate(range(0, x.shape[1], self.BLOCK)):
+            fx.set_tempo(125.0 * (1.0 + 0.12 * abs(math.sin(k / 20.0))))
+            fx.apply(x[:, a:a + self.BLOCK], 1.0)
+        # el seno solo ya salta hasta 0.016 por muestra; un cambio de
+        # retardo sin fundido llega a ~0.5
+        self.assertLess(float(np.abs(np.diff(x[0])).max()), 0.05)
+
+
+class TestQualityGovernor(unittest.TestCase):
+    """Escalones de calidad según la carga, con histéresis."""
+
+    BLOCK_S = 2048 / SAMPLE_RATE
+
+    def feed(self, gov, load, seconds):
+        for _ in range(int(math.ceil(seconds / self.BLOCK_S))):
+            gov.update(load, self.BLOCK_S)
+
+    def test_baja_y_recupera_con_histeresis(self):
+        gov = QualityGovernor()
+        gov.update(0.95, self.BLOCK_S)
+        gov.update(0.95, self.BLOCK_S)
+        self.assertEqual(gov.level, 0)     # un pico suelto no baja
+        self.assertTrue(gov.update(0.95, self.BLOCK_S))
+        self.assertEqual(gov.level, 1)
+        self.assertFalse(gov.scream)
+        self.assertTrue(gov.filter_full_rate)
+        self.assertEqual(gov.log[-1][1:], (1, "sin scream"))
+        self.feed(gov, 0.95, 10.0)         # tope: sin filtro
+        self.assertEqual(gov.level, len(QualityGovernor.STEPS))
+        self.assertFalse(gov.tails or gov.filter)
+        self.feed(gov, 0.7, 30.0)          # entre BAJO y ALTO: se queda
+        self.assertEqual(gov.level, 4)
+        self.feed(gov, 0.3, gov.ESPERA_S - 0.5)
+        self.assertEqual(gov.level, 4)
+        self.feed(gov, 0.3, 1.0)
+        self.assertEqual(gov.level, 3)
+        self.assertEqual(gov.log[-1][2], "colas cortas")
+
+    def test_recaer_alarga_la_espera(self):
+        gov = QualityGovernor()
+        self.feed(gov, 0.95, 3 * self.BLOCK_S)
+        self.feed(gov, 0.3, gov.ESPERA_S + 1.0)
+        self.assertEqual(gov.level, 0)
+        self.feed(gov, 0.95, 3 * self.BLOCK_S)   # recae enseguida
+        self.assertEqual(gov.level, 1)
+        self.assertEqual(gov.espera, 2 * gov.ESPERA_S)
+        self.feed(gov, 0.3, gov.ESPERA_S + 1.0)
+        self.assertEqual(gov.level, 1)
+
+    def test_apagado(self):
+        gov = QualityGovernor()
+        gov.enabled = False
+        self.feed(gov, 2.0, 5.0)
+        self.assertEqual(gov.level, 0)
+        self.assertFalse(gov.log)
+
+    def render(self, level, scream=True):
+        engine = make_engine()
+        engine.governor.enabled = False
+        engine.governor.level = level
+        idef = engine.instruments[0]
+        idef.cutoff, idef.reso, idef.filter_scream = 0x60, 0xB0, scream
+        note_row(engine.project, 0)
+        return np.concatenate([engine.render(2048) for _ in range(4)])
+
+    def test_escalones_del_filtro(self):
+        full = self.render(0)
+        self.assertGreater(float(np.abs(full).max()), 0.01)
+        np.testing.assert_array_equal(self.render(1), self.render(0, False))
+        half = self.render(2)
+        self.assertGreater(float(np.abs(half - self.render(1)).max()), 0.0)
+        engine = make_engine()             # sin filtro = instrumento limpio
+        note_row(engine.project, 0)
+        clean = np.concatenate([engine.render(2048) for _ in range(4)])
+        np.testing.assert_array_equal(self.render(4), clean)
+
+    def test_colas_cortas(self):
+        tape = lgpt_engine.TapeDelayFx(SAMPLE_RATE)
+        sat = lgpt_engine.SatanFx(SAMPLE_RATE)
+        self.assertEqual(Engine._tail_s(tape, True), tape.tail_s)
+        self.assertEqual(Engine._tail_s(tape, False), QualityGovernor.TAIL_S)
+        self.assertEqual(Engine._tail_s(sat, False), sat.tail_s)
+        engine = make_engine()
+        note_row(engine.project, 0)
+        engine.project.cmd1[2] = "STOP"
+        engine.channels[0].fx_amounts["beat_delay"] = 0.8
+        engine.governor.enabled = False
+        engine.governor.level = 3
+        for _ in range(int(1.0 * SAMPLE_RATE / 512)):
+            engine.render(512)
+        # con la cola entera el beat_delay sonaría aún 5 s (10 negras)
+        self.assertTrue(engine.channels[0].silent_out)
+
+
+class TestEventosAlMuestreo(unittest.TestCase):
+    """Los eventos externos suenan un retardo fijo después de llegar, en
+    su muestra del bloque, no al principio del siguiente."""
+
+    BLOCK = 2048
+    BLOCK_MS = BLOCK * 1000.0 / SAMPLE_RATE
+    LEAD_MS = 20.0
+
+    def setUp(self):
+        from unittest import mock
+        self.now = 1e12                   # reloj de pared simulado, en ms
+        clock = mock.patch.object(lgpt_engine.time, "time",
+                                  lambda: self.now / 1000.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.engine = Engine(make_project())
+        self.engine.pad_samples = [(np.full((SAMPLE_RATE, 1), 0.5,
+                                            dtype=np.float32), SAMPLE_RATE)]
+
+    def llega(self, at_ms, *event):
+        """`event` llega `at_ms` después de empezar el bloque en curso."""
+        self.engine.push_event(*event, t_ms=self.now + at_ms)
+
+    def bloque(self):
+        """Un bloque que suena LEAD_MS después de pedirlo, como en el
+        callback; el reloj avanza lo que dura."""
+        self.engine.block_time_ms = self.now + self.LEAD_MS
+        out = self.engine.render(self.BLOCK)
+        self.now += self.BLOCK_MS
+        return out
+
+    def muestra(self, ms) -> float:
+        return ms * SAMPLE_RATE / 1000.0
+
+    def primera(self, out) -> int:
+        return int(np.flatnonzero(np.abs(out[:, 0]) > 1e-6)[0])
+
+    def test_pad_a_mitad_de_bloque(self):
+        self.bloque()
+        self.llega(10.0, "trigger", 0)
+        # llegó a los 10 ms del bloque: suena a los 10 ms del siguiente
+        self.assertEqual(float(np.abs(self.bloque()).max()), 0.0)
+        self.assertAlmostEqual(self.primera(self.bloque()),
+                               self.muestra(10.0), delta=1)
+        self.assertEqual(self.primera(self.bloque()), 0)
+
+    def test_transporte_en_su_muestra(self):
+        engine = self.engine
+        note_row(engine.project, 0)
+        engine.start()
+        engine.push_event("pause")
+        engine.render(self.BLOCK)         # sin reloj: al principio
+        self.assertEqual(engine.song_sample, 0)
+        self.llega(30.0, "play")
+        self.bloque()
+        self.bloque()
+        self.assertAlmostEqual(engine.song_sample,
+                               self.BLOCK - self.muestra(30.0), delta=1)
+
+    def test_orden_y_sin_reloj(self):
+        self.bloque()
+        self.llega(30.0, "trigger", 0)
+        self.llega(5.0, "param", 0, "pitch", 0)   # sellado antes: no adelanta
+        self.bloque()
+        self.assertEqual(self.engine.channels[0].cc_pitch, 1.0)
+        self.bloque()
+        self.assertEqual(len(self.engine.events), 0)
+        self.assertEqual(self.engine.channels[0].cc_pitch, 0.5)
+        # sin reloj del player todos al principio del bloque
+        self.engine.block_time_ms = None
+        self.engine.push_event("trigger", 0)
+        self.assertEqual(self.primera(self.engine.render(512)), 0)
+
+    def test_parametros_de_bloque_sin_esperar(self):
+        # volumen, pan y efectos se leen una vez por bloque: entran al
+        # empezar el siguiente, aunque vayan detrás de uno que espera
+        ch = self.engine.channels[0]
+        self.bloque()
+        self.llega(30.0, "param", 0, "pitch", 0)
+        self.llega(40.0, "param", 0, "volume", 0)
+        self.llega(40.0, "cc", 0, 10, 0)
+        self.llega(40.0, "param", 0, "satan", 127)
+        self.llega(40.0, "cc", 0, 20, 127)
+        self.bloque()
+        self.assertEqual((ch.cc_vol, ch.cc_pan, ch.fx_amounts["satan"]),
+                         (0.0, 0, 1.0))
+        self.assertEqual(ch.cc_pitch, 1.0)          # ese, en su muestra
+        self.assertEqual(len(self.engine.events), 5)
+        self.bloque()
+        self.assertEqual(ch.cc_pitch, 2.0 ** (63 / 64))
+        self.assertEqual(len(self.engine.events), 0)
+
+    def test_anillo_lleno(self):
+        ring = EventRing(4)
+        for i in range(5):
+            ring.put((lgpt_engine.EV_TRIGGER, i, 0, 0), i)
+        self.assertEqual((len(ring), ring.perdidos), (4, 1))
+        self.assertEqual(int(ring.head()[1]), 0)
+        ring.pop()
+        self.assertTrue(ring.put((lgpt_engine.EV_TRIGGER, 9, 0, 0), 9))
+        self.engine.push_event("no_existe", 1)
+        self.engine.push_event("param", 0, "no_existe", 1)
+        self.assertEqual(len(self.engine.events), 0)
+        for _ in range(EventRing.SLOTS + 2):
+            self.engine.push_event("trigger", 0)
+        self.assertEqual(self.engine.events_lost, 2)
+
+
+class TestCargaPerezosa(unittest.TestCase):
+    """Con `lazy_samples` solo se cargan de entrada los samples que la
+    canción dispara, en orden de uso; el resto llega por detrás."""
+
+    def setUp(self):
+        import tempfile
+        sf = __import__("soundfile")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        p = make_project()
+        p.dir = Path(self.tmp.name)
+        (p.dir / "samples").mkdir()
+        t = np.arange(SAMPLE_RATE // 4) / SAMPLE_RATE
+        for i, name in enumerate(("a.wav", "b.wav", "c.wav")):
+            sig = 0.3 * np.sin(2 * np.pi * 110 * (i + 1) * t)
+            sf.write(str(p.dir / "samples" / name), sig, SAMPLE_RATE)
+        p.instrument_bank = {
+            iid: {"type": "Sample",
+                  "params": {"sample": name, "volume": "128", "pan": "127"}}
+            for iid, name in ((0, "c.wav"), (1, "a.wav"), (2, "b.wav"))}
+        p.chains[1] = 1                    # chain 0 paso 1 -> phrase 1
+        note_row(p, 0, instr=2)
+        note_row(p, 3)                     # sin instrumento: sigue el 2
+        note_row(p, 16 + 5, instr=0)
+        p.notes[16 + 6] = 0xFF
+        p.instruments[16 + 7] = 1          # sin nota: no dispara
+        self.project = p
+
+    def test_orden_de_uso(self):
+        self.assertEqual(instrument_order(self.project), [2, 0])
+
+    def test_banco_perezoso(self):
+        engine = Engine(self.project, lazy_samples=True)
+        bank = engine.bank
+        self.assertEqual(bank.eager, 2)
+        self.assertEqual(list(bank.samples)[:2], ["b.wav", "c.wav"])
+        bank.get("a.wav")                  # None si aún no ha llegado
+        bank.wait()
+        self.assertIsNotNone(bank.get("a.wav"))
+        self.assertEqual(sorted(bank.samples), ["a.wav", "b.wav", "c.wav"])
+        self.assertIn("samples 2/3", bank.report())
+        self.assertEqual(bank.nbytes, 3 * (SAMPLE_RATE // 4) * 4)
+        eager = Engine(self.project)
+        self.assertEqual(eager.bank.eager, 3)
+        for e in (engine, eager):
+            e.start()
+        np.testing.assert_array_equal(
+            np.concatenate([engine.render(2048) for _ in range(12)]),
+            np.concatenate([eager.render(2048) for _ in range(12)]))
+
+
+    def test_get_no_espera(self):
+        # `get` va en el hilo de audio: lo que falta se pide al hilo de
+        # fondo, que lo carga antes que el resto, y la nota no suena.
+        import threading
+        import time
+        from unittest import mock
+        sf = __import__("soundfile")
+        t = np.arange(1000) / SAMPLE_RATE
+        names = [f"x{i}.wav" for i in range(6)]
+        for name in names:
+            sf.write(str(self.project.dir / "samples" / name),
+                     0.1 * np.sin(2 * np.pi * 220 * t), SAMPLE_RATE)
+        loads = []
+        read = SampleBank.read
+
+        def slow(bank, wav):
+            loads.append((wav.name, threading.current_thread().name))
+            time.sleep(0.02)
+            return read(bank, wav)
+
+        with mock.patch.object(SampleBank, "read", slow):
+            bank = SampleBank(self.project.dir, order=["a.wav"])
+            t0 = time.perf_counter()
+            self.assertIsNone(bank.get("x5.wav"))
+            self.assertIsNone(bank.get("no-existe.wav"))
+            self.assertLess(time.perf_counter() - t0, 0.015)
+            bank.wait()
+        self.assertEqual(loads[0], ("a.wav", "MainThread"))
+        later = [name for name, thread in loads[1:]]
+        self.assertTrue(all(thread == "samples" for _n, thread in loads[1:]))
+        self.assertLessEqual(later.index("x5.wav"), 1)   # tras el que ya iba
+        self.assertEqual(bank.on_demand, 1)
+        self.assertIsNotNone(bank.get("x5.wav"))
+
+
+class TestAlmacenDeSamples(unittest.TestCase):
+    """Un kit copiado en varias canciones se carga una vez; lo que no usa
+    ninguna canción abierta se descarta al pasar el tope."""
+
+    N = SAMPLE_RATE // 4               # muestras por WAV (mono float32)
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(set_sample_store_mb, 0)
+        self.sf = __import__("soundfile")
+
+    def song(self, name, **wavs):
+        d = Path(self.tmp.name) / name
+        (d / "samples").mkdir(parents=True)
+        t = np.arange(self.N) / SAMPLE_RATE
+        for wav, hz in wavs.items():
+            self.sf.write(str(d / "samples" / f"{wav}.wav"),
+                          0.3 * np.sin(2 * np.pi * hz * t), SAMPLE_RATE,
+                          subtype="FLOAT")
+        return d
+
+    def test_kit_compartido(self):
+        a = self.song("lgpt_a", bombo=60, bajo=55)
+        b = self.song("lgpt_b", kick=60, lead=880)   # mismo bombo, otro nombre
+        store = SampleStore(1 << 30)
+        bank_a = SampleBank(a, store=store)
+        bank_b = SampleBank(b, store=store)
+        self.assertEqual((bank_a.shared, bank_b.shared), (0, 1))
+        self.assertIs(bank_b.get("kick.wav"), bank_a.get("bombo.wav"))
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.nbytes, 3 * self.N * 4)
+        # volver a abrir la canción: nada que leer
+        again = SampleBank(a, store=store)
+        self.assertEqual(again.shared, 2)
+        self.assertIn("2 ya en memoria", again.report())
+
+    def test_tope_y_liberar(self):
+        a = self.song("lgpt_a", bombo=60, bajo=55)
+        b = self.song("lgpt_b", kick=60, lead=880)
+        store = SampleStore(2 * self.N * 4)          # caben dos
+        bank_a = SampleBank(a, store=store)
+        bank_b = SampleBank(b, store=store)
+        self.assertEqual(len(store), 3)               # todos en uso
+        bank_a.close()
+        bank_a.close()                                # una sola vez
+        # el bajo ya no lo usa nadie; el bombo sigue en b
+        self.assertEqual(len(store), 2)
+        self.assertIsNotNone(bank_b.get("kick.wav"))
+        del bank_b                                    # el GC también suelta
+        c = self.song("lgpt_c", hat=5000)
+        SampleBank(c, store=store)
+        self.assertEqual(len(store), 2)
+        self.assertLessEqual(store.nbytes, store.budget)
+
+    def test_cerrar_con_el_hilo_cargando(self):
+        # Cambio rápido de canción: el banco perezoso se cierra con el hilo
+        # de fondo aún cargando; nada de lo suyo puede quedarse en uso.
+        d = self.song("lgpt_a", **{f"s{i:02d}": 100 + 10 * i
+                                   for i in range(40)})
+        store = SampleStore(1 << 20)
+        bank = SampleBank(d, order=["s00.wav"], store=store)
+        bank.close()
+        self.assertFalse(bank._thread.is_alive())
+        self.assertTrue(all(refs == 0 for _s, refs
+                            in store._entries.values()))
+        self.assertLessEqual(store.nbytes, store.budget)
+        self.assertLess(len(bank.samples), 40)      # el resto ni se cargó
+
+    def test_engines_y_pads(self):
+        a = self.song("lgpt_a", bombo=60)
+        pads = self.song("pads", p001=440) / "samples"
+        self.assertEqual(set_sample_store_mb(64), 64)
+        store = sample_store()
+        p = make_project()
+        p.dir = a
+        e1 = Engine(p, wavs_dir=str(pads))
+        e2 = Engine(p, wavs_dir=str(pads))
+        self.assertEqual(e2.bank.shared, 2)            # el sample y el pad
+        self.assertIs(e1.pad_samples[0][0], e2.pad_samples[0][0])
+        set_sample_store_mb(128)                     # conserva lo guardado
+        self.assertIs(sample_store(), store)
+        self.assertEqual(len(store), 2)
+        set_sample_store_mb(0)
+        self.assertIsNone(sample_store())
+        self.assertIsNone(Engine(p).bank._store)
+
+
+class TestSamplesInt16(unittest.TestCase):
+    """`sample_format = "int16"`: la mitad de memoria y, con WAV de 16
+    bits, la misma salida que en float32 (1 LSB como mucho con 24 bits)."""
+
+    def project(self, subtype):
+        import tempfile
+        sf = __import__("soundfile")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        p = make_project()
+        p.dir = Path(tmp.name)
+        (p.dir / "samples").mkdir()
+        rng = np.random.default_rng(3)
+        sig = np.clip(0.4 * rng.standard_normal((SAMPLE_RATE // 2, 2)),
+                      -1, 1)
+        sf.write(str(p.dir / "samples" / "test.wav"), sig, SAMPLE_RATE,
+                 subtype=subtype)
+        for step, note in ((0, 60), (4, 67), (8, 60), (12, 49)):
+            note_row(p, step, note=note)     # unidad y camino general
+        p.instrument_bank[1] = {
+            "type": "Sample",
+            "params": {"sample": "test.wav", "volume": "128", "pan": "127",
+                       "loopmode": "loop"}}
+        p.chains[1] = 1
+        note_row(p, 16 + 2, note=72, instr=1)
+        return p
+
+    def render(self, p, fmt, **kw):
+        engine = Engine(p, sample_format=fmt)
+        for k, v in kw.items():
+            setattr(engine, k, v)
+        engine.start()
+        out = np.concatenate([engine.render(1000) for _ in range(90)])
+        return engine, out
+
+    def test_misma_salida_con_16_bits(self):
+        p = self.project("PCM_16")
+        ef, want = self.render(p, "float32")
+        ei, got = self.render(p, "int16")
+        self.assertGreater(float(np.abs(want).max()), 0.01)
+        np.testing.assert_array_equal(got, want)
+        self.assertEqual(ei.bank.get("test.wav").data.dtype, np.int16)
+        self.assertEqual(2 * ei.bank.nbytes, ef.bank.nbytes)
+        # voz a voz, sin lotes ni caminos rápidos
+        Voice.fast_paths = False
+        try:
+            _e, want = self.render(p, "float32", batch_voices=False)
+            _e, got = self.render(p, "int16", batch_voices=False)
+        finally:
+            Voice.fast_paths = True
+        np.testing.assert_array_equal(got, want)
+
+    def test_24_bits_a_menos_de_un_lsb(self):
+        p = self.project("PCM_24")
+        _e, want = self.render(p, "float32")
+        _e, got = self.render(p, "int16")
+        self.assertLessEqual(float(np.abs(got - want).max()), 1.0 / 32768)
+
+    def test_formato_desconocido(self):
+        with self.assertRaises(ValueError):
+            Engine(make_project(), sample_format="int8")
+
+
+class TestRenderWorkers(unittest.TestCase):
+    """Con el pool de render la salida es la misma bit a bit que en serie."""
+
+    def make_song(self):
+        engine = make_engine()
+        for ci in range(1, 6):
+            engine.project.song[ci] = 0
+        for step, note in ((0, 60), (3, 67), (8, 64), (11, 48)):
+            note_row(engine.project, step, note=note)
+        engine.project.cmd1[8] = "VOLM"
+        engine.project.param1[8] = 0x0240
+        engine.set_audio_delay(1500 / SAMPLE_RATE)
+        engine.channels[1].fx_amounts["reverb"] = 0.4
+        engine.channels[2].fx_amounts["beat_delay"] = 0.5
+        engine.channels[3].cc_pan = 60
+        engine.start()
+        return engine
+
+    def tearDown(self):
+        set_render_workers(1)
+
+    def test_igual_que_en_serie(self):
+        serial = self.make_song()
+        expected = [serial.render(1000) for _ in range(40)]
+        for n in (2, 3, 8):
+            with self.subTest(workers=n):
+                self.assertEqual(set_render_workers(n), n)
+                engine = self.make_song()
+                for i, block in enumerate(expected):
+                    np.testing.assert_array_equal(engine.render(1000), block,
+                                                  err_msg=f"bloque {i}")
+
+    def test_uno_es_serie(self):
+        self.assertEqual(set_render_workers(0), 1)
+        self.assertEqual(render_workers(), 1)
+
+
+def _numba_kernel():
+    try:
+        return FILTER_KERNELS["numba"]()
+    except Exception:
+        return None
+
+
+class TestFilterKernel(unittest.TestCase):
+    """El núcleo acelerado del filtro tiene que sonar igual que el bucle de
+    referencia, bloque a bloque y arrastrando el estado."""
+
+    def run_blocks(self, kernel, x, params, block=512):
+        out = x.copy()
+        state = (0.0, 0.0, 0.0)
+        for off in range(0, len(out), block):
+            state = kernel(out[off:off + block, 0], *state, *params)
+        return out, state
+
+    def test_numba_igual_que_python(self):
+        kernel = _numba_kernel()
+        if kernel is None:
+            self.skipTest("numba no disponible")
+        rng = np.random.default_rng(1)
+        x = (rng.standard_normal((8192, 2)) * 0.6).astype(np.float32)
+        cases = [
+            # freq, reso, dirt, mix_inv, f_mix, scream
+            (0.25, 0.9, 2600.0, 1.0, 0.0, True),    # acordeón de bulebule
+            (0.04, 0.3, 280.0, 0.6, 0.4, False),
+            (1.0, 0.0, 5000.0, 1.0, 0.0, True),
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                ref, ref_state = self.run_blocks(filter_kernel_py, x, params)
+                got, got_state = self.run_blocks(kernel, x, params)
+                np.testing.assert_allclose(got, ref, atol=1e-6)
+                np.testing.assert_allclose(got_state, ref_state, atol=1e-9)
+                self.assertLessEqual(float(np.abs(got[:, 0]).max()), 1.0)
+
+    def test_voz_filtrada_igual_con_cualquier_nucleo(self):
+        if _numba_kernel() is None:
+            self.skipTest("numba no disponible")
+
+        def render(kernel):
+            set_filter_kernel(kernel)
+            engine = make_engine()
+            idef = engine.instruments[0]
+            idef.cutoff, idef.reso, idef.filter_scream = 0x60, 0xB0, True
+            note_row(engine.project, 0)
+            return np.concatenate([engine.render(2048) for _ in range(4)])
+
+        try:
+            ref = render("python")
+            got = render("numba")
+        finally:
+            set_filter_kernel("python")
+        self.assertGreater(float(np.abs(ref).max()), 0.01)
+        np.testing.assert_allclose(got, ref, atol=1e-6)
+
+    def test_nucleo_desconocido_cae_a_python(self):
+        try:
+            self.assertEqual(set_filter_kernel("no-existe"), "python")
+            self.assertEqual(filter_kernel_name(), "python")
+        finally:
+            set_filter_kernel("python")
+
+
+class TestStems(unittest.TestCase):
+    """Un canal servido desde su stem suena igual que sintetizado, también
+    con bloques de otro tamaño y tras un catch_up."""
+
+    def make_song(self):
+        engine = make_engine()
+        engine.project.song[1] = 0             # canal 1 toca la misma chain
+        for step, note in ((0, 60), (4, 67), (8, 64), (12, 72)):
+            note_row(engine.project, step, note=note)
+        engine.project.cmd1[8] = "VOLM"
+        engine.project.param1[8] = 0x0240
+        engine.start()
+        return engine
+
+    def record(self, seconds=1.5):
+        import lgpt_stems
+        chunks = {ci: [] for ci in range(8)}
+        engine = self.make_song()
+        lgpt_stems.render_stems(
+            engine, seconds, block=1000,
+            sink=lambda ci, c: chunks[ci].append(c.copy()))
+        return {ci: np.concatenate(c) for ci, c in chunks.items()}
+
+    def test_stem_igual_que_directo(self):
+        stems = self.record()
+        live = self.make_song()
+        served = self.make_song()
+        served.stems = {0: stems[0]}          # canal 1 sigue en directo
+        a = np.concatenate([live.render(512) for _ in range(100)])
+        b = np.concatenate([served.render(512) for _ in range(100)])
+        self.assertGreater(float(np.abs(a).max()), 0.01)
+        np.testing.assert_allclose(b, a, atol=1e-5)
+
+    def test_stem_alineado_tras_catch_up(self):
+        # Tras el hueco, la nota que sonaba en directo retoma donde se quedó
+        # y el stem ya va por donde marca el reloj; desde la nota siguiente
+        # los dos caminos tienen que volver a coincidir muestra a muestra.
+        stems = self.record()
+        live = self.make_song()
+        served = self.make_song()
+        served.stems = dict(stems)
+        for e in (live, served):
+            e.render(700)
+            e.catch_up(0.25)
+            self.assertEqual(e.song_sample, 700 + round(0.25 * SAMPLE_RATE))
+        a = np.concatenate([live.render(512) for _ in range(80)])
+        b = np.concatenate([served.render(512) for _ in range(80)])
+        np.testing.assert_allclose(b[-30 * 512:], a[-30 * 512:], atol=1e-5)
+
+    def test_tempo_y_fin_del_stem_vuelven_a_directo(self):
+        stems = self.record(seconds=0.5)
+        engine = self.make_song()
+        engine.stems = dict(stems)
+        for _ in range(60):                   # más allá de lo grabado
+            engine.render(512)
+        self.assertEqual(engine.stems, {})
+        engine.stems = dict(stems)
+        engine.push_event("param", 0, "tempo", 127)
+        engine.render(64)
+        self.assertEqual(engine.stems, {})
+
+    def test_bounce_y_carga_de_la_cache(self):
+        import tempfile
+        import lgpt_stems
+        song = Path(__file__).resolve().parent.parent / "songs" / "lgpt_AGIA"
+        with tempfile.TemporaryDirectory() as d:
+            self.assertIsNone(lgpt_stems.load(song, Path(d)))
+            lgpt_stems.bounce(song, Path(d), seconds=0.2)
+            stems = lgpt_stems.load(song, Path(d))
+            self.assertEqual(sorted(stems), list(range(8)))
+            self.assertEqual({len(s) for s in stems.values()},
+                             {round(0.2 * SAMPLE_RATE)})
+            # otro sample rate es otra grabación
+            self.assertIsNone(lgpt_stems.load(song, Path(d), 48000))
+
+    def test_canales_vivos_segun_pots(self):
+        import lgpt_stems
+        pot = lambda chans, name: (None, (chans, name, 1.0), 0)  # noqa: E731
+        self.assertIsNone(lgpt_stems.live_channels([]))
+        self.assertIsNone(lgpt_stems.live_channels([pot((0,), "tempo")]))
+        self.assertEqual(lgpt_stems.live_channels(
+            [pot((2,), "reverb"), pot((1, 3), "pitch"), pot((5,), "cutoff")]),
+            {1, 3, 5})
+
+
 class TestGroove(unittest.TestCase):
     def make_groove_engine(self, pattern):
         engine = make_engine()
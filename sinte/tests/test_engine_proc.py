@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Tests del engine en proceso aparte (memoria compartida, sin audio)."""
+
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import soundfile as sf
+
+from engine_proc import EngineProcess, apply_song_config, decode_event, \
+    encode_event, load_engine, read_song_config
+from lgpt_engine import Engine, filter_kernel_name, set_filter_kernel
+from lgpt_parser import LGPTProject
+from test_engine import make_project
+
+SONG = Path(__file__).resolve().parent.parent / "songs" / "lgpt_AGIA"
+
+
+def estado():
+    return SimpleNamespace(render_ultima_ms=0.0, render_peor_ms=0.0,
+                           render_peor_desde=0.0, carga_cancion=0.0)
+
+
+class TestOrdenes(unittest.TestCase):
+    def test_ida_y_vuelta(self):
+        for ev in (("cc", 2, 7, 100), ("param", 1, "reverb", 64),
+                   ("param", 0, "tempo", 3), ("trigger", 5), ("play",),
+                   ("pause",), ("stop",)):
+            self.assertEqual(decode_event(encode_event(ev)), ev)
+
+    def test_desconocidos_no_se_mandan(self):
+        self.assertIsNone(encode_event(("param", 0, "no_existe", 1)))
+        self.assertIsNone(encode_event(("otro", 1)))
+
+
+class TestConfigCancion(unittest.TestCase):
+    def test_efectos_de_knobs_y_fijos_precargados(self):
+        engine = Engine(make_project())
+        cfg = {"fx": {"2": {"reverb": 15}},
+               "pots": {"pot1": "1,3:acid_lp:50", "pot2": "0:volume",
+                        "pot3": "roto"}}
+        apply_song_config(engine, cfg, 60)
+        objs = [set(ch.fx_objs) for ch in engine.channels]
+        self.assertEqual(objs[1], {"acid_lp"})
+        self.assertEqual(objs[3], {"acid_lp"})
+        self.assertEqual(objs[0], set())
+        # reverb es un bus del engine (AUX_SENDS), no un efecto del canal
+        self.assertEqual(objs[2], set())
+        self.assertIsNotNone(engine.aux[0])
+
+
+@unittest.skipUnless((SONG / "lgptsav.dat").is_file(), "sin canción de prueba")
+class TestEngineProcess(unittest.TestCase):
+    """El hijo suena exactamente igual que el engine en el propio proceso y
+    atiende las órdenes del padre."""
+
+    BLOCK = 512
+
+    def setUp(self):
+        self._kernel = filter_kernel_name()
+        set_filter_kernel("python")        # el mismo núcleo que el hijo
+        self._tmp = tempfile.TemporaryDirectory()
+        self.song = self.make_song(Path(self._tmp.name))
+        self.opts = {"samplerate": 44100, "delay": 0.0, "wavs_dir": None,
+                     "master_fx": {}, "pad_volume": 60, "stems": False,
+                     "cache_dir": self._tmp.name, "filter_kernel": "python"}
+
+    @staticmethod
+    def make_song(root: Path) -> Path:
+        """La canción de prueba con WAVs sintéticos (el repo no trae los
+        samples): ruido con envolvente, distinto por nombre."""
+        song = root / SONG.name
+        (song / "samples").mkdir(parents=True)
+        shutil.copy(SONG / "lgptsav.dat", song)
+        p = LGPTProject(song)
+        p.load()
+        names = {i["params"].get("sample")
+                 for i in p.instrument_bank.values()} - {None}
+        for k, name in enumerate(sorted(names)):
+            rng = np.random.default_rng(k)
+            env = np.linspace(0.8, 0.0, 8000, dtype=np.float32)
+            sf.write(song / "samples" / name,
+                     rng.uniform(-1, 1, 8000).astype(np.float32) * env, 44100)
+        return song
+
+    def tearDown(self):
+        set_filter_kernel(self._kernel)
+        self._tmp.cleanup()
+
+    def collect(self, proc, n, timeout=30.0):
+        got = []
+        t_end = time.monotonic() + timeout
+        while len(got) < n:
+            block = proc.pop()
+            if block is None:
+                self.assertLess(time.monotonic(), t_end, "el hijo no llega")
+                time.sleep(0.002)
+                continue
+            got.append(block.copy())
+            proc.done(time.time() * 1000.0)
+        return np.concatenate(got)
+
+    def run_child(self, events=(), n=30):
+        proc = EngineProcess([self.song], self.opts, self.BLOCK, 4, estado())
+        proc.start()
+        try:
+            engine = proc.load(0, None)
+            for ev in events:
+                engine.push_event(*ev)
+            out = self.collect(proc, n)
+            self.assertTrue(proc.cargado())
+            self.assertTrue(engine.playing)
+            self.assertGreater(engine.tempo, 0)
+            self.assertEqual(engine.events_lost, 0)
+            return out
+        finally:
+            proc.close()
+
+    def test_igual_que_en_proceso(self):
+        ref = load_engine(self.song, self.opts,
+                          read_song_config(self.song), None)
+        expected = np.concatenate([ref.render(self.BLOCK) for _ in range(30)])
+        got = self.run_child()
+        self.assertGreater(float(np.abs(expected).max()), 0.0)
+        np.testing.assert_array_equal(got, expected)
+
+    def test_ordenes_llegan_al_engine(self):
+        mute = [("param", ci, "volume", 0) for ci in range(8)]
+        got = self.run_child(events=mute)
+        self.assertEqual(float(np.abs(got).max()), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+"""Efectos en numpy (motor "numpy" de los presets, sin LADSPA).
+
+Se comprueba que hacen lo que dice su docstring y, sobre todo, que trocear
+la señal en bloques de cualquier tamaño da lo mismo que procesarla entera:
+el estado (fases de LFO, líneas de retardo, filtros) tiene que pasar bien
+de un bloque al siguiente.
+"""
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy_fx  # noqa: E402
+from numpy_fx import (  # noqa: E402
+    NumpyDjEq,
+    NumpyStereoDecimator,
+    NumpyStereoPhaser,
+    NumpyStereoRetroFlange,
+    NumpyStereoRingmod,
+    NumpyStereoTapeDelay,
+)
+
+SR = 44100
+
+
+def ruido(seconds=0.5, seed=1):
+    rng = np.random.default_rng(seed)
+    return (0.3 * rng.standard_normal((2, int(SR * seconds)))).astype(
+        np.float32)
+
+
+def por_bloques(fx, x, cuts=(0, 1, 2, 300, 812, 3000, 3001)):
+    """`fx.run` sobre x troceado (incluido un bloque de 1 muestra)."""
+    y = x.copy()
+    cuts = [c for c in cuts if c < x.shape[1]] + [x.shape[1]]
+    for a, b in zip(cuts, cuts[1:]):
+        fx.run(y[:, a:b])
+    return y
+
+
+def entero(fx, x):
+    y = x.copy()
+    fx.run(y)
+    return y
+
+
+class TestTroceo(unittest.TestCase):
+    """Misma salida en un bloque que en bloques de tamaños raros."""
+
+    def compara(self, make, atol=1e-6):
+        x = ruido()
+        np.testing.assert_allclose(por_bloques(make(), x),
+                                   entero(make(), x), rtol=0, atol=atol)
+
+    def test_ringmod(self):
+        for wave in ("sine", "triangle"):
+            def make():
+                fx = NumpyStereoRingmod(SR, wave=wave)
+                fx.set(1.4, 230.0)
+                return fx
+            with self.subTest(wave=wave):
+                self.compara(make)
+
+    def test_decimator(self):
+        def make():
+            fx = NumpyStereoDecimator(SR)
+            fx.set(16.0, SR * 0.3)
+            return fx
+        self.compara(make)
+
+    def test_tape_delay(self):
+        def make():
+            fx = NumpyStereoTapeDelay(SR)
+            fx.delay = 1000            # el de verdad (1.5 s) no cabe en 0.5 s
+            fx.line = numpy_fx._DelayLine(fx.delay)
+            fx.set(-2.0, -6.0)
+            return fx
+        self.compara(make)
+
+    def test_flanger(self):
+        def make():
+            fx = NumpyStereoRetroFlange(SR)
+            fx.set(6.0, 3.0)
+            return fx
+        self.compara(make)
+
+    @unittest.skipIf(numpy_fx._lfilter is None, "sin scipy")
+    def test_phaser(self):
+        def make():
+            fx = NumpyStereoPhaser(SR)
+            fx.set(40.0, 0.8, 0.6)     # LFO rápido: muchos cambios de coef.
+            return fx
+        self.compara(make, atol=1e-6)
+
+    @unittest.skipIf(numpy_fx._lfilter is None, "sin scipy")
+    def test_eq(self):
+        x = ruido()
+        eqs = [NumpyDjEq(SR), NumpyDjEq(SR)]
+        for eq in eqs:
+            eq.set(4.0, -3.0, 2.0)
+        got, want = x.copy(), x.copy()
+        for a, b in ((0, 1), (1, 700), (700, x.shape[1])):
+            eqs[0].process(got[0, a:b], got[1, a:b], got[0, a:b], got[1, a:b])
+        eqs[1].process(want[0], want[1], want[0], want[1])
+        np.testing.assert_allclose(got, want, rtol=0, atol=1e-6)
+
+
+class TestComportamiento(unittest.TestCase):
+
+    def test_ringmod_anillo_y_seco(self):
+        x = ruido(0.1)
+        fx = NumpyStereoRingmod(SR)
+        fx.set(0.0, 100.0)
+        np.testing.assert_array_equal(entero(fx, x), x)
+        fx = NumpyStereoRingmod(SR)
+        fx.set(2.0, 100.0)
+        osc = np.sin(2 * np.pi * 100.0 * np.arange(x.shape[1]) / SR)
+        np.testing.assert_allclose(entero(fx, x), x * osc, atol=1e-6)
+
+    def test_chopper_triangular(self):
+        x = np.ones((2, SR // 10), dtype=np.float32)
+        fx = NumpyStereoRingmod(SR, wave="triangle")
+        fx.set(1.0, 10.0)                 # AM: la ganancia va de 0 a 1
+        y = entero(fx, x)
+        self.assertAlmostEqual(float(y.min()), 0.0, places=3)
+        self.assertAlmostEqual(float(y.max()), 1.0, places=3)
+        self.assertAlmostEqual(float(y[0, 0]), 0.5, places=6)
+        self.assertAlmostEqual(float(y[0, SR // 40]), 1.0, places=3)
+
+    def test_decimator_retiene(self):
+        x = ruido(0.05)
+        fx = NumpyStereoDecimator(SR)
+        fx.set(24.0, SR / 4)
+        y = entero(fx, x)
+        # cada muestra nueva se repite 4 veces
+        np.testing.assert_array_equal(y[:, 3::4], x[:, 3::4])
+        np.testing.assert_array_equal(y[:, 4::4], x[:, 3:-1:4])
+        fx.set(24.0, SR)
+        np.testing.assert_array_equal(entero(fx, x), x)
+
+    def test_tape_delay_eco(self):
+        fx = NumpyStereoTapeDelay(SR)
+        fx.set(-90.0, -6.0)
+        x = np.zeros((2, fx.delay + 10), dtype=np.float32)
+        x[:, 3] = 1.0
+        y = x.copy()
+        for a in range(0, y.shape[1], 2048):
+            fx.run(y[:, a:a + 2048])
+        self.assertAlmostEqual(float(y[0, fx.delay + 3]), 10 ** (-6 / 20),
+                               places=5)
+        self.assertEqual(int(np.count_nonzero(y[0])), 1)
+
+    def test_flanger_sin_stall_casi_seco(self):
+        # con el retardo mínimo (1 muestra) queda la media con la anterior
+        x = ruido(0.05)
+        fx = NumpyStereoRetroFlange(SR)
+        fx.set(0.0, 1.0)
+        want = x.copy()
+        want[:, 1:] = 0.5 * (x[:, 1:] + x[:, :-1])
+        want[:, 0] *= 0.5
+        np.testing.assert_allclose(entero(fx, x), want, atol=1e-6)
+
+    @unittest.skipIf(numpy_fx._lfilter is None, "sin scipy")
+    def test_phaser_pasatodo_y_estable(self):
+        x = ruido(2.0)
+        fx = NumpyStereoPhaser(SR)
+        fx.set(1.7, 1.0, 0.6)
+        wet = entero(fx, x) - x
+        # el wet es la señal por pasatodo: misma energía, otra fase
+        self.assertAlmostEqual(float(np.mean(wet ** 2) / np.mean(x ** 2)),
+                               1.0, delta=0.05)
+        # LFO y Q al extremo durante 20 s: el estado no se dispara
+        fx = NumpyStereoPhaser(SR)
+        fx.set(100.0, 1.0, 1.0)
+        for _ in range(10):
+            self.assertLess(float(np.abs(entero(fx, x)).max()), 10.0)
+        # depth 0: seco, sin coloración
+        fx = NumpyStereoPhaser(SR)
+        fx.set(1.0, 0.0, 0.5)
+        np.testing.assert_array_equal(entero(fx, x), x)
+
+    @unittest.skipIf(numpy_fx._lfilter is None, "sin scipy")
+    def test_eq_bandas(self):
+        t = np.arange(SR // 2) / SR
+
+        def nivel(hz, lo, mid, hi):
+            x = np.stack([np.sin(2 * np.pi * hz * t)] * 2).astype(np.float32)
+            eq = NumpyDjEq(SR)
+            eq.set(lo, mid, hi)
+            eq.process(x[0], x[1], x[0], x[1])
+            tail = x[0, SR // 4:]
+            return 20 * np.log10(np.sqrt(2 * np.mean(tail ** 2)))
+
+        self.assertAlmostEqual(nivel(100.0, 0, 0, 0), 0.0, places=3)
+        self.assertAlmostEqual(nivel(100.0, 6, 0, 0), 6.0, delta=0.3)
+        self.assertAlmostEqual(nivel(1000.0, 0, -12, 0), -12.0, delta=0.3)
+        self.assertGreater(nivel(15000.0, 0, 0, 6), 4.5)
+        self.assertAlmostEqual(nivel(1000.0, 6, 0, 6), 0.0, delta=1.0)
+
+    @unittest.skipIf(numpy_fx._lfilter is None, "sin scipy")
+    def test_eq_reserva_lo_mismo_con_cualquier_bloque(self):
+        """Va en el master: lo que reserva por bloque no crece con el
+        blocksize (trozos de _PIECE), así que no son buffers de audio."""
+        import tracemalloc
+
+        def pico(n):
+            eq = NumpyDjEq(SR)
+            eq.set(3.0, -2.0, 2.0)
+            buf = ruido(n / SR)
+            for _ in range(3):
+                eq.process(buf[0], buf[1], buf[0], buf[1])
+            tracemalloc.start()
+            try:
+                base = tracemalloc.get_traced_memory()[0]
+                for _ in range(10):
+                    eq.process(buf[0], buf[1], buf[0], buf[1])
+                return tracemalloc.get_traced_memory()[1] - base
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(pico(16384), pico(512) + 4096)
+
+
+if __name__ == "__main__":
+    unittest.main()
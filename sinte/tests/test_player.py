@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 """Tests del mapeo de botones MIDI del reproductor."""
 
+import tempfile
 import unittest
 from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
 import mido
 
-from lgpt_player import CARGA_AVISO, EstadoAudio, match_button, match_pot, \
-    parse_button_spec, parse_pot_target
+from blocksizes import BlocksizeMemory
+from lgpt_player import CARGA_AVISO, EstadoAudio, Player, match_button, \
+    match_pot, parse_button_spec, parse_pot_target
 
 
 class TestParseButtonSpec(unittest.TestCase):
@@ -143,7 +147,8 @@ class TestPython311Compat(unittest.TestCase):
         import ast
         root = Path(__file__).resolve().parent.parent
         for name in ("lgpt_engine.py", "lgpt_parser.py",
-                     "lgpt_player.py", "lgpt_setup.py"):
+                     "lgpt_player.py", "lgpt_setup.py", "lgpt_stems.py",
+                     "audio_ring.py", "engine_proc.py"):
             src = (root / name).read_text()
             ast.parse(src, filename=name, feature_version=(3, 11))
 
@@ -166,6 +171,10 @@ class TestEstadoAudio(unittest.TestCase):
         self.est.apurados = 9      # apurado no es un corte: no cuenta
         self.assertEqual(self.est.incidentes, 5)
 
+    def test_render_adelantado_sin_bloque_es_un_corte(self):
+        self.est.vacios = 4
+        self.assertEqual(self.est.incidentes, 4)
+
     def test_el_peor_reciente_se_olvida(self):
         """Un pico al arrancar no puede quedarse en pantalla toda la sesión."""
         self.est.peor_desde = 40.0
@@ -190,5 +199,102 @@ class TestEstadoAudio(unittest.TestCase):
         self.assertGreater(CARGA_AVISO, 0.5)
 
 
+class TestBlocksizePorCancion(unittest.TestCase):
+    """El blocksize apuntado se aplica al cambiar de canción, y cada una se
+    juzga solo por lo que pasó mientras sonaba."""
+
+    SR = 44100
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        songs = Path(tmp.name)
+        self.a, self.b = songs / "lgpt_a", songs / "lgpt_b"
+        # sin __init__: ni stream de PortAudio ni proyectos en disco
+        player = Player.__new__(Player)
+        player.args = SimpleNamespace(samplerate=self.SR, pots=[],
+                                      hw_pots={})
+        player.projects = [self.a, self.b]
+        player.engine_ref = {}
+        player.estado_audio = EstadoAudio(0.0)
+        player.blocksize = 2048
+        player.blocksizes = BlocksizeMemory(songs / "blocksizes.json", 2048)
+        player._song_mark = None
+        player._notice = None
+        player.engine_proc = None
+        player.event_out = None
+        self.abiertos = []
+
+        def open_audio(blocksize):
+            player.blocksize = blocksize
+            self.abiertos.append(blocksize)
+
+        player._open_audio = open_audio
+        player._close_audio = lambda: None
+        player._start_audio = lambda: None
+        self.player = player
+
+    def suena(self, seconds, carga=0.3):
+        """La canción cargada suena `seconds` sin cortes."""
+        est = self.player.estado_audio
+        est.bloques += int(seconds * self.SR / self.player.blocksize)
+        est.carga_cancion = max(est.carga_cancion, carga)
+
+    def carga(self, index, glitch=False):
+        """`_load_song` con un engine de mentira; con `glitch` la carga
+        corta el audio de la que aún suena."""
+        est = self.player.estado_audio
+
+        def load_engine(*_args):
+            if glitch:
+                est.xruns += 1
+                est.carga_cancion = 1.5
+            return SimpleNamespace(
+                panic=lambda: None, prepare=lambda n: None, stems={},
+                channels=[], midi_out=None,
+                bank=SimpleNamespace(report=lambda: "", close=lambda: None))
+
+        with mock.patch("lgpt_player.load_engine", load_engine), \
+                mock.patch("lgpt_player.engine_opts", lambda args: {}), \
+                mock.patch("lgpt_player.read_song_config", lambda d: {}):
+            return self.player._load_song(index)
+
+    def test_la_carga_no_cuenta_para_la_nueva(self):
+        self.carga(0)
+        self.suena(200)
+        self.carga(1, glitch=True)
+        self.assertEqual(self.player._song_mark[0], "lgpt_b")
+        self.assertEqual(self.player.estado_audio.carga_cancion, 0.0)
+        self.suena(200)
+        self.player._judge_song()
+        self.assertEqual(self.player.blocksizes.get("lgpt_b"), 2048)
+
+    def test_judge_song(self):
+        player = self.player
+        self.carga(1)
+        player.estado_audio.xruns += 1
+        self.suena(200)
+        player._judge_song()
+        self.assertEqual(player.blocksizes.get("lgpt_b"), 4096)
+        self.assertIsNone(player._song_mark)
+        player._judge_song()                  # sin marca: nada que juzgar
+        self.assertEqual(player.blocksizes.get("lgpt_b"), 4096)
+
+    def test_reabre_con_el_apuntado(self):
+        player = self.player
+        player.blocksizes.decide("lgpt_b", 2048, 1, 0, 10_000, 0.6, self.SR)
+        player.engine_ref["engine"] = object()
+        player._switch_blocksize(self.b)
+        self.assertEqual(self.abiertos, [4096])
+        self.assertIsNone(player.engine_ref["engine"])
+        self.assertEqual(player._notice[0], "blocksize 4096")
+        player._switch_blocksize(self.b)      # el mismo: no se reabre
+        self.assertEqual(self.abiertos, [4096])
+        engine = self.carga(0)
+        self.assertEqual(self.abiertos, [4096, 2048])
+        self.assertIs(player.engine_ref["engine"], engine)
+        self.assertEqual(player._song_mark[:2], ("lgpt_a", 2048))
+
+
 if __name__ == "__main__":
     unittest.main()
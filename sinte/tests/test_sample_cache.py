@@ -0,0 +1,112 @@
+"""Caché de samples decodificados: aciertos, invalidación y limpieza."""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lgpt_engine import InstrumentDef, SampleBank, Voice, \
+    render_batch  # noqa: E402
+from sample_cache import SampleCache, sample_key  # noqa: E402
+
+SR = 22050
+
+
+class TestSampleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        base = Path(self.tmp.name)
+        self.song = base / "lgpt_test"
+        (self.song / "samples").mkdir(parents=True)
+        self.wav = self.song / "samples" / "bombo-01.wav"
+        self.write(0.5)
+        self.root = base / "cache" / "samples"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, amp, channels=2):
+        t = np.arange(SR // 10) / SR
+        sig = amp * np.sin(2 * np.pi * 110 * t)
+        sf.write(str(self.wav), np.stack([sig] * channels, axis=1), SR,
+                 subtype="FLOAT")
+
+    def test_segunda_carga_es_mmap(self):
+        want, sr = sf.read(str(self.wav), dtype="float32", always_2d=True)
+        cache = SampleCache(self.root)
+        data, got_sr = cache.read(self.wav)
+        self.assertEqual((cache.misses, cache.hits, got_sr), (1, 0, SR))
+        np.testing.assert_array_equal(data, want)
+        again = SampleCache(self.root)
+        data, got_sr = again.read(self.wav)
+        self.assertEqual((again.misses, again.hits, got_sr), (0, 1, SR))
+        np.testing.assert_array_equal(data, want)
+        self.assertIs(type(data), np.ndarray)
+        self.assertFalse(data.flags.writeable)     # mmap de solo lectura
+        self.assertIsInstance(data.base, np.memmap)
+
+    def test_wav_cambiado_se_decodifica_otra_vez(self):
+        SampleCache(self.root).read(self.wav)
+        old = sample_key(self.wav)
+        self.write(0.25, channels=1)
+        st = self.wav.stat()
+        os.utime(self.wav, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertNotEqual(sample_key(self.wav), old)
+        cache = SampleCache(self.root)
+        data, _sr = cache.read(self.wav)
+        self.assertEqual((cache.misses, data.shape[1]), (1, 1))
+        self.assertAlmostEqual(float(np.abs(data).max()), 0.25, places=3)
+        # prune deja solo lo del WAV actual
+        removed, freed = cache.prune({sample_key(self.wav)})
+        self.assertEqual(removed, 1)
+        self.assertGreater(freed, 0)
+        self.assertEqual(len(list(self.root.iterdir())), 1)
+        self.assertEqual(SampleCache(self.root).read(self.wav)[0].shape,
+                         data.shape)
+
+    def test_entrada_rota_y_solo_lectura(self):
+        cache = SampleCache(self.root)
+        cache.read(self.wav)
+        (npy,) = self.root.glob("*.npy")
+        npy.write_bytes(b"basura")
+        cache = SampleCache(self.root)
+        data, _sr = cache.read(self.wav)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(len(data), SR // 10)
+        # sin poder escribir sigue decodificando
+        blocked = Path(self.tmp.name) / "fichero"
+        blocked.write_text("")
+        cache = SampleCache(blocked / "samples")
+        self.assertEqual(len(cache.read(self.wav)[0]), SR // 10)
+        self.assertEqual(len(cache.read(self.wav)[0]), SR // 10)
+        self.assertEqual(cache.misses, 2)
+
+    def test_sample_bank(self):
+        plain = SampleBank(self.song)
+        SampleBank(self.song, SampleCache(self.root))
+        cache = SampleCache(self.root)
+        bank = SampleBank(self.song, cache)
+        self.assertEqual(cache.hits, 1)
+        smp = bank.get("bombo-01.wav")
+        np.testing.assert_array_equal(smp.data,
+                                      plain.get("bombo-01.wav").data)
+        # por lotes se lee del mmap, sin copia común de los samples
+        idef = InstrumentDef(index=0, sample_name="")
+        want = np.zeros((2, 2, 512), dtype=np.float32)
+        got = np.zeros((2, 2, 512), dtype=np.float32)
+        for k, note in enumerate((60, 67)):
+            Voice(smp, idef, note, SR, 918.75).render(want[k], 0, 512)
+        render_batch([Voice(smp, idef, note, SR, 918.75)
+                      for note in (60, 67)], list(got), 0, 512)
+        np.testing.assert_array_equal(got, want)
+        self.assertIsInstance(smp.data.base, np.memmap)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Samples leídos del disco al sonar: misma salida que en memoria."""
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sample_stream  # noqa: E402
+from lgpt_engine import InstrumentDef, SampleBank, Voice  # noqa: E402
+from sample_stream import (  # noqa: E402
+    CHUNK, SHIFT, SampleStream, StreamReader)
+
+SR = 22050
+FRAMES = 512
+
+
+class TestSampleStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.song = Path(self.tmp.name) / "lgpt_test"
+        (self.song / "samples").mkdir(parents=True)
+        rng = np.random.default_rng(3)
+        x = np.clip(0.3 * rng.standard_normal((5 * CHUNK + 123, 2)), -1, 1)
+        self.wav = self.song / "samples" / "voces.wav"
+        sf.write(str(self.wav), x, SR, subtype="PCM_16")
+        sf.write(str(self.song / "samples" / "caja.wav"), x[:2000], SR,
+                 subtype="PCM_16")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def banks(self, dtype="float32", starts=None):
+        ram = SampleBank(self.song, dtype=dtype)
+        disk = SampleBank(self.song, dtype=dtype, stream_mb=0.5,
+                          starts=starts)
+        return ram, disk
+
+    def play(self, bank, idef, note, blocks):
+        smp = bank.get("voces.wav")
+        v = Voice(smp, idef, note, SR, 918.75)
+        streamed = isinstance(v.data, StreamReader)
+        if streamed:
+            # el hilo de fondo lo hace aquí el test, siempre a tiempo
+            sample_stream._streamer()._readers.discard(v.data)
+        out = []
+        for _ in range(blocks):
+            if streamed:
+                v.data.prefetch()
+            mix = np.zeros((2, FRAMES), dtype=np.float32)
+            v.render(mix, 0, FRAMES)
+            out.append(mix)
+        return np.concatenate(out, axis=1), v
+
+    def test_banco(self):
+        ram, disk = self.banks()
+        self.assertEqual(disk.streamed, 1)
+        self.assertIn("1 del disco", disk.report())
+        smp = disk.get("voces.wav")
+        self.assertIsInstance(smp.data, SampleStream)
+        self.assertEqual(smp.data.shape, ram.get("voces.wav").data.shape)
+        self.assertIsInstance(disk.get("caja.wav").data, np.ndarray)
+        # en memoria solo la cabeza
+        self.assertLess(disk.nbytes, ram.nbytes // 2)
+
+    def test_misma_salida_que_en_memoria(self):
+        ram, disk = self.banks()
+        blocks = 5 * CHUNK // FRAMES
+        cases = [
+            (InstrumentDef(index=0, sample_name=""), 60),          # unity
+            (InstrumentDef(index=0, sample_name=""), 67),          # rápido
+            (InstrumentDef(index=0, sample_name="", downsample=2), 55),
+            (InstrumentDef(index=0, sample_name="", loop=True,
+                           start=3 * CHUNK + 77, end=4 * CHUNK + 900), 60),
+            (InstrumentDef(index=0, sample_name="", loop=True,
+                           start=CHUNK // 2, end=3 * CHUNK + 5), 71),
+            (InstrumentDef(index=0, sample_name="", start=2 * CHUNK), 58),
+        ]
+        for idef, note in cases:
+            want, _ = self.play(ram, idef, note, blocks)
+            got, v = self.play(disk, idef, note, blocks)
+            self.assertIsInstance(v.data, StreamReader)
+            self.assertFalse(v.batchable())
+            np.testing.assert_array_equal(got, want, err_msg=repr(idef))
+
+    def test_int16(self):
+        ram, disk = self.banks("int16")
+        idef = InstrumentDef(index=0, sample_name="", loop=True)
+        want, _ = self.play(ram, idef, 63, 300)
+        got, v = self.play(disk, idef, 63, 300)
+        self.assertEqual(v.data.dtype, np.int16)
+        np.testing.assert_array_equal(got, want)
+
+    def test_ventana_por_delante(self):
+        data = sf.read(str(self.wav), dtype="float32", always_2d=True)[0]
+        stream = SampleStream(self.wav)
+        reader = StreamReader(stream, 3 * CHUNK, CHUNK + 10, 3 * CHUNK + 10)
+        # ~1.5 s desde la posición, dando la vuelta al loop
+        self.assertEqual(sorted(reader._wanted()), [1, 2, 3])
+        reader.prefetch()
+        self.assertEqual(sorted(reader.chunks), [1, 2, 3])
+        before = reader.underruns
+        idx = np.arange(3 * CHUNK, 3 * CHUNK + 10)
+        np.testing.assert_array_equal(reader[idx], data[idx])
+        np.testing.assert_array_equal(reader[CHUNK + 10:CHUNK + 40],
+                                      data[CHUNK + 10:CHUNK + 40])
+        self.assertEqual(reader.underruns, before)
+        # lo que no está suena en silencio y se cuenta, sin leer del disco
+        # (el 4 queda fuera del loop: el hilo de fondo no lo lee)
+        got = reader[4 * CHUNK + 5:4 * CHUNK + 50]
+        self.assertEqual(got.shape, (45, 2))
+        self.assertEqual(float(np.abs(got).max()), 0.0)
+        self.assertEqual(reader.underruns, before + 1)
+        self.assertEqual(reader[len(data) - 1:len(data) - 1].shape, (0, 2))
+        # la cabeza no es del reader
+        self.assertEqual(stream.head_chunks,
+                         -(-int(sample_stream.HEAD_S * SR) // CHUNK))
+        self.assertEqual(stream.nbytes, stream.head_chunks * CHUNK * 2 * 4)
+
+    def test_start_residente(self):
+        # Una voz que empieza lejos de la cabeza no espera al hilo de fondo
+        # en su primer bloque: el trozo de su start ya está en memoria. El
+        # hilo de audio no lee nunca del disco.
+        start = 3 * CHUNK + 77
+        idef = InstrumentDef(index=0, sample_name="", loop=True,
+                             start=start, end=4 * CHUNK + 900)
+        ram, disk = self.banks(starts={"voces.wav": {start}})
+        stream = disk.get("voces.wav").data
+        self.assertIn(start >> SHIFT, stream.resident)
+        reads = []
+        read = stream._read
+
+        def spy(a, b):
+            reads.append(threading.current_thread())
+            return read(a, b)
+
+        stream._read = spy
+        v = Voice(disk.get("voces.wav"), idef, 60, SR, 918.75)
+        mix = np.zeros((2, FRAMES), dtype=np.float32)
+        v.render(mix, 0, FRAMES)
+        want = np.zeros_like(mix)
+        Voice(ram.get("voces.wav"), idef, 60, SR, 918.75).render(want, 0,
+                                                                 FRAMES)
+        np.testing.assert_array_equal(mix, want)
+        self.assertEqual(v.data.underruns, 0)
+        self.assertNotIn(threading.current_thread(), reads)
+
+
+if __name__ == "__main__":
+    unittest.main()